@@ -0,0 +1,158 @@
+import os
+import sys
+
+import numpy as np
+
+# Corrected values are looked up in a table with LUT_SIZE entries per axis covering the
+# raw -1..1 range (4096 steps = 0.0005, well below the sticks' noise floor)
+LUT_SIZE = 4096
+
+# Deadzone = this many times the largest deviation seen at rest (plus DEADZONE_FLOOR),
+# so the resting noise can never leak through
+DEADZONE_MARGIN = 1.5
+DEADZONE_FLOOR = 0.01
+
+# The extremes are taken at these percentiles of the sweep, so a single glitchy
+# sample can't stretch the range
+RANGE_PERCENTILE = 0.5
+
+# An axis whose rest position sits within this fraction of its range from one end is a
+# trigger: it is corrected to 0 (released) .. 1 (fully pressed) instead of -1..1
+TRIGGER_REST_FRACTION = 0.1
+
+# Default response curve: output = input ** exponent after the deadzone (1 = linear)
+RESPONSE_EXPONENT = 1.0
+
+DEFAULT_PROFILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "axis_calibration.npz")
+
+
+def build_luts(center, deadzone, minimum, maximum, trigger, exponent=RESPONSE_EXPONENT, size=LUT_SIZE):
+    """
+    One corrected-value table per axis, computed for all axes and all table entries in
+    a single set of array operations. Returns a float32 array of shape (axes, size).
+    """
+    raw = np.linspace(-1.0, 1.0, size)[None, :]
+    center = np.asarray(center, dtype=np.float64)[:, None]
+    deadzone = np.asarray(deadzone, dtype=np.float64)[:, None]
+    minimum = np.asarray(minimum, dtype=np.float64)[:, None]
+    maximum = np.asarray(maximum, dtype=np.float64)[:, None]
+    trigger = np.asarray(trigger, dtype=bool)[:, None]
+
+    # Distance from rest as a fraction of the travel on that side (each side of a stick
+    # is scaled on its own, so an off-center stick still reaches -1 and +1)
+    offset = raw - center
+    positive_span = np.maximum(maximum - center - deadzone, 1e-6)
+    negative_span = np.maximum(center - minimum - deadzone, 1e-6)
+    magnitude = np.where(offset >= 0,
+                         (offset - deadzone) / positive_span,
+                         (-offset - deadzone) / negative_span)
+    magnitude = np.clip(magnitude, 0.0, 1.0) ** exponent
+
+    # Triggers rest at one end: the whole travel maps to 0..1 whichever end that is
+    trigger_end = np.where(np.abs(minimum - center) < np.abs(maximum - center), 1.0, -1.0)
+    stick = np.sign(offset) * magnitude
+    trig = np.where(np.sign(offset) == trigger_end, magnitude, 0.0)
+    return np.where(trigger, trig, stick).astype(np.float32)
+
+
+class AxisCalibration:
+    """
+    Per-axis center, deadzone, range and noise, plus the precomputed correction tables.
+
+    correct(axis, value) is one index computation and one list lookup per sample, with
+    the deadzone, range scaling and response curve all baked into the table.
+    correct_array() does the same for a whole NumPy array of samples.
+    """
+
+    def __init__(self, center, deadzone, minimum, maximum, noise, trigger,
+                 exponent=RESPONSE_EXPONENT, luts=None):
+        self.center = np.asarray(center, dtype=np.float64)
+        self.deadzone = np.asarray(deadzone, dtype=np.float64)
+        self.minimum = np.asarray(minimum, dtype=np.float64)
+        self.maximum = np.asarray(maximum, dtype=np.float64)
+        self.noise = np.asarray(noise, dtype=np.float64)
+        self.trigger = np.asarray(trigger, dtype=bool)
+        self.exponent = float(exponent)
+        if luts is None:
+            luts = build_luts(self.center, self.deadzone, self.minimum, self.maximum, self.trigger, self.exponent)
+        self.luts = luts
+        # Plain lists for the per-sample path: indexing a list is much cheaper than
+        # indexing a NumPy array with a Python int
+        self.lut_lists = [lut.tolist() for lut in luts]
+        self.scale = (luts.shape[1] - 1) / 2.0
+
+    @property
+    def axis_count(self):
+        return len(self.center)
+
+    @classmethod
+    def from_samples(cls, rest, sweep, exponent=RESPONSE_EXPONENT):
+        """
+        rest:  (n, axes) samples with the pad untouched
+        sweep: (m, axes) samples while every stick/trigger is moved through its full range
+        Statistics for all axes are computed at once along axis 0.
+        """
+        rest = np.asarray(rest, dtype=np.float64)
+        sweep = np.asarray(sweep, dtype=np.float64)
+        center = np.median(rest, axis=0)
+        noise = rest.std(axis=0)
+        deadzone = np.max(np.abs(rest - center), axis=0) * DEADZONE_MARGIN + DEADZONE_FLOOR
+
+        both = np.concatenate([rest, sweep])
+        minimum = np.percentile(both, RANGE_PERCENTILE, axis=0)
+        maximum = np.percentile(both, 100 - RANGE_PERCENTILE, axis=0)
+        span = np.maximum(maximum - minimum, 1e-6)
+        trigger = np.minimum(center - minimum, maximum - center) < span * TRIGGER_REST_FRACTION
+        return cls(center, deadzone, minimum, maximum, noise, trigger, exponent)
+
+    def correct(self, axis, value):
+        if axis >= len(self.lut_lists):
+            return value
+        index = int((value + 1.0) * self.scale + 0.5)
+        if index < 0:
+            index = 0
+        elif index >= len(self.lut_lists[axis]):
+            index = len(self.lut_lists[axis]) - 1
+        return self.lut_lists[axis][index]
+
+    def correct_array(self, axis, values):
+        index = np.rint((np.asarray(values) + 1.0) * self.scale).astype(np.intp)
+        np.clip(index, 0, self.luts.shape[1] - 1, out=index)
+        return self.luts[axis][index]
+
+    def save(self, path=DEFAULT_PROFILE):
+        np.savez_compressed(path, center=self.center, deadzone=self.deadzone, minimum=self.minimum,
+                            maximum=self.maximum, noise=self.noise, trigger=self.trigger,
+                            exponent=self.exponent, luts=self.luts)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PROFILE):
+        with np.load(path) as data:
+            return cls(data["center"], data["deadzone"], data["minimum"], data["maximum"], data["noise"],
+                       data["trigger"], float(data["exponent"]), data["luts"])
+
+    def summary(self, names=None):
+        lines = [f"{'axis':<6} {'type':<8} {'center':>8} {'deadzone':>9} {'min':>7} {'max':>7} {'noise':>8}"]
+        for i in range(self.axis_count):
+            name = names.get(i, str(i)) if names else str(i)
+            lines.append(f"{name:<6} {'trigger' if self.trigger[i] else 'stick':<8} {self.center[i]:>8.4f} "
+                         f"{self.deadzone[i]:>9.4f} {self.minimum[i]:>7.3f} {self.maximum[i]:>7.3f} "
+                         f"{self.noise[i]:>8.5f}")
+        return "\n".join(lines)
+
+
+def load_default():
+    """
+    The saved profile, or None if calibrate_joy.py --axes hasn't been run yet.
+    """
+    if not os.path.exists(DEFAULT_PROFILE):
+        return None
+    try:
+        return AxisCalibration.load(DEFAULT_PROFILE)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Ignoring axis calibration '{DEFAULT_PROFILE}': {e}")
+        return None
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PROFILE
+    print(AxisCalibration.load(path).summary())
@@ -0,0 +1,395 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+# Stick pairs (x, y column) and trigger columns in the profile's axis order (LX LY LT RX RY RT)
+STICK_PAIRS = ((0, 1), (3, 4))
+TRIGGER_CHANNELS = (2, 5)
+
+# Value of a released trigger: raw SDL triggers run -1..1 and rest at -1 (calibrated
+# ones, see axis_calibration.py, rest at 0)
+TRIGGER_REST = -1.0
+
+# linear_recurrence() works on blocks of this many samples; decays are kept above
+# MIN_DECAY so the products inside a block stay within float64 range
+SCAN_BLOCK = 32
+MIN_DECAY = 1e-8
+
+# Samples closer together than this are treated as this far apart when dividing by dt
+MIN_DT = 1e-6
+
+
+def linear_recurrence(decay, drive, y0):
+    """
+    Solve y[i] = decay[i] * y[i-1] + drive[i] (y[-1] = y0) for (n, channels) arrays
+    without a Python loop over samples.
+
+    Each SCAN_BLOCK-sample block is solved from a zero start with cumulative products
+    and sums, for all blocks at once; only the state carried from one block into the
+    next is a Python loop, SCAN_BLOCK times shorter than the input. This is the same
+    computation a streaming first-order filter does sample by sample, so whole-session
+    and batch-by-batch results agree.
+    """
+    n, channels = drive.shape
+    if n == 0:
+        return drive.copy()
+    decay = np.maximum(decay, MIN_DECAY)
+    blocks = -(-n // SCAN_BLOCK)
+    pad = blocks * SCAN_BLOCK - n
+    if pad:
+        decay = np.concatenate([decay, np.ones((pad, channels))])
+        drive = np.concatenate([drive, np.zeros((pad, channels))])
+    decay = decay.reshape(blocks, SCAN_BLOCK, channels)
+    drive = drive.reshape(blocks, SCAN_BLOCK, channels)
+
+    # products[k] = decay[0] * ... * decay[k] within each block
+    products = np.exp(np.cumsum(np.log(decay), axis=1))
+    # Block response from a zero start: y[k] = sum_j drive[j] * products[k] / products[j]
+    inner = products * np.cumsum(drive / products, axis=1)
+
+    # State entering each block: one short loop over blocks (not samples)
+    start = np.empty((blocks, channels))
+    state = np.asarray(y0, dtype=np.float64).reshape(channels)
+    block_decay = products[:, -1]
+    block_end = inner[:, -1]
+    for b in range(blocks):
+        start[b] = state
+        state = block_decay[b] * state + block_end[b]
+    y = inner + products * start[:, None, :]
+    return y.reshape(blocks * SCAN_BLOCK, channels)[:n]
+
+
+def _smoothing_alpha(cutoff, dt):
+    """
+    One-Euro style smoothing factor for a cutoff frequency (Hz) and sample spacing.
+    """
+    tau = 1.0 / (2 * np.pi * cutoff)
+    return 1.0 / (1.0 + tau / np.maximum(dt, MIN_DT))
+
+
+class Stage:
+    """
+    One step of a FilterPipeline. process(x, dt) takes a (n, channels) batch and the
+    spacing of its samples and returns the filtered batch; anything a stage needs from
+    earlier batches is kept on the stage and cleared by reset().
+    """
+
+    def reset(self):
+        pass
+
+    def process(self, x, dt):
+        raise NotImplementedError
+
+
+class Deadzone(Stage):
+    """
+    Zero everything within `size` of center and rescale the rest back to the full range.
+    "radial" treats each stick pair as one 2D vector (no cross-shaped dead bands),
+    "axial" applies the deadzone to each channel on its own. With an axial `rest` other
+    than 0 (a trigger resting at -1), the channels run from `rest` to 1 and the dead
+    band is measured from `rest` instead of from center.
+    """
+
+    def __init__(self, size=0.05, mode="radial", pairs=STICK_PAIRS, channels=TRIGGER_CHANNELS, rest=0.0):
+        self.size = size
+        self.mode = mode
+        self.pairs = pairs
+        self.channels = channels
+        self.rest = rest
+
+    def process(self, x, dt):
+        if self.mode == "radial":
+            for cx, cy in self.pairs:
+                radius = np.hypot(x[:, cx], x[:, cy])
+                scale = np.clip((radius - self.size) / (1.0 - self.size), 0.0, 1.0) / np.maximum(radius, 1e-12)
+                x[:, cx] *= scale
+                x[:, cy] *= scale
+        elif self.rest:
+            columns = list(self.channels)
+            span = 1.0 - self.rest
+            pulled = (x[:, columns] - self.rest) / span
+            x[:, columns] = self.rest + span * np.clip((pulled - self.size) / (1.0 - self.size), 0.0, 1.0)
+        else:
+            columns = list(self.channels)
+            values = x[:, columns]
+            x[:, columns] = np.sign(values) * np.clip((np.abs(values) - self.size) / (1.0 - self.size), 0.0, 1.0)
+        return x
+
+
+class ResponseCurve(Stage):
+    """
+    Power-curve shaping (exponent > 1 = finer control near center). "radial" scales the
+    stick vector's length and keeps its direction; "axial" curves each channel.
+    """
+
+    def __init__(self, exponent=2.0, mode="radial", pairs=STICK_PAIRS, channels=TRIGGER_CHANNELS):
+        self.exponent = exponent
+        self.mode = mode
+        self.pairs = pairs
+        self.channels = channels
+
+    def process(self, x, dt):
+        if self.mode == "radial":
+            for cx, cy in self.pairs:
+                radius = np.minimum(np.hypot(x[:, cx], x[:, cy]), 1.0)
+                scale = np.where(radius > 0, radius ** (self.exponent - 1.0), 0.0)
+                x[:, cx] *= scale
+                x[:, cy] *= scale
+        else:
+            columns = list(self.channels)
+            values = x[:, columns]
+            x[:, columns] = np.sign(values) * np.abs(values) ** self.exponent
+        return x
+
+
+class ExponentialSmoothing(Stage):
+    """
+    First-order low-pass with a time constant in seconds (irregular sample spacing is
+    taken into account).
+    """
+
+    def __init__(self, time_constant=0.02):
+        self.time_constant = time_constant
+        self.reset()
+
+    def reset(self):
+        self.state = None
+
+    def process(self, x, dt):
+        if self.state is None:
+            self.state = x[0].copy()
+        decay = np.exp(-dt / self.time_constant)[:, None] * np.ones_like(x)
+        y = linear_recurrence(decay, (1.0 - decay) * x, self.state)
+        self.state = y[-1].copy()
+        return y
+
+
+class OneEuro(Stage):
+    """
+    One-Euro filter: a low-pass whose cutoff rises with speed, so resting sticks are
+    steady while fast moves keep little lag (cutoff = min_cutoff + beta * |speed|).
+
+    The speed is taken from the raw input rather than the filtered output, which keeps
+    every step a linear recurrence, so whole sessions are filtered without a per-sample
+    loop and give the same result as streaming.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.05, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.last_x = None
+        self.speed = None
+        self.state = None
+
+    def process(self, x, dt):
+        if self.last_x is None:
+            self.last_x = x[0].copy()
+            self.speed = np.zeros(x.shape[1])
+            self.state = x[0].copy()
+        previous = np.concatenate([self.last_x[None, :], x[:-1]])
+        raw_speed = (x - previous) / np.maximum(dt, MIN_DT)[:, None]
+
+        alpha_d = _smoothing_alpha(self.d_cutoff, dt)[:, None] * np.ones_like(x)
+        speed = linear_recurrence(1.0 - alpha_d, alpha_d * raw_speed, self.speed)
+
+        alpha = _smoothing_alpha(self.min_cutoff + self.beta * np.abs(speed), dt[:, None])
+        y = linear_recurrence(1.0 - alpha, alpha * x, self.state)
+
+        self.last_x = x[-1].copy()
+        self.speed = speed[-1].copy()
+        self.state = y[-1].copy()
+        return y
+
+
+class RateLimiter(Stage):
+    """
+    Limits how fast each channel may change (units per second), e.g. so a robot never
+    gets a full-reverse command in one step.
+
+    The output depends on whether the previous sample was limited, so unlike the other
+    stages this one runs a per-sample loop (on plain floats, one channel at a time).
+    """
+
+    def __init__(self, max_rate=8.0):
+        self.max_rate = max_rate
+        self.reset()
+
+    def reset(self):
+        self.state = None
+
+    def process(self, x, dt):
+        if self.state is None:
+            self.state = x[0].tolist()
+        steps = (dt * self.max_rate).tolist()
+        out = np.empty_like(x)
+        for c in range(x.shape[1]):
+            y = self.state[c]
+            column = []
+            append = column.append
+            for target, step in zip(x[:, c].tolist(), steps):
+                if target > y + step:
+                    y += step
+                elif target < y - step:
+                    y -= step
+                else:
+                    y = target
+                append(y)
+            out[:, c] = column
+            self.state[c] = y
+        return out
+
+
+class Prediction(Stage):
+    """
+    Extrapolates `horizon` seconds ahead from a smoothed velocity, to hide a known
+    downstream latency (e.g. the display or the radio link).
+    """
+
+    def __init__(self, horizon=0.016, time_constant=0.01, limit=1.0):
+        self.horizon = horizon
+        self.time_constant = time_constant
+        self.limit = limit
+        self.reset()
+
+    def reset(self):
+        self.last_x = None
+        self.velocity = None
+
+    def process(self, x, dt):
+        if self.last_x is None:
+            self.last_x = x[0].copy()
+            self.velocity = np.zeros(x.shape[1])
+        previous = np.concatenate([self.last_x[None, :], x[:-1]])
+        raw_velocity = (x - previous) / np.maximum(dt, MIN_DT)[:, None]
+        decay = np.exp(-dt / self.time_constant)[:, None] * np.ones_like(x)
+        velocity = linear_recurrence(decay, (1.0 - decay) * raw_velocity, self.velocity)
+        self.last_x = x[-1].copy()
+        self.velocity = velocity[-1].copy()
+        return np.clip(x + velocity * self.horizon, -self.limit, self.limit)
+
+
+class FilterPipeline:
+    """
+    Runs axis samples through a list of stages.
+
+    process(t, x) takes a batch: timestamps (n,) in seconds and values (n, channels),
+    and may be called again and again with the next batch; stage state carries over,
+    so feeding a session in batches gives the same output as one call.
+    process_session() resets and filters a whole recorded session in one call, for
+    tuning filters offline much faster than real time.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.last_t = None
+
+    def reset(self):
+        self.last_t = None
+        for stage in self.stages:
+            stage.reset()
+
+    def process(self, t, x):
+        t = np.asarray(t, dtype=np.float64)
+        x = np.array(x, dtype=np.float64, ndmin=2)
+        if len(t) == 0:
+            return x
+        dt = np.diff(t, prepend=t[0] if self.last_t is None else self.last_t)
+        np.maximum(dt, 0.0, out=dt)
+        for stage in self.stages:
+            x = stage.process(x, dt)
+        self.last_t = t[-1]
+        return x
+
+    def process_sample(self, t, values):
+        """
+        Filter one sample (a sequence of channel values), e.g. from a live event loop.
+        """
+        return self.process([t], [values])[0].tolist()
+
+    def process_session(self, t, x):
+        self.reset()
+        return self.process(t, x)
+
+
+def default_pipeline(trigger_rest=TRIGGER_REST):
+    """
+    Radial deadzone + curve on the sticks, a deadzone at the released end of the
+    triggers (`trigger_rest`: -1 for raw SDL values, 0 for calibrated ones), One-Euro
+    smoothing and a rate limit: a reasonable start for driving a robot.
+    """
+    return FilterPipeline([
+        Deadzone(0.08, "radial"),
+        Deadzone(0.03, "axial", channels=TRIGGER_CHANNELS, rest=trigger_rest),
+        ResponseCurve(1.6, "radial"),
+        OneEuro(min_cutoff=1.5, beta=0.3),
+        RateLimiter(8.0),
+    ])
+
+
+def session_axes(path, axis_count=6, device=0):
+    """
+    (t, x) arrays of every axis sample in a recording.py file: one row per axis change,
+    with the other axes carried forward. Read straight from the memory map.
+    """
+    from recording import HEADER, KIND_AXIS, KIND_MASK, DEVICE_SHIFT, Recording
+
+    dtype = np.dtype([("t", "<f8"), ("kind", "u1"), ("index", "u1"), ("hat_x", "i1"), ("hat_y", "i1"),
+                      ("value", "<f4")])
+    with Recording(path) as recording:
+        records = np.frombuffer(recording.map, dtype=dtype, count=len(recording), offset=HEADER.size).copy()
+    kind = records["kind"]
+    axes = records[((kind & KIND_MASK) == KIND_AXIS) & ((kind >> DEVICE_SHIFT) == device) &
+                   (records["index"] < axis_count)]
+
+    n = len(axes)
+    rows = np.arange(n)
+    index = axes["index"].astype(np.intp)
+    # Forward fill: for each axis, the row of its most recent change at or before each row
+    last_row = np.full((n, axis_count), -1)
+    last_row[rows, index] = rows
+    np.maximum.accumulate(last_row, axis=0, out=last_row)
+    values = axes["value"].astype(np.float64)
+    x = np.where(last_row >= 0, values[np.maximum(last_row, 0)], 0.0)
+    return axes["t"].copy(), x
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the default axis filter pipeline over a recorded session.")
+    parser.add_argument("recording", help="file written by recording.py / discover_inputs.py --format binary")
+    parser.add_argument("--device", type=int, default=0, help="pad slot in the recording")
+    parser.add_argument("--batch", type=int, default=0,
+                        help="also filter in batches of this many samples and compare with the one-call result")
+    args = parser.parse_args()
+
+    t, x = session_axes(args.recording, device=args.device)
+    if len(t) == 0:
+        print("No axis samples in this recording.")
+        sys.exit(1)
+    pipeline = default_pipeline()
+
+    start = time.perf_counter()
+    y = pipeline.process_session(t, x)
+    elapsed = time.perf_counter() - start
+    duration = max(t[-1] - t[0], 1e-9)
+    print(f"{len(t)} samples ({duration:.1f} s of input) filtered in {elapsed * 1000:.1f} ms "
+          f"({duration / elapsed:,.0f}x real time)")
+
+    # Sample-to-sample jitter before and after, per axis
+    before = np.abs(np.diff(x, axis=0)).mean(axis=0) if len(t) > 1 else np.zeros(x.shape[1])
+    after = np.abs(np.diff(y, axis=0)).mean(axis=0) if len(t) > 1 else np.zeros(y.shape[1])
+    for i, (b, a) in enumerate(zip(before, after)):
+        print(f"axis {i}: mean |step| {b:.5f} -> {a:.5f}")
+
+    if args.batch:
+        pipeline.reset()
+        parts = [pipeline.process(t[i:i + args.batch], x[i:i + args.batch]) for i in range(0, len(t), args.batch)]
+        print(f"batches of {args.batch}: max difference {np.abs(np.concatenate(parts) - y).max():.2e}")
+
+if __name__ == "__main__":
+    main()
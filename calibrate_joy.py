@@ -1,67 +1,154 @@
+import argparse
 import pygame
 import sys
-import os
+import time
+
+from controller_profile import load_profile, to_fraction
+from controller_state import ControllerHub
+from frame_pacing import FramePacer
+
+# Frame rate cap while the mouse is moving (idle = no frames at all)
+MAX_FPS = 60
+
+# Axis calibration (--axes): how long to sample the untouched pad, the shortest sweep
+# accepted, and how often the axes are sampled
+REST_SECONDS = 3.0
+MIN_SWEEP_SECONDS = 2.0
+SAMPLE_RATE = 250
+
+def calibrate_axes():
+    """
+    Sample every axis with the pad at rest, then while the user sweeps sticks and
+    triggers through their full range, and save the resulting AxisCalibration profile
+    (center, deadzone, range, noise and the correction tables).
+    """
+    import numpy as np
+    from axis_calibration import AxisCalibration, DEFAULT_PROFILE
+
+    axis_names = load_profile().axis_names
+    pygame.init()
+    screen = pygame.display.set_mode((640, 640))
+    pygame.display.set_caption("Xbox One Controller - Axis Calibration")
+    font = pygame.font.SysFont(None, 28)
+    clock = pygame.time.Clock()
+
+    pygame.joystick.init()
+    hub = ControllerHub()
+    hub.open_all()
+
+    phases = [
+        ("rest", "Put the controller down and don't touch it..."),
+        ("sweep", "Rotate both sticks fully and press both triggers all the way, then click"),
+    ]
+    samples = {"rest": [], "sweep": []}
+    phase = 0
+    phase_start = None
+    finish_requested = False
+    controller = None
+
+    while phase < len(phases):
+        clock.tick(SAMPLE_RATE)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            elif event.type == pygame.MOUSEBUTTONDOWN or (event.type == pygame.KEYDOWN and
+                                                          event.key == pygame.K_RETURN):
+                finish_requested = True
+            hub.handle_event(event)
+
+        if controller is None:
+            controllers = hub.controllers()
+            if controllers:
+                controller = controllers[0]
+                print(f"Calibrating axes of {controller.joystick.get_name()}")
+                phase_start = time.perf_counter()
+        elif controller.instance_id not in hub.devices:
+            print("Controller disconnected, calibration aborted.")
+            pygame.quit()
+            sys.exit()
+
+        lines = []
+        if controller is None:
+            lines.append("Waiting for a controller...")
+        else:
+            name, prompt = phases[phase]
+            state = controller.state
+            row = [state.get_axis(i) for i in range(controller.joystick.get_numaxes())]
+            samples[name].append(row)
+            elapsed = time.perf_counter() - phase_start
+            lines.append(prompt)
+            if name == "rest":
+                lines.append(f"{max(0.0, REST_SECONDS - elapsed):.1f} s")
+                done = elapsed >= REST_SECONDS
+            else:
+                done = finish_requested and elapsed >= MIN_SWEEP_SECONDS
+            if done:
+                phase += 1
+                phase_start = time.perf_counter()
+                finish_requested = False
+            for i, value in enumerate(row):
+                lines.append(f"{axis_names.get(i, i)}: {value:+.3f}")
+
+        # The window only needs ~30 redraws per second while sampling at SAMPLE_RATE
+        sample_count = len(samples["rest"]) + len(samples["sweep"])
+        if controller is None or sample_count % max(1, SAMPLE_RATE // 30) == 0:
+            screen.fill((255, 255, 255))
+            for i, line in enumerate(lines):
+                screen.blit(font.render(line, True, (0, 0, 0)), (20, 20 + i * 32))
+            pygame.display.flip()
+
+    calibration = AxisCalibration.from_samples(np.array(samples["rest"]), np.array(samples["sweep"]))
+    calibration.save(DEFAULT_PROFILE)
+    print(f"\nAxis calibration ({len(samples['rest'])} rest / {len(samples['sweep'])} sweep samples):\n")
+    print(calibration.summary(axis_names))
+    print(f"\nSaved to {DEFAULT_PROFILE}; joystick.py uses it automatically.")
+    pygame.quit()
 
 def main():
+    parser = argparse.ArgumentParser(description="Calibrate button positions on the image, or the axes.")
+    parser.add_argument("--axes", action="store_true",
+                        help="calibrate stick/trigger center, deadzone and range instead (needs NumPy)")
+    args = parser.parse_args()
+    if args.axes:
+        calibrate_axes()
+        return
+
     pygame.init()
 
-    # Create a window for displaying the controller image
-    screen_width, screen_height = 640, 640
+    # Clicks are converted to fractions of the image, so the saved positions work at
+    # any window size
+    profile = load_profile()
+    screen_width, screen_height = profile.window_size
     screen = pygame.display.set_mode((screen_width, screen_height))
     pygame.display.set_caption("Xbox One Controller - Button Position Calibration")
 
-    # Load the controller image
-    script_dir = os.path.dirname(os.path.realpath(__file__))
-    image_path = os.path.join(script_dir, "xbox_controller.png")
-
+    # The controller image, scaled and centered in the window
     try:
-        controller_img = pygame.image.load(image_path).convert_alpha()
-    except pygame.error as e:
-        print(f"Could not load image from '{image_path}': {e}")
+        layout = profile.layout((screen_width, screen_height))
+    except RuntimeError as e:
+        print(e)
         pygame.quit()
         sys.exit()
+    controller_img = layout.image
+    img_x, img_y = layout.image_rect[:2]
 
-    # If your image is bigger or smaller than the window, you can scale it.
-    img_width, img_height = controller_img.get_size()
-    if img_width > screen_width or img_height > screen_height:
-        # Example: scale down to fit the window
-        scale_factor = min(screen_width / img_width, screen_height / img_height)
-        new_w = int(img_width * scale_factor)
-        new_h = int(img_height * scale_factor)
-        controller_img = pygame.transform.scale(controller_img, (new_w, new_h))
-        img_width, img_height = new_w, new_h
-
-    # Center the image in the window (optional)
-    img_x = (screen_width - img_width) // 2
-    img_y = (screen_height - img_height) // 2
-
-    # These are the button names from your xbox_one_mapping:
-    # ("A": 0, "B": 1, "X": 2, etc.).
+    # The buttons of the profile's mapping, in index order ("A": 0, "B": 1, "X": 2, etc.).
     # We’ll ask you to click each one in sequence.
-    button_names = [
-        "A",
-        "B",
-        "X",
-        "Y",
-        "LB",
-        "RB",
-        "View(Back)",
-        "Menu(Start)",
-        "Xbox",
-        "LS_Click",
-        "RS_Click"
-    ]
+    button_names = sorted(profile.buttons, key=profile.buttons.get)
 
     # We'll store the clicked positions here
     button_positions = {}
 
     font = pygame.font.SysFont(None, 32)
+    pacer = FramePacer(max_fps=MAX_FPS)
 
     # For each button in sequence, ask user to click on it
     for bname in button_names:
         mapped = False
+        first_frame = True
         while not mapped:
-            for event in pygame.event.get():
+            for event in pacer.wait():
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
@@ -71,6 +158,11 @@ def main():
                     button_positions[bname] = (mx, my)
                     mapped = True
 
+            # The prompt only changes when we move on to the next button
+            if not first_frame:
+                continue
+            first_frame = False
+
             # Draw background and image
             screen.fill((255, 255, 255))
             screen.blit(controller_img, (img_x, img_y))
@@ -87,22 +179,37 @@ def main():
 
             pygame.display.flip()
 
-    # Once finished, we print out your dictionary in a neat format
-    print("\nCalibration complete! Copy/paste the following lines into your script:\n")
-    print("button_positions = {")
-    for bname, (px, py) in button_positions.items():
-        print(f'    "{bname}": ({px}, {py}),')
-    print("}")
-    print("\n(Use these coordinates in your highlight script.)")
+    # Once finished, save the positions into the profile every tool loads. Stick centers
+    # that were simply the stick click positions follow the new clicks.
+    normalized = {bname: to_fraction(layout.image_rect, pos) for bname, pos in button_positions.items()}
+    for stick, click in (("left_stick_center", "LS_Click"), ("right_stick_center", "RS_Click")):
+        if click in normalized and getattr(profile, stick) == profile.button_positions.get(click):
+            setattr(profile, stick, normalized[click])
+    profile.button_positions = normalized
+    try:
+        profile.save()
+    except OSError as e:
+        print(f"Could not save the profile: {e}")
+    print("\nCalibration complete!\n")
+    for bname, (px, py) in normalized.items():
+        print(f'    "{bname}": ({px:.4f}, {py:.4f}),')
+    print(f"\nSaved to {profile.path}; joystick.py and haptic.py use it automatically.")
 
     # Keep the window open so you can see final results (optional)
     print("Close the window to exit.")
+    first_frame = True
     while True:
-        for event in pygame.event.get():
+        for event in pacer.wait():
             if event.type == pygame.QUIT:
+                print(pacer.summary())
                 pygame.quit()
                 sys.exit()
 
+        # The final screen is static, draw it once and then just wait for QUIT
+        if not first_frame:
+            continue
+        first_frame = False
+
         screen.fill((255, 255, 255))
         screen.blit(controller_img, (img_x, img_y))
 
@@ -0,0 +1,359 @@
+import json
+import os
+import struct
+import time
+import zlib
+from collections import namedtuple
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+
+# Written by calibrate_joy.py, read by every tool. Without it the built-in Xbox One
+# layout below is used.
+DEFAULT_PROFILE = os.path.join(SCRIPT_DIR, "controller_profile.json")
+
+# Pre-scaled images + resolved coordinates, one file per (image, window size)
+CACHE_DIR = os.path.join(SCRIPT_DIR, ".layout_cache")
+CACHE_HEADER = struct.Struct("<4sHHHI")  # magic, version, image width, image height, metadata length
+CACHE_MAGIC = b"PDPL"
+CACHE_VERSION = 2
+
+# Built-in Xbox One profile
+XBOX_ONE_BUTTONS = {
+    "A": 0, "B": 1, "X": 2, "Y": 3,
+    "LB": 4, "RB": 5, "View(Back)": 6, "Menu(Start)": 7,
+    "Xbox": 8, "LS_Click": 9, "RS_Click": 10
+}
+XBOX_ONE_AXES = {"LX": 0, "LY": 1, "LT": 2, "RX": 3, "RY": 4, "RT": 5}
+XBOX_ONE_HATS = {"right": (1, 0), "left": (-1, 0), "up": (0, 1), "down": (0, -1)}
+
+# Button positions as fractions of the image's width and height, so they hold at any
+# window size ((0, 0) = top-left corner of the image, (1, 1) = bottom-right)
+XBOX_ONE_POSITIONS = {
+    "A": (0.7156, 0.5203),
+    "B": (0.7750, 0.4641),
+    "X": (0.6625, 0.4625),
+    "Y": (0.7156, 0.4078),
+    "LB": (0.2844, 0.3203),
+    "RB": (0.7125, 0.3219),
+    "View(Back)": (0.4406, 0.4641),
+    "Menu(Start)": (0.5625, 0.4641),
+    "Xbox": (0.5031, 0.3750),
+    "LS_Click": (0.2875, 0.4594),
+    "RS_Click": (0.6125, 0.5828),
+}
+STICK_RADIUS = 0.0469  # how far from center the green stick dot can move (fraction of image width)
+WINDOW_SIZE = (640, 640)  # initial window size of the tools (the windows can be resized)
+
+# Everything a visualizer needs to draw at one window size. image_rect is (x, y, w, h)
+# of the scaled image in the window; all other positions are window pixels.
+Layout = namedtuple("Layout", "size image image_rect button_positions left_stick_center "
+                              "right_stick_center stick_radius")
+
+
+def _point(value):
+    return (int(value[0]), int(value[1]))
+
+
+def _fraction(value):
+    return (float(value[0]), float(value[1]))
+
+
+def fit_rect(image_size, window_size):
+    """
+    (x, y, w, h) of the image scaled up or down to fit the window, centered.
+    """
+    iw, ih = image_size
+    w, h = window_size
+    k = min(w / iw, h / ih)
+    sw, sh = max(1, int(iw * k)), max(1, int(ih * k))
+    return ((w - sw) // 2, (h - sh) // 2, sw, sh)
+
+
+def to_pixels(rect, point):
+    return (int(round(rect[0] + point[0] * rect[2])), int(round(rect[1] + point[1] * rect[3])))
+
+
+def to_fraction(rect, pixel):
+    return (round((pixel[0] - rect[0]) / rect[2], 4), round((pixel[1] - rect[1]) / rect[3], 4))
+
+
+def image_size(path):
+    """
+    Width and height of an image file. PNGs are read from their header, without
+    decoding the pixels.
+    """
+    with open(path, "rb") as f:
+        header = f.read(24)
+    if header[:8] == b"\x89PNG\r\n\x1a\n" and header[12:16] == b"IHDR":
+        return struct.unpack(">II", header[16:24])
+    import pygame
+    return pygame.image.load(path).get_size()
+
+
+class ControllerProfile:
+    """
+    Button/axis/hat mappings and the calibrated positions on the controller image.
+
+    Positions and the stick radius are fractions of the image's size, so they don't
+    depend on the window: layout() places the image (scaled up or down) in a window of
+    any size and resolves every position for it.
+    """
+
+    def __init__(self, name="Xbox One", image="xbox_controller.png", buttons=None, axes=None, hats=None,
+                 button_positions=None, left_stick_center=None, right_stick_center=None,
+                 stick_radius=STICK_RADIUS, window_size=WINDOW_SIZE, path=None):
+        self.name = name
+        self.image = image
+        self.buttons = dict(buttons if buttons is not None else XBOX_ONE_BUTTONS)
+        self.axes = dict(axes if axes is not None else XBOX_ONE_AXES)
+        self.hats = {k: tuple(v) for k, v in (hats if hats is not None else XBOX_ONE_HATS).items()}
+        positions = button_positions if button_positions is not None else XBOX_ONE_POSITIONS
+        self.button_positions = {k: _fraction(v) for k, v in positions.items()}
+        # The stick "click" positions are a good default for the stick centers
+        self.left_stick_center = _fraction(left_stick_center or self.button_positions.get("LS_Click", (0, 0)))
+        self.right_stick_center = _fraction(right_stick_center or self.button_positions.get("RS_Click", (0, 0)))
+        self.stick_radius = float(stick_radius)
+        self.window_size = _point(window_size)
+        self.path = path
+
+    @property
+    def button_names(self):
+        return {index: name for name, index in self.buttons.items()}
+
+    @property
+    def axis_names(self):
+        return {index: name for name, index in self.axes.items()}
+
+    @property
+    def image_path(self):
+        # Relative to the profile file, or to the scripts (where the bundled image is)
+        if self.path:
+            path = os.path.join(os.path.dirname(self.path), self.image)
+            if os.path.exists(path):
+                return path
+        return os.path.join(SCRIPT_DIR, self.image)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "image": self.image,
+            "coordinates": "normalized",
+            "window_size": list(self.window_size),
+            "buttons": self.buttons,
+            "axes": self.axes,
+            "hats": {k: list(v) for k, v in self.hats.items()},
+            "button_positions": {k: list(v) for k, v in self.button_positions.items()},
+            "left_stick_center": list(self.left_stick_center),
+            "right_stick_center": list(self.right_stick_center),
+            "stick_radius": self.stick_radius,
+        }
+
+    @classmethod
+    def from_dict(cls, data, path=None):
+        profile = cls(name=data.get("name", "Xbox One"), image=data.get("image", "xbox_controller.png"),
+                      buttons=data.get("buttons"), axes=data.get("axes"), hats=data.get("hats"),
+                      window_size=data.get("window_size", WINDOW_SIZE), path=path)
+        if data.get("coordinates") == "normalized":
+            rect = (0.0, 0.0, 1.0, 1.0)
+            radius_scale = 1.0
+        else:
+            # Older profiles hold pixels of a `layout_size` window in which the image was
+            # only ever scaled down, and centered
+            layout_size = data.get("layout_size", WINDOW_SIZE)
+            iw, ih = image_size(profile.image_path)
+            if iw > layout_size[0] or ih > layout_size[1]:
+                rect = fit_rect((iw, ih), layout_size)
+            else:
+                rect = ((layout_size[0] - iw) // 2, (layout_size[1] - ih) // 2, iw, ih)
+            radius_scale = 1.0 / rect[2]
+            profile.window_size = _point(layout_size)
+
+        def convert(p):
+            return to_fraction(rect, p) if radius_scale != 1.0 else _fraction(p)
+
+        if data.get("button_positions") is not None:
+            profile.button_positions = {k: convert(v) for k, v in data["button_positions"].items()}
+        for stick, click in (("left_stick_center", "LS_Click"), ("right_stick_center", "RS_Click")):
+            value = data.get(stick)
+            setattr(profile, stick, convert(value) if value else profile.button_positions.get(click, (0.0, 0.0)))
+        if "stick_radius" in data:
+            profile.stick_radius = data["stick_radius"] * radius_scale
+        return profile
+
+    def save(self, path=None):
+        path = path or self.path or DEFAULT_PROFILE
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f, indent=4)
+            f.write("\n")
+        os.replace(tmp, path)
+        self.path = path
+
+    @classmethod
+    def load(cls, path=DEFAULT_PROFILE):
+        with open(path) as f:
+            return cls.from_dict(json.load(f), path)
+
+    # ---- Layout for a window size ----
+
+    def resolve(self, source_size, window_size):
+        """
+        Where the image goes and how big it is, plus every position in window pixels,
+        for an image of `source_size` shown in a `window_size` window.
+        """
+        rect = fit_rect(source_size, window_size)
+        return {
+            "image_rect": list(rect),
+            "button_positions": {name: list(to_pixels(rect, p)) for name, p in self.button_positions.items()},
+            "left_stick_center": list(to_pixels(rect, self.left_stick_center)),
+            "right_stick_center": list(to_pixels(rect, self.right_stick_center)),
+            "stick_radius": max(1, int(round(self.stick_radius * rect[2]))),
+        }
+
+    def load_image(self):
+        """
+        The full-size source image (not display-converted).
+        """
+        import pygame
+
+        try:
+            return pygame.image.load(self.image_path)
+        except (pygame.error, FileNotFoundError) as e:
+            raise RuntimeError(f"Could not load image from '{self.image_path}': {e}")
+
+    def cache_path(self, window_size):
+        """
+        Cache file for this image at this window size. The key covers the image's mtime
+        and size and everything in the profile that affects the layout, so editing either
+        one just makes a new entry.
+        """
+        try:
+            st = os.stat(self.image_path)
+        except OSError:
+            return None
+        layout_fields = json.dumps([self.button_positions, self.left_stick_center,
+                                    self.right_stick_center, self.stick_radius], sort_keys=True)
+        key = zlib.crc32(f"{st.st_mtime_ns}:{st.st_size}:{layout_fields}".encode())
+        stem = os.path.splitext(os.path.basename(self.image))[0]
+        return os.path.join(CACHE_DIR, f"{stem}_{window_size[0]}x{window_size[1]}_{key:08x}.bin")
+
+    def layout(self, window_size=None, use_cache=True, source=None):
+        """
+        The scaled, display-converted image and all positions resolved for `window_size`
+        (default: the profile's window size). Served from the disk cache when the image
+        and the profile haven't changed; otherwise the image is scaled once (from
+        `source` if given, else from the file) and cached for the next start.
+        """
+        import pygame
+
+        window_size = _point(window_size or self.window_size)
+        path = self.cache_path(window_size) if use_cache else None
+        cached = _read_cache(path) if path else None
+        if cached is not None:
+            meta, image = cached
+        else:
+            image = source if source is not None else self.load_image()
+            meta = self.resolve(image.get_size(), window_size)
+            size = tuple(meta["image_rect"][2:])
+            if size != image.get_size():
+                # smoothscale() only takes 24/32-bit surfaces (palette PNGs fall back to scale())
+                smooth = image.get_bitsize() in (24, 32)
+                image = (pygame.transform.smoothscale if smooth else pygame.transform.scale)(image, size)
+            if path:
+                _write_cache(path, meta, image)
+
+        # Converted to the display's pixel format once here, so every blit is a plain copy
+        if pygame.display.get_surface() is not None:
+            image = image.convert_alpha()
+        return Layout(window_size, image, tuple(meta["image_rect"]),
+                      {name: tuple(p) for name, p in meta["button_positions"].items()},
+                      tuple(meta["left_stick_center"]), tuple(meta["right_stick_center"]),
+                      meta["stick_radius"])
+
+
+def _read_cache(path):
+    import pygame
+
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < CACHE_HEADER.size:
+        return None
+    magic, version, w, h, meta_len = CACHE_HEADER.unpack_from(data, 0)
+    pixels_at = CACHE_HEADER.size + meta_len
+    if magic != CACHE_MAGIC or version != CACHE_VERSION or len(data) != pixels_at + w * h * 4:
+        return None
+    try:
+        meta = json.loads(data[CACHE_HEADER.size:pixels_at])
+    except ValueError:
+        return None
+    # frombuffer() wraps the bytes without copying; copy() gives the surface its own pixels
+    image = pygame.image.frombuffer(memoryview(data)[pixels_at:], (w, h), "RGBA").copy()
+    return meta, image
+
+
+def _write_cache(path, meta, image):
+    import pygame
+
+    meta_bytes = json.dumps(meta).encode()
+    w, h = image.get_size()
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Entries for older versions of this image/profile at this size are dead now
+        prefix = os.path.basename(path).rsplit("_", 1)[0] + "_"
+        for name in os.listdir(CACHE_DIR):
+            if name.startswith(prefix) and name != os.path.basename(path):
+                os.remove(os.path.join(CACHE_DIR, name))
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, w, h, len(meta_bytes)))
+            f.write(meta_bytes)
+            f.write(pygame.image.tobytes(image, "RGBA"))
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Could not write layout cache '{path}': {e}")
+
+
+def load_profile(path=DEFAULT_PROFILE):
+    """
+    The saved profile, or the built-in Xbox One one if calibrate_joy.py hasn't saved one.
+    """
+    if not os.path.exists(path):
+        return ControllerProfile()
+    try:
+        return ControllerProfile.load(path)
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        print(f"Ignoring controller profile '{path}': {e}")
+        return ControllerProfile()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show the controller profile and time the layout cache.")
+    parser.add_argument("path", nargs="?", default=DEFAULT_PROFILE)
+    parser.add_argument("--size", help="window size to resolve the layout for (default: the profile's)")
+    args = parser.parse_args()
+
+    profile = load_profile(args.path)
+    print(f"{profile.name} ({profile.path or 'built-in'})")
+    print(json.dumps(profile.to_dict(), indent=4))
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+
+    size = tuple(int(v) for v in args.size.lower().split("x")) if args.size else profile.window_size
+    pygame.display.init()
+    pygame.display.set_mode(size)
+    cache = profile.cache_path(size)
+    for label, use_cache in (("no cache", False), ("first run", True), ("cached", True)):
+        start = time.perf_counter()
+        layout = profile.layout(size, use_cache=use_cache)
+        print(f"layout {label:<9} {(time.perf_counter() - start) * 1000:7.2f} ms")
+    print(f"image rect {layout.image_rect}, cache file {cache}")
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
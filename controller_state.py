@@ -0,0 +1,373 @@
+import time
+from collections import deque, namedtuple
+from itertools import islice
+
+import pygame
+
+# One entry of the edge/event log:
+#   seq       - running sequence number (lets several readers track their position)
+#   timestamp - time.perf_counter() when the event was consumed (or the source's own
+#               timestamp on the same clock, e.g. the kernel's for evdev input)
+#   kind      - "button", "axis" or "hat"
+#   index     - pygame button / axis / hat index
+#   value     - new value (bool for buttons, float for axes, (x, y) for hats)
+InputEdge = namedtuple("InputEdge", "seq timestamp kind index value")
+
+
+def iter_bits(mask):
+    """
+    Indices of the set bits of `mask`, lowest first. Costs one step per set bit, however
+    high the bits are.
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class ButtonDispatcher:
+    """
+    Calls handlers on button press / release edges.
+
+    Handlers are registered per button (index, or name when a mapping is given) and
+    compiled into tables indexed by bit, plus a mask of the bits that have any handler.
+    dispatch() ANDs the edge masks with those and only visits the bits left over, so a
+    tick costs nothing for unchanged buttons however many actions are bound. Handlers
+    are called with the button index.
+    """
+
+    def __init__(self, mapping=None):
+        self.mapping = mapping or {}
+        self.press_handlers = {}    # index -> [handler, ...]
+        self.release_handlers = {}
+        self.press_table = ()
+        self.release_table = ()
+        self.press_bits = 0
+        self.release_bits = 0
+        self._compiled = True
+
+    def _index(self, button):
+        return self.mapping[button] if isinstance(button, str) else button
+
+    def on_press(self, button, handler):
+        self.press_handlers.setdefault(self._index(button), []).append(handler)
+        self._compiled = False
+
+    def on_release(self, button, handler):
+        self.release_handlers.setdefault(self._index(button), []).append(handler)
+        self._compiled = False
+
+    def compile(self):
+        """
+        Build the bit-indexed tables (done automatically on the next dispatch()).
+        """
+        def table(handlers):
+            size = max(handlers, default=-1) + 1
+            return tuple(tuple(handlers.get(i, ())) for i in range(size))
+
+        self.press_table = table(self.press_handlers)
+        self.release_table = table(self.release_handlers)
+        self.press_bits = sum(1 << i for i in self.press_handlers)
+        self.release_bits = sum(1 << i for i in self.release_handlers)
+        self._compiled = True
+
+    def dispatch(self, pressed, released):
+        if not self._compiled:
+            self.compile()
+        for index in iter_bits(pressed & self.press_bits):
+            for handler in self.press_table[index]:
+                handler(index)
+        for index in iter_bits(released & self.release_bits):
+            for handler in self.release_table[index]:
+                handler(index)
+
+    def dispatch_state(self, state):
+        """
+        Dispatch (and consume) the edges a ControllerState collected since the last call.
+        """
+        pressed, released = state.take_edges()
+        if pressed or released:
+            self.dispatch(pressed, released)
+
+
+class ControllerState:
+    """
+    Event-driven store for one controller.
+
+    Feed it every pygame event with handle_event(). It keeps the latest value of each
+    button, axis and hat together with the time it last changed, plus a bounded log of
+    every transition. Because it works from JOYBUTTONDOWN/UP, JOYAXISMOTION and
+    JOYHATMOTION instead of polling get_button()/get_axis()/get_hat() once per frame,
+    a press that starts and ends between two frames is still recorded, and the render
+    loop can run at any rate it likes.
+
+    With an AxisCalibration (see axis_calibration.py), axis values are corrected as they
+    are stored, so every reader sees calibrated values.
+
+    Buttons are kept as one integer bitmask (bit i = button i). Every change is found by
+    XOR against the previous mask and accumulated into `pressed_mask` / `released_mask`
+    until take_edges(), which is what a ButtonDispatcher consumes.
+    """
+
+    def __init__(self, joystick=None, log_size=1024, calibration=None):
+        # Only events for this joystick are accepted (None = accept every joystick)
+        self.instance_id = joystick.get_instance_id() if joystick is not None else None
+        self.calibration = calibration
+
+        self.button_mask = 0
+        self.axes = {}
+        self.hats = {}
+
+        # index -> perf_counter() time of the last change
+        self.button_times = {}
+        self.axis_times = {}
+        self.hat_times = {}
+
+        # Buttons that went down since the last end_frame(), so short taps still show up
+        self.latched_mask = 0
+
+        # Edges since the last take_edges()
+        self.pressed_mask = 0
+        self.released_mask = 0
+
+        self.log = deque(maxlen=log_size)
+        self.seq = 0
+        self.last_event_time = None
+
+        if joystick is not None:
+            self.sync(joystick)
+
+    def sync(self, joystick):
+        """
+        Seed the store from the joystick's current values (axes only send events once
+        they move, so without this a resting trigger would be unknown until touched).
+        """
+        now = time.perf_counter()
+        mask = 0
+        for i in range(joystick.get_numbuttons()):
+            if joystick.get_button(i):
+                mask |= 1 << i
+            self.button_times[i] = now
+        self.button_mask = mask
+        for i in range(joystick.get_numaxes()):
+            value = joystick.get_axis(i)
+            self.axes[i] = self.calibration.correct(i, value) if self.calibration is not None else value
+            self.axis_times[i] = now
+        for i in range(joystick.get_numhats()):
+            self.hats[i] = tuple(joystick.get_hat(i))
+            self.hat_times[i] = now
+
+    def handle_event(self, event):
+        """
+        Apply one pygame event. Returns True if it changed the controller state.
+        """
+        if event.type not in (pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP,
+                              pygame.JOYAXISMOTION, pygame.JOYHATMOTION):
+            return False
+        if self.instance_id is not None and getattr(event, "instance_id", self.instance_id) != self.instance_id:
+            return False
+
+        if event.type == pygame.JOYBUTTONDOWN:
+            self.set_button(event.button, True)
+        elif event.type == pygame.JOYBUTTONUP:
+            self.set_button(event.button, False)
+        elif event.type == pygame.JOYAXISMOTION:
+            self.set_axis(event.axis, event.value)
+        else:
+            self.set_hat(event.hat, event.value)
+        return True
+
+    # The setters below are what handle_event() uses; other input sources (evdev,
+    # replays) call them directly and may pass their own timestamp, which must be on
+    # the time.perf_counter() clock.
+
+    def set_button(self, index, pressed, timestamp=None):
+        bit = 1 << index
+        self.update_buttons(self.button_mask | bit if pressed else self.button_mask & ~bit, timestamp)
+
+    def update_buttons(self, mask, timestamp=None):
+        """
+        Set every button at once from a bitmask (e.g. from a polled or network source).
+        Only the bits that differ from the current mask are logged as edges.
+        """
+        changed = self.button_mask ^ mask
+        if not changed:
+            return
+        now = time.perf_counter() if timestamp is None else timestamp
+        pressed = changed & mask
+        self.button_mask = mask
+        self.latched_mask |= pressed
+        self.pressed_mask |= pressed
+        self.released_mask |= changed & ~mask
+        for index in iter_bits(changed):
+            self.button_times[index] = now
+            self._log(now, "button", index, bool(mask >> index & 1))
+
+    def set_axis(self, index, value, timestamp=None):
+        now = time.perf_counter() if timestamp is None else timestamp
+        if self.calibration is not None:
+            value = self.calibration.correct(index, value)
+        self.axes[index] = value
+        self.axis_times[index] = now
+        self._log(now, "axis", index, value)
+
+    def set_hat(self, index, value, timestamp=None):
+        now = time.perf_counter() if timestamp is None else timestamp
+        value = tuple(value)
+        self.hats[index] = value
+        self.hat_times[index] = now
+        self._log(now, "hat", index, value)
+
+    def _log(self, now, kind, index, value):
+        self.seq += 1
+        self.last_event_time = now
+        self.log.append(InputEdge(self.seq, now, kind, index, value))
+
+    def get_button(self, index):
+        return bool(self.button_mask >> index & 1)
+
+    def get_axis(self, index):
+        return self.axes.get(index, 0.0)
+
+    def get_hat(self, index):
+        return self.hats.get(index, (0, 0))
+
+    def get_numhats(self):
+        return len(self.hats)
+
+    def button_active(self, index):
+        """
+        True if the button is down now or was pressed at any point since the last
+        end_frame(). Use this for drawing so taps shorter than a frame stay visible.
+        """
+        return bool((self.button_mask | self.latched_mask) >> index & 1)
+
+    def active_mask(self):
+        """
+        Bitmask form of button_active() for all buttons at once.
+        """
+        return self.button_mask | self.latched_mask
+
+    def take_edges(self):
+        """
+        Return (pressed_mask, released_mask) accumulated since the previous call and reset
+        them. A tap that started and ended in between shows up in both masks.
+        """
+        edges = (self.pressed_mask, self.released_mask)
+        self.pressed_mask = 0
+        self.released_mask = 0
+        return edges
+
+    def end_frame(self):
+        """
+        Call once after each rendered frame to clear the latched presses.
+        """
+        self.latched_mask = 0
+
+    def edges_since(self, seq):
+        """
+        Return the logged transitions newer than `seq` (oldest first). Pass the seq of
+        the last edge you handled; entries that already fell out of the log are lost.
+        """
+        newer = self.seq - seq
+        if newer <= 0:
+            return []
+        return list(islice(self.log, max(0, len(self.log) - newer), None))
+
+
+# One connected pad as tracked by ControllerHub:
+#   slot     - small stable number (0, 1, 2 ...) used for tile order and recordings;
+#              freed when the pad is unplugged and reused by the next one
+#   joystick - the pygame Joystick
+#   state    - its ControllerState
+ConnectedController = namedtuple("ConnectedController", "slot instance_id joystick state")
+
+
+class ControllerHub:
+    """
+    Tracks every connected controller from one shared event loop.
+
+    Pass each pygame event to handle_event(): JOYDEVICEADDED / JOYDEVICEREMOVED open and
+    close pads on the fly (no restart needed, and no pad needed at startup), and every
+    JOY* input event is routed to the ControllerState of the pad it came from.
+    `version` increases on each hotplug so tools know when to rebuild their layout, and
+    the callbacks in `on_added` / `on_removed` are called with the ConnectedController.
+    Hotplug messages go to `log` (print by default). `calibration` is given to every
+    pad's ControllerState.
+    """
+
+    def __init__(self, log_size=1024, log=print, calibration=None):
+        self.log_size = log_size
+        self.log = log
+        self.calibration = calibration
+        self.devices = {}  # instance_id -> ConnectedController
+        self.version = 0
+        self.on_added = []
+        self.on_removed = []
+
+    def open_all(self):
+        """
+        Open every pad that is already connected. Optional: SDL also sends
+        JOYDEVICEADDED for them once the event loop starts.
+        """
+        for device_index in range(pygame.joystick.get_count()):
+            self._add(device_index)
+
+    def _add(self, device_index):
+        joystick = pygame.joystick.Joystick(device_index)
+        joystick.init()
+        instance_id = joystick.get_instance_id()
+        if instance_id in self.devices:
+            return None
+        used = {c.slot for c in self.devices.values()}
+        slot = next(i for i in range(len(used) + 1) if i not in used)
+        controller = ConnectedController(slot, instance_id, joystick,
+                                         ControllerState(joystick, log_size=self.log_size,
+                                                         calibration=self.calibration))
+        self.devices[instance_id] = controller
+        self.version += 1
+        for callback in self.on_added:
+            callback(controller)
+        return controller
+
+    def _remove(self, instance_id):
+        controller = self.devices.pop(instance_id, None)
+        if controller is not None:
+            self.version += 1
+            for callback in self.on_removed:
+                callback(controller)
+        return controller
+
+    def handle_event(self, event):
+        """
+        Apply one pygame event. Returns True if a pad was added/removed or its state changed.
+        """
+        if event.type == pygame.JOYDEVICEADDED:
+            controller = self._add(event.device_index)
+            if controller is not None and self.log:
+                self.log(f"Connected joystick {controller.slot}: {controller.joystick.get_name()}")
+            return controller is not None
+        if event.type == pygame.JOYDEVICEREMOVED:
+            controller = self._remove(event.instance_id)
+            if controller is not None and self.log:
+                self.log(f"Disconnected joystick {controller.slot}: {controller.joystick.get_name()}")
+            return controller is not None
+
+        instance_id = getattr(event, "instance_id", None)
+        if instance_id is None:
+            return False
+        controller = self.devices.get(instance_id)
+        return controller is not None and controller.state.handle_event(event)
+
+    def controllers(self):
+        """
+        Connected pads ordered by slot.
+        """
+        return sorted(self.devices.values(), key=lambda c: c.slot)
+
+    def __len__(self):
+        return len(self.devices)
+
+    def end_frame(self):
+        for controller in self.devices.values():
+            controller.state.end_frame()
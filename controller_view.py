@@ -0,0 +1,182 @@
+import math
+from collections import OrderedDict, namedtuple
+
+import pygame
+
+from controller_state import iter_bits
+
+
+def tile_rects(count, area):
+    """
+    Split `area` into a near-square grid with room for `count` controllers and return
+    one Rect per controller (row by row). One controller gets the whole area.
+    """
+    area = pygame.Rect(area)
+    if count <= 0:
+        return []
+    cols = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / cols)
+    tile_w = area.width // cols
+    tile_h = area.height // rows
+    return [pygame.Rect(area.x + (i % cols) * tile_w, area.y + (i // cols) * tile_h, tile_w, tile_h)
+            for i in range(count)]
+
+
+# Sprite sizes as fractions of the image width (15 and 8 px on the 640 px image)
+HIGHLIGHT_RADIUS = 0.0234
+DOT_RADIUS = 0.0125
+HIGHLIGHT_COLOR = (255, 0, 0)
+DOT_COLOR = (0, 255, 0)
+
+# How many tile sizes keep their assets (dragging a window edge goes through many sizes)
+ASSET_CACHE_SIZE = 8
+
+# Everything drawn for one tile size: the profile Layout (scaled image + resolved
+# positions), the font, the text line step and the two pre-rendered sprites
+TileAssets = namedtuple("TileAssets", "layout font line_step highlight dot")
+
+
+def circle_sprite(color, radius):
+    """
+    A filled circle on a transparent surface, the same pixels pygame.draw.circle would
+    produce at (radius, radius).
+    """
+    sprite = pygame.Surface((radius * 2 + 1, radius * 2 + 1), pygame.SRCALPHA)
+    pygame.draw.circle(sprite, color, (radius, radius), radius)
+    return sprite.convert_alpha() if pygame.display.get_surface() is not None else sprite
+
+
+class ControllerView:
+    """
+    Draws one controller's state (button highlights, stick dots, debug text) into a tile
+    of the window through a DirtyRenderer.
+
+    Positions come from the ControllerProfile as fractions of the image, so the view
+    works at any tile size: one pad filling a resized window or a grid of eight. The
+    scaled image, resolved positions, font and sprites are built once per tile size
+    (assets_for) and every frame only blits them.
+    """
+
+    def __init__(self, profile, font_size=24):
+        self.profile = profile
+        self.button_mapping = profile.buttons
+        self.axis_mapping = profile.axes
+        # Button index -> name, so drawing only visits the buttons that are down
+        self.button_names = profile.button_names
+        self.font_size = font_size
+
+        self.assets = OrderedDict()  # (w, h) -> TileAssets, least recently used first
+        self.source_image = None
+        self.fonts = {}
+        self.builds = 0
+
+    def font_for(self, scale):
+        size = max(12, int(round(self.font_size * min(scale, 1.0))))
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.SysFont(None, size)
+        return font
+
+    def assets_for(self, size):
+        size = (size[0], size[1])
+        assets = self.assets.get(size)
+        if assets is not None:
+            self.assets.move_to_end(size)
+            return assets
+
+        if not self.assets and self.source_image is None:
+            # First size (the one the tool starts with): served from the disk cache
+            layout = self.profile.layout(size)
+        else:
+            # Later sizes (resizes, more pads) are scaled from the source image kept in memory
+            if self.source_image is None:
+                self.source_image = self.profile.load_image()
+            layout = self.profile.layout(size, use_cache=False, source=self.source_image)
+
+        image_w = layout.image_rect[2]
+        scale = min(size[0] / self.profile.window_size[0], size[1] / self.profile.window_size[1])
+        assets = TileAssets(layout, self.font_for(scale), int(round(25 * min(scale, 1.0))) or 1,
+                            circle_sprite(HIGHLIGHT_COLOR, max(2, int(round(HIGHLIGHT_RADIUS * image_w)))),
+                            circle_sprite(DOT_COLOR, max(2, int(round(DOT_RADIUS * image_w)))))
+        self.assets[size] = assets
+        self.builds += 1
+        if len(self.assets) > ASSET_CACHE_SIZE:
+            self.assets.popitem(last=False)
+        return assets
+
+    def draw_background(self, surface, tile):
+        """
+        Blit the controller image, scaled to the tile, onto a background surface.
+        """
+        layout = self.assets_for(tile.size).layout
+        surface.blit(layout.image, (tile.x + layout.image_rect[0], tile.y + layout.image_rect[1]))
+
+    def compose_background(self, size, tiles, fill=(255, 255, 255)):
+        background = pygame.Surface(size).convert()
+        background.fill(fill)
+        for tile in tiles:
+            self.draw_background(background, tile)
+        return background
+
+    def draw(self, renderer, key, state, tile, label=None):
+        """
+        Describe this frame's dynamic items for `state` to the renderer. `key` keeps the
+        items of different controllers apart.
+        """
+        assets = self.assets_for(tile.size)
+        layout = assets.layout
+        font = assets.font
+        line_step = assets.line_step
+
+        # Highlight pressed buttons (sprites are centered on the position)
+        highlight = assets.highlight
+        offset_x = tile.x - highlight.get_width() // 2
+        offset_y = tile.y - highlight.get_height() // 2
+        for bindex in iter_bits(state.active_mask()):
+            bname = self.button_names.get(bindex)
+            pos = layout.button_positions.get(bname)
+            if pos is not None:
+                renderer.blit((key, "button", bname), highlight, (offset_x + pos[0], offset_y + pos[1]))
+
+        # Sticks + triggers
+        lx = state.get_axis(self.axis_mapping["LX"])
+        ly = state.get_axis(self.axis_mapping["LY"])
+        rx = state.get_axis(self.axis_mapping["RX"])
+        ry = state.get_axis(self.axis_mapping["RY"])
+        lt = state.get_axis(self.axis_mapping["LT"])
+        rt = state.get_axis(self.axis_mapping["RT"])
+
+        dot = assets.dot
+        offset_x = tile.x - dot.get_width() // 2
+        offset_y = tile.y - dot.get_height() // 2
+        radius = layout.stick_radius
+        left_stick_pos = (
+            offset_x + layout.left_stick_center[0] + int(lx * radius),
+            offset_y + layout.left_stick_center[1] + int(ly * radius)
+        )
+        renderer.blit((key, "left_stick"), dot, left_stick_pos)
+        right_stick_pos = (
+            offset_x + layout.right_stick_center[0] + int(rx * radius),
+            offset_y + layout.right_stick_center[1] + int(ry * radius)
+        )
+        renderer.blit((key, "right_stick"), dot, right_stick_pos)
+
+        # Debug text, split into static labels and numbers so every piece is rendered
+        # once and then served from the text cache (.2f already quantizes the values)
+        trigger_text = ("LT=", f"{lt:.2f}", ", RT=", f"{rt:.2f}")
+        stick_text = ("L=(", f"{lx:.2f}", ",", f"{ly:.2f}", "), R=(", f"{rx:.2f}", ",", f"{ry:.2f}", ")")
+        x = tile.x + 10
+        y = tile.y + 10
+        renderer.text((key, "trigger_text"), font, trigger_text, (0, 0, 0), (x, y))
+        y += line_step
+        renderer.text((key, "stick_text"), font, stick_text, (0, 0, 0), (x, y))
+        y += line_step
+
+        # Hats (D-pad)
+        for i in range(state.get_numhats()):
+            renderer.text((key, "hat_text", i), font, ("Hat ", str(i), " = ", str(state.get_hat(i))),
+                          (0, 0, 0), (x, y))
+            y += line_step
+
+        if label:
+            renderer.text((key, "label"), font, label, (0, 0, 128), (x, tile.bottom - line_step))
@@ -0,0 +1,325 @@
+import argparse
+import ctypes
+import os
+import struct
+from collections import namedtuple
+
+# Finds the /dev/input/eventN node of a pad instead of hardcoding one. Node numbers
+# change across reboots, hubs and replugs, so haptic.py, evdev_input.py and
+# signal_quality.py ask this module which node belongs to the joystick (or to the first
+# gamepad) they are using.
+#
+# Everything is read from sysfs (name, ids, capability bitmasks), so no device has to be
+# opened (or be readable) to be listed, and neither pygame nor evdev is imported here.
+
+DEV_INPUT = "/dev/input"
+SYS_CLASS_INPUT = "/sys/class/input"
+
+# Event codes from linux/input-event-codes.h
+BTN_GAMEPAD = 0x130
+FF_RUMBLE = 0x50
+FF_PERIODIC = 0x51
+
+# inotify(7) flags: the index only cares about nodes appearing, disappearing or being
+# renamed (udev creates the node and then fixes its permissions, which we don't cache)
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+
+# sysfs capability bitmasks are printed as space-separated hex words of a C long
+LONG_BITS = struct.calcsize("l") * 8
+
+InputNode = namedtuple("InputNode", "path name bustype vendor product version phys uniq ff gamepad")
+
+
+def parse_bitmask(text):
+    """
+    Set bit numbers of a sysfs capability bitmask ("120013 0 ..." = most significant
+    word first).
+    """
+    bits = set()
+    for i, word in enumerate(reversed(text.split())):
+        value = int(word, 16)
+        while value:
+            low = value & -value
+            bits.add(i * LONG_BITS + low.bit_length() - 1)
+            value ^= low
+    return bits
+
+
+def parse_guid(guid):
+    """
+    (bustype, vendor, product, version) from an SDL joystick GUID (the hex string of
+    pygame's Joystick.get_guid()), or None for GUIDs that carry a name instead of USB
+    ids (devices without a vendor id).
+
+    Linux GUIDs are little-endian 16-bit words: bus, name CRC, vendor, 0, product, 0,
+    version, driver signature/data.
+    """
+    try:
+        data = bytes.fromhex(guid)
+    except (TypeError, ValueError):
+        return None
+    if len(data) != 16:
+        return None
+    bus, _crc, vendor, _, product, _, version = struct.unpack("<7H", data[:14])
+    if vendor == 0:
+        return None
+    return bus, vendor, product, version
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _read_hex(path):
+    try:
+        return int(_read(path), 16)
+    except ValueError:
+        return 0
+
+
+def scan(dev_root=DEV_INPUT, sys_root=SYS_CLASS_INPUT):
+    """
+    Every event node that exists, in node order, as InputNode tuples.
+    """
+    try:
+        entries = [e for e in os.listdir(sys_root) if e.startswith("event") and e[5:].isdigit()]
+    except OSError:
+        return []
+    nodes = []
+    for entry in sorted(entries, key=lambda e: int(e[5:])):
+        path = os.path.join(dev_root, entry)
+        if not os.path.exists(path):
+            continue
+        device = os.path.join(sys_root, entry, "device")
+        nodes.append(InputNode(
+            path=path,
+            name=_read(os.path.join(device, "name")),
+            bustype=_read_hex(os.path.join(device, "id", "bustype")),
+            vendor=_read_hex(os.path.join(device, "id", "vendor")),
+            product=_read_hex(os.path.join(device, "id", "product")),
+            version=_read_hex(os.path.join(device, "id", "version")),
+            phys=_read(os.path.join(device, "phys")),
+            uniq=_read(os.path.join(device, "uniq")),
+            ff=frozenset(parse_bitmask(_read(os.path.join(device, "capabilities", "ff")))),
+            gamepad=BTN_GAMEPAD in parse_bitmask(_read(os.path.join(device, "capabilities", "key"))),
+        ))
+    return nodes
+
+
+class _DirectoryWatch:
+    """
+    Non-blocking inotify watch on one directory. changed() drains the queued events and
+    says whether there were any, so checking costs a single read() that returns EAGAIN.
+    """
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, os.strerror(err), path)
+
+    def changed(self):
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 4096)
+            except BlockingIOError:
+                return changed
+            if not data:
+                return changed
+            changed = True
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class DeviceIndex:
+    """
+    Cached list of the event nodes, rescanned only when /dev/input changes.
+
+    An inotify watch on /dev/input tells us when nodes are created or removed (a pad
+    plugged in, unplugged or renumbered); until then every lookup reuses the last scan.
+    Where inotify isn't available the directory's mtime is compared instead, which
+    changes on the same operations but costs a stat() per lookup.
+    """
+
+    def __init__(self, dev_root=DEV_INPUT, sys_root=SYS_CLASS_INPUT, watch=True):
+        self.dev_root = dev_root
+        self.sys_root = sys_root
+        self.scans = 0
+        self._nodes = None
+        self._mtime = None
+        self.watch = None
+        if watch:
+            try:
+                self.watch = _DirectoryWatch(dev_root)
+            except (OSError, AttributeError):
+                # No /dev/input yet, or not Linux (no inotify_init1 in libc)
+                self.watch = None
+
+    def _stale(self):
+        if self.watch is not None:
+            # Drain before scanning: anything that changes during the scan is seen next time
+            return self.watch.changed() or self._nodes is None
+        try:
+            mtime = os.stat(self.dev_root).st_mtime_ns
+        except OSError:
+            mtime = None
+        if self._nodes is None or mtime != self._mtime:
+            self._mtime = mtime
+            return True
+        return False
+
+    def nodes(self):
+        if self._stale():
+            self._nodes = scan(self.dev_root, self.sys_root)
+            self.scans += 1
+        return self._nodes
+
+    def invalidate(self):
+        self._nodes = None
+
+    def close(self):
+        if self.watch is not None:
+            self.watch.close()
+            self.watch = None
+
+    def gamepads(self, need_ff=False):
+        return [n for n in self.nodes() if n.gamepad and (not need_ff or n.ff)]
+
+    def find(self, guid=None, name=None, occurrence=0, need_ff=False):
+        """
+        The node of the joystick with this SDL GUID and/or name, or with neither, the
+        first gamepad. `occurrence` picks among identical pads (same ids): the n-th pad
+        with this GUID gets the n-th matching node in node order. With need_ff only nodes
+        with force feedback are considered. Returns an InputNode or None.
+        """
+        ids = parse_guid(guid) if guid else None
+        candidates = []
+        for node in self.nodes():
+            if need_ff and not node.ff:
+                continue
+            if ids is not None:
+                bus, vendor, product, version = ids
+                if (node.vendor, node.product) != (vendor, product):
+                    continue
+                # Same USB ids: prefer the exact bus / firmware version / name
+                score = (node.bustype == bus) + (node.version == version) + (node.name == name)
+            elif name:
+                if node.name != name:
+                    continue
+                score = 0
+            elif node.gamepad:
+                score = 0
+            else:
+                continue
+            candidates.append((score, node))
+
+        # Pads like the DualShock 4 also have motion-sensor / touchpad nodes with the same
+        # ids; those have no gamepad buttons
+        if any(node.gamepad for _, node in candidates):
+            candidates = [(score, node) for score, node in candidates if node.gamepad]
+        candidates.sort(key=lambda c: -c[0])  # stable: node order within a score
+        if occurrence < len(candidates):
+            return candidates[occurrence][1]
+        return None
+
+
+###################################
+# Shared index
+###################################
+_index = None
+
+def get_index():
+    """
+    The process-wide DeviceIndex (created, and /dev/input scanned, on first use).
+    """
+    global _index
+    if _index is None:
+        _index = DeviceIndex()
+    return _index
+
+
+def _occurrence(joystick):
+    """
+    How many joysticks with the same GUID come before `joystick` (0 for the first).
+    """
+    import pygame
+
+    guid = joystick.get_guid()
+    count = 0
+    for i in range(joystick.get_id()):
+        try:
+            if pygame.joystick.Joystick(i).get_guid() == guid:
+                count += 1
+        except pygame.error:
+            pass
+    return count
+
+
+def find_event_device(joystick=None, need_ff=False):
+    """
+    Path of the event node of `joystick` (an open pygame Joystick) or, without one, of
+    the first gamepad; with need_ff, of a node that can rumble. None if there's no match.
+    """
+    if joystick is not None:
+        node = get_index().find(joystick.get_guid(), joystick.get_name(),
+                                occurrence=_occurrence(joystick), need_ff=need_ff)
+    else:
+        node = get_index().find(need_ff=need_ff)
+    return node.path if node is not None else None
+
+
+def describe(node):
+    effects = []
+    if FF_RUMBLE in node.ff:
+        effects.append("rumble")
+    if FF_PERIODIC in node.ff:
+        effects.append("periodic")
+    access = "rw" if os.access(node.path, os.R_OK | os.W_OK) else "r" if os.access(node.path, os.R_OK) else "-"
+    kind = "gamepad" if node.gamepad else "input"
+    return (f"{node.path:<20} {node.vendor:04x}:{node.product:04x} {kind:<7} "
+            f"ff={','.join(effects) or '-':<16} {access:<2}  {node.name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List event nodes and the pad each joystick maps to.")
+    parser.add_argument("--all", action="store_true", help="list every event node, not just gamepads")
+    parser.add_argument("--pygame", action="store_true", help="also match the joysticks SDL sees")
+    args = parser.parse_args()
+
+    index = get_index()
+    nodes = index.nodes() if args.all else index.gamepads()
+    if not nodes:
+        print(f"No {'event nodes' if args.all else 'gamepads'} found under {index.dev_root}")
+    for node in nodes:
+        print(describe(node))
+
+    if args.pygame:
+        import pygame
+
+        pygame.joystick.init()
+        for i in range(pygame.joystick.get_count()):
+            joystick = pygame.joystick.Joystick(i)
+            path = find_event_device(joystick)
+            rumble = find_event_device(joystick, need_ff=True)
+            print(f"joystick {i}: {joystick.get_name()} -> {path or 'no event node found'}"
+                  f"{' (rumble)' if rumble and rumble == path else ''}")
+
+if __name__ == "__main__":
+    main()
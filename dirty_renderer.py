@@ -0,0 +1,172 @@
+import time
+
+import pygame
+
+# Frame profiler phase charged for drawing each kind of item
+PROFILE_PHASES = {"circle": "highlights", "blit": "highlights", "text": "text"}
+
+
+class DirtyRenderer:
+    """
+    Redraws only the parts of the window that changed since the last frame.
+
+    The static part of the picture (white fill, controller image, anything else that
+    never moves) is composed once into `background`. Every frame the caller describes
+    the dynamic items (highlight circles, stick dots, text) with circle() / text() /
+    blit(), each under a stable key. end_frame() compares them against the previous
+    frame, restores the background under items that moved, changed or disappeared,
+    redraws whatever overlaps those areas and returns the list of rects to hand to
+    pygame.display.update(). An idle controller therefore costs no blits at all.
+
+    With full_redraw=True every frame repaints the whole window instead (the old
+    behaviour), which is handy for comparing the two modes. Pass a TextCache to reuse
+    rendered text surfaces across frames. With a FrameProfiler (frame_profiler.py) the
+    background restores and the item draws of end_frame() are timed separately.
+    """
+
+    def __init__(self, screen, background, full_redraw=False, text_cache=None, profiler=None):
+        self.screen = screen
+        self.background = background
+        self.full_redraw = full_redraw
+        self.text_cache = text_cache
+        self.profiler = profiler if profiler is not None and profiler.enabled else None
+
+        # key -> (signature, rect, draw function) of the last frame
+        self.previous = {}
+        self.current = {}
+        self.needs_full = True
+
+    def invalidate(self):
+        """
+        Force a full repaint on the next end_frame() (window exposed, background swapped).
+        """
+        self.needs_full = True
+
+    def set_background(self, background):
+        self.background = background
+        self.invalidate()
+
+    def begin_frame(self):
+        self.current = {}
+
+    def circle(self, key, color, pos, radius):
+        pos = (int(pos[0]), int(pos[1]))
+        rect = pygame.Rect(pos[0] - radius, pos[1] - radius, radius * 2 + 1, radius * 2 + 1)
+
+        def draw(surface):
+            pygame.draw.circle(surface, color, pos, radius)
+
+        self.current[key] = (("circle", color, pos, radius), rect, draw)
+
+    def text(self, key, font, text, color, pos):
+        """
+        `text` is a string or a sequence of parts (e.g. a static label and a value)
+        laid out left to right. With a text_cache each part is rendered once and reused.
+        """
+        parts = (text,) if isinstance(text, str) else tuple(text)
+
+        if self.text_cache is not None:
+            surfaces = self.text_cache.render_parts(font, parts, color)
+            width = sum(s.get_width() for s in surfaces)
+            height = max(s.get_height() for s in surfaces)
+        else:
+            # font.size() only measures, so an unchanged line is never rasterized
+            surfaces = []
+            width, height = font.size("".join(parts))
+        rect = pygame.Rect(pos[0], pos[1], width, height)
+
+        def draw(surface):
+            if not surfaces:
+                surfaces.append(font.render("".join(parts), True, color))
+            x = rect.x
+            for part_surf in surfaces:
+                surface.blit(part_surf, (x, rect.y))
+                x += part_surf.get_width()
+
+        self.current[key] = (("text", id(font), parts, color), rect, draw)
+
+    def blit(self, key, surface_to_draw, pos, signature=None):
+        rect = surface_to_draw.get_rect(topleft=pos)
+        if signature is None:
+            signature = id(surface_to_draw)
+
+        def draw(surface):
+            surface.blit(surface_to_draw, rect)
+
+        self.current[key] = (("blit", signature), rect, draw)
+
+    def end_frame(self):
+        """
+        Draw the changes and return the list of rects that must be pushed to the display.
+        """
+        screen_rect = self.screen.get_rect()
+
+        if self.full_redraw or self.needs_full:
+            dirty = [screen_rect]
+            self.needs_full = False
+        else:
+            dirty = []
+            for key, (signature, rect, _) in self.current.items():
+                old = self.previous.get(key)
+                if old is None:
+                    dirty.append(rect)
+                elif old[0] != signature or old[1] != rect:
+                    dirty.append(old[1])
+                    dirty.append(rect)
+            for key, (_, rect, _) in self.previous.items():
+                if key not in self.current:
+                    dirty.append(rect)
+            dirty = _merge_rects([r.clip(screen_rect) for r in dirty if r.colliderect(screen_rect)])
+
+        items = list(self.current.values())
+        if self.profiler is not None:
+            self._draw_profiled(dirty, items)
+        else:
+            for area in dirty:
+                self.screen.set_clip(area)
+                self.screen.blit(self.background, area, area)
+                for _, rect, draw in items:
+                    if rect.colliderect(area):
+                        draw(self.screen)
+        self.screen.set_clip(None)
+
+        self.previous = self.current
+        self.current = {}
+        return dirty
+
+    def _draw_profiled(self, dirty, items):
+        """
+        The drawing loop of end_frame(), charging the background restores and each kind
+        of item to its own profiler phase.
+        """
+        profiler = self.profiler
+        clock = time.perf_counter
+        for area in dirty:
+            self.screen.set_clip(area)
+            start = clock()
+            self.screen.blit(self.background, area, area)
+            profiler.add("background", clock() - start)
+            for signature, rect, draw in items:
+                if rect.colliderect(area):
+                    start = clock()
+                    draw(self.screen)
+                    profiler.add(PROFILE_PHASES[signature[0]], clock() - start)
+
+
+def _merge_rects(rects):
+    """
+    Fold overlapping rects together so no pixel is restored and redrawn twice.
+    """
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        changed = True
+        while changed:
+            changed = False
+            for i, other in enumerate(merged):
+                if rect.colliderect(other):
+                    rect.union_ip(merged.pop(i))
+                    changed = True
+                    break
+        merged.append(rect)
+    return merged
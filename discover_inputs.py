@@ -1,7 +1,234 @@
-import pygame
+import argparse
+import json
+import os
 import sys
+import time
+
+# Keep pygame's import banner off stdout, which carries the data in headless mode
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+
+from controller_state import ControllerHub
+from controller_view import tile_rects
+from frame_pacing import FramePacer
+from frame_profiler import NULL_PROFILER, finish, make_profiler
+from text_cache import TextCache, quantize
+
+# Frame rate cap while the controller is in use (idle = no frames at all)
+MAX_FPS = 60
+
+# Axis values are snapped to this step before being shown, so resting-stick
+# jitter doesn't produce a new string (and a new glyph rasterization) every frame
+AXIS_TEXT_STEP = 0.005
+
+# Headless mode: output is written in batches of this many changes, or at least
+# this often while the pad is quiet
+HEADLESS_BATCH = 64
+HEADLESS_FLUSH_INTERVAL = 0.1  # seconds
+
+# Time the phases of every frame (events, joystick reads, text, flip), show them in an
+# overlay and write the histograms to PROFILE_EXPORT on exit (or set PDP_PROFILE=1)
+PROFILE_FRAMES = False
+PROFILE_EXPORT = "discover_inputs_profile.hgrm"
+
+
+def encode_ndjson(t, joy, kind, index, value):
+    if kind == "hat":
+        value = list(value)
+    return json.dumps({"t": round(t, 6), "joy": joy, "type": kind, "index": index, "value": value},
+                      separators=(",", ":")) + "\n"
+
+
+def run_headless(output, fmt):
+    """
+    Stream every input change of every pad without opening a window (SDL dummy video driver).
+
+    Blocks in pygame.event.wait(), so the output rate is set by the pads' reports, not by
+    a frame rate. Changes are written as NDJSON lines or binary records (the recording.py
+    format, with the pad's slot in each record) and flushed in batches. Pads can be
+    plugged in and out while it runs; each new pad starts with a snapshot of its values.
+    """
+    from recording import MAX_DEVICES, Recorder
+
+    pygame.init()
+    pygame.joystick.init()
+    hub = ControllerHub(log=lambda message: print(message, file=sys.stderr))
+
+    stream = sys.stdout.buffer if output == "-" else open(output, "wb")
+    start = time.perf_counter()
+    recorder = Recorder(stream, batch=HEADLESS_BATCH, start_time=start) if fmt == "binary" else None
+    pending = []
+    last_flush = start
+    dropped_slots = set()
+
+    def emit(slot, kind, index, value):
+        now = time.perf_counter()
+        if recorder is not None:
+            # Binary records have 4 bits for the pad: pads past slot 15 can't be recorded
+            if slot < MAX_DEVICES:
+                recorder.record(kind, index, value, now, device=slot)
+            elif slot not in dropped_slots:
+                dropped_slots.add(slot)
+                print(f"Pad in slot {slot} not recorded: the binary format holds slots 0..{MAX_DEVICES - 1} "
+                      f"(use --format ndjson for more pads)", file=sys.stderr)
+        else:
+            pending.append(encode_ndjson(now - start, slot, kind, index, value))
+
+    def flush():
+        if recorder is not None:
+            recorder.flush()
+        elif pending:
+            stream.write("".join(pending).encode())
+            pending.clear()
+            stream.flush()
+
+    def connected(controller):
+        # Start with a full snapshot so readers know the resting values
+        joystick = controller.joystick
+        if recorder is None:
+            pending.append(json.dumps({"t": round(time.perf_counter() - start, 6), "joy": controller.slot,
+                                       "type": "connected", "name": joystick.get_name(),
+                                       "axes": joystick.get_numaxes(), "buttons": joystick.get_numbuttons(),
+                                       "hats": joystick.get_numhats()}, separators=(",", ":")) + "\n")
+        for i in range(joystick.get_numaxes()):
+            emit(controller.slot, "axis", i, joystick.get_axis(i))
+        for i in range(joystick.get_numbuttons()):
+            emit(controller.slot, "button", i, bool(joystick.get_button(i)))
+        for i in range(joystick.get_numhats()):
+            emit(controller.slot, "hat", i, joystick.get_hat(i))
+
+    def disconnected(controller):
+        if recorder is None:
+            pending.append(json.dumps({"t": round(time.perf_counter() - start, 6), "joy": controller.slot,
+                                       "type": "disconnected"}, separators=(",", ":")) + "\n")
+
+    hub.on_added.append(connected)
+    hub.on_removed.append(disconnected)
+    hub.open_all()
+    if len(hub) == 0:
+        print("No joystick connected yet, waiting for one...", file=sys.stderr)
+
+    try:
+        running = True
+        while running:
+            first = pygame.event.wait(int(HEADLESS_FLUSH_INTERVAL * 1000))
+            events = [] if first.type == pygame.NOEVENT else [first] + pygame.event.get()
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
+                    continue
+                hub.handle_event(event)
+                controller = hub.devices.get(getattr(event, "instance_id", None))
+                if controller is None:
+                    continue
+                if event.type == pygame.JOYAXISMOTION:
+                    emit(controller.slot, "axis", event.axis, event.value)
+                elif event.type in (pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP):
+                    emit(controller.slot, "button", event.button, event.type == pygame.JOYBUTTONDOWN)
+                elif event.type == pygame.JOYHATMOTION:
+                    emit(controller.slot, "hat", event.hat, event.value)
+
+            now = time.perf_counter()
+            count = recorder.used if recorder is not None else len(pending)
+            if count >= HEADLESS_BATCH or (count and now - last_flush >= HEADLESS_FLUSH_INTERVAL):
+                flush()
+                last_flush = now
+    except KeyboardInterrupt:
+        pass
+    except BrokenPipeError:
+        # Reader went away (e.g. piped into `head`)
+        os._exit(0)
+    finally:
+        flush()
+        if recorder is not None:
+            recorder.close()
+        if stream is not sys.stdout.buffer:
+            stream.close()
+        pygame.quit()
+
+
+def draw_full(draw_line, joystick, x, y, profiler=NULL_PROFILER):
+    """
+    The classic single-pad inspector: one line per axis, button and hat.
+    """
+    # Collect axis values
+    axis_count = joystick.get_numaxes()
+    axes = [joystick.get_axis(i) for i in range(axis_count)]
+
+    # Collect button values
+    button_count = joystick.get_numbuttons()
+    buttons = [joystick.get_button(i) for i in range(button_count)]
+
+    # Collect hat values
+    hat_count = joystick.get_numhats()
+    hats = [joystick.get_hat(i) for i in range(hat_count)]
+    profiler.lap("reads")
+
+    # Axes
+    draw_line((f"Axes ({axis_count}):",), x, y)
+    y += 30
+    for i, val in enumerate(axes):
+        draw_line((f"Axis {i}: ", f"{quantize(val, AXIS_TEXT_STEP):.3f}"), x + 20, y)
+        y += 20
+
+    y += 10
+    # Buttons
+    draw_line((f"Buttons ({button_count}):",), x, y)
+    y += 30
+    for i, val in enumerate(buttons):
+        draw_line((f"Button {i}: ", str(val)), x + 20, y)
+        y += 20
+
+    y += 10
+    # Hats (D-pad)
+    draw_line((f"Hats ({hat_count}):",), x, y)
+    y += 30
+    for i, val in enumerate(hats):
+        draw_line((f"Hat {i}: ", str(val)), x + 20, y)
+        y += 20
+
+
+def draw_compact(draw_line, title, joystick, x, y, profiler=NULL_PROFILER):
+    """
+    A few lines per pad, used when several pads share the window.
+    """
+    # Read everything first, then draw
+    axes = [joystick.get_axis(i) for i in range(joystick.get_numaxes())]
+    buttons = [joystick.get_button(i) for i in range(joystick.get_numbuttons())]
+    hats = [joystick.get_hat(i) for i in range(joystick.get_numhats())]
+    profiler.lap("reads")
+
+    draw_line((title,), x, y)
+    y += 20
+    parts = ["Axes:"]
+    for val in axes:
+        parts += [" ", f"{quantize(val, AXIS_TEXT_STEP):.2f}"]
+    draw_line(parts, x, y)
+    y += 20
+    parts = ["Buttons: "] + [str(val) for val in buttons]
+    draw_line(parts, x, y)
+    y += 20
+    parts = ["Hats:"]
+    for val in hats:
+        parts += [" ", str(val)]
+    draw_line(parts, x, y)
+    profiler.lap("text")
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Show every controller input in real time.")
+    parser.add_argument("--headless", action="store_true",
+                        help="no window: stream every change to stdout or --output")
+    parser.add_argument("--format", choices=("ndjson", "binary"), default="ndjson",
+                        help="headless output format (binary = recording.py records)")
+    parser.add_argument("--output", default="-", help="headless output file (default: stdout)")
+    args = parser.parse_args()
+
+    if args.headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        run_headless(args.output, args.format)
+        return
+
     pygame.init()
 
     # Set up a small display window
@@ -9,77 +236,68 @@ def main():
     screen = pygame.display.set_mode((screen_width, screen_height))
     pygame.display.set_caption("Xbox Controller Inspector")
 
-    # Initialize joystick
+    # Initialize joysticks (more can be plugged in while the window is open)
     pygame.joystick.init()
-    if pygame.joystick.get_count() == 0:
-        print("No joystick connected!")
-        pygame.quit()
-        sys.exit()
-    joystick = pygame.joystick.Joystick(0)
-    joystick.init()
-
-    print(f"Detected joystick: {joystick.get_name()}")
+    hub = ControllerHub()
+    hub.open_all()
+    if len(hub) == 0:
+        print("No joystick connected yet, waiting for one...")
+    for controller in hub.controllers():
+        print(f"Detected joystick {controller.slot}: {controller.joystick.get_name()}")
 
     # Simple font for text
     font = pygame.font.SysFont(None, 24)
+    text_cache = TextCache()
+    white = (255, 255, 255)
+
+    def draw_line(parts, x, y):
+        # Each part (static label, value) is rendered once and reused from the cache
+        for surf in text_cache.render_parts(font, parts, white):
+            screen.blit(surf, (x, y))
+            x += surf.get_width()
 
-    clock = pygame.time.Clock()
+    pacer = FramePacer(max_fps=MAX_FPS)
+    profiler = make_profiler(PROFILE_FRAMES)
+    overlay_font = pygame.font.SysFont("monospace", 14) if profiler.enabled else None
 
     while True:
-        clock.tick(30)
-        for event in pygame.event.get():
+        profiler.begin_frame()
+        events = pacer.wait()
+        profiler.lap("wait")
+        for event in events:
             if event.type == pygame.QUIT:
+                print(pacer.summary())
+                finish(profiler, PROFILE_EXPORT)
                 pygame.quit()
                 sys.exit()
+            hub.handle_event(event)
+        profiler.lap("events")
+
+        # Nothing moved: the values on screen are still correct
+        if not pacer.frame_due:
+            continue
 
         # Fill background
         screen.fill((0, 0, 0))
-
-        # Collect axis values
-        axis_count = joystick.get_numaxes()
-        axes = [joystick.get_axis(i) for i in range(axis_count)]
-
-        # Collect button values
-        button_count = joystick.get_numbuttons()
-        buttons = [joystick.get_button(i) for i in range(button_count)]
-
-        # Collect hat values
-        hat_count = joystick.get_numhats()
-        hats = [joystick.get_hat(i) for i in range(hat_count)]
+        profiler.lap("background")
 
         # -- Display results --
-
-        y = 20
-        # Axes
-        text = font.render(f"Axes ({axis_count}):", True, (255,255,255))
-        screen.blit(text, (20, y))
-        y += 30
-        for i, val in enumerate(axes):
-            text = font.render(f"Axis {i}: {val:.3f}", True, (255,255,255))
-            screen.blit(text, (40, y))
-            y += 20
-
-        y += 10
-        # Buttons
-        text = font.render(f"Buttons ({button_count}):", True, (255,255,255))
-        screen.blit(text, (20, y))
-        y += 30
-        for i, val in enumerate(buttons):
-            text = font.render(f"Button {i}: {val}", True, (255,255,255))
-            screen.blit(text, (40, y))
-            y += 20
-
-        y += 10
-        # Hats (D-pad)
-        text = font.render(f"Hats ({hat_count}):", True, (255,255,255))
-        screen.blit(text, (20, y))
-        y += 30
-        for i, val in enumerate(hats):
-            text = font.render(f"Hat {i}: {val}", True, (255,255,255))
-            screen.blit(text, (40, y))
-            y += 20
+        controllers = hub.controllers()
+        if not controllers:
+            draw_line(("Waiting for a controller...",), 20, 20)
+        elif len(controllers) == 1:
+            draw_full(draw_line, controllers[0].joystick, 20, 20, profiler)
+        else:
+            for controller, tile in zip(controllers, tile_rects(len(controllers), screen.get_rect())):
+                title = f"{controller.slot}: {controller.joystick.get_name()}"
+                draw_compact(draw_line, title, controller.joystick, tile.x + 10, tile.y + 10, profiler)
+        profiler.lap("text")
+        profiler.blit_overlay(screen, overlay_font, text_cache=text_cache)
+        profiler.mark()
 
         pygame.display.flip()
+        profiler.lap("flip")
+        profiler.end_frame()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
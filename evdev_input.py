@@ -0,0 +1,257 @@
+import asyncio
+import errno
+import fcntl
+import struct
+import sys
+import time
+
+from evdev import InputDevice, ecodes
+
+from controller_profile import load_profile
+from controller_state import ControllerState
+from device_index import find_event_device
+
+###################################
+# Event device: None = the first gamepad found under /dev/input (device_index.py); set
+# a path such as "/dev/input/event7" to force one
+###################################
+EVENT_DEVICE_PATH = None
+
+# Kernel (xpad) codes -> button/axis names of the controller profile. The indices come
+# from the profile too, so a ControllerState filled from evdev can be drawn by exactly
+# the same code as the pygame tools.
+EVDEV_BUTTON_NAMES = {
+    ecodes.BTN_SOUTH: "A",
+    ecodes.BTN_EAST: "B",
+    ecodes.BTN_NORTH: "X",
+    ecodes.BTN_WEST: "Y",
+    ecodes.BTN_TL: "LB",
+    ecodes.BTN_TR: "RB",
+    ecodes.BTN_SELECT: "View(Back)",
+    ecodes.BTN_START: "Menu(Start)",
+    ecodes.BTN_MODE: "Xbox",
+    ecodes.BTN_THUMBL: "LS_Click",
+    ecodes.BTN_THUMBR: "RS_Click",
+}
+EVDEV_AXIS_NAMES = {
+    ecodes.ABS_X: "LX",
+    ecodes.ABS_Y: "LY",
+    ecodes.ABS_Z: "LT",
+    ecodes.ABS_RX: "RX",
+    ecodes.ABS_RY: "RY",
+    ecodes.ABS_RZ: "RT",
+}
+HAT_X_CODE = ecodes.ABS_HAT0X
+HAT_Y_CODE = ecodes.ABS_HAT0Y
+
+# ioctl to make the kernel stamp events with CLOCK_MONOTONIC instead of wall-clock time
+# (_IOW('E', 0xa0, int)). On Linux time.perf_counter() reads the same clock, so event
+# timestamps can be compared directly with the rest of the tools.
+EVIOCSCLOCKID = 0x400445A0
+
+
+class EvdevController:
+    """
+    Reads a gamepad straight from its /dev/input/eventN node, bypassing SDL.
+
+    Runs on an asyncio loop: the device fd is registered with loop.add_reader(), and
+    each wake-up drains every pending event with one read() call. Values are applied to
+    a ControllerState using the kernel's own event timestamps, and axes are normalized
+    to -1..1 like pygame does, so the visualizers can draw it unchanged.
+
+    Changes are applied as they arrive; callbacks in `on_report` are called once per
+    SYN_REPORT (i.e. once per HID report) with the list of events in that report.
+    """
+
+    def __init__(self, device_path=None, button_mapping=None, axis_mapping=None,
+                 state=None):
+        device_path = device_path or EVENT_DEVICE_PATH or find_event_device()
+        if device_path is None:
+            raise OSError(errno.ENODEV, "No gamepad found under /dev/input (set EVENT_DEVICE_PATH "
+                                        "or pass a device path)")
+        self.device = InputDevice(device_path)
+        if button_mapping is None or axis_mapping is None:
+            profile = load_profile()
+            button_mapping = button_mapping if button_mapping is not None else profile.buttons
+            axis_mapping = axis_mapping if axis_mapping is not None else profile.axes
+        self.button_mapping = button_mapping
+        self.axis_mapping = axis_mapping
+        self.state = state if state is not None else ControllerState()
+        self.on_report = []
+
+        try:
+            fcntl.ioctl(self.device.fd, EVIOCSCLOCKID, struct.pack("i", time.CLOCK_MONOTONIC))
+            self.monotonic = True
+        except (OSError, ValueError):
+            # Old kernel: keep CLOCK_REALTIME stamps and convert them on the fly
+            self.monotonic = False
+
+        capabilities = self.device.capabilities()
+        self.abs_codes = dict(capabilities.get(ecodes.EV_ABS, []))
+
+        # evdev code -> ControllerState index (only for codes this pad actually has)
+        self.button_index = {code: self.button_mapping[name]
+                             for code, name in EVDEV_BUTTON_NAMES.items() if name in self.button_mapping}
+        self.axis_index = {code: self.axis_mapping[name]
+                           for code, name in EVDEV_AXIS_NAMES.items()
+                           if name in self.axis_mapping and code in self.abs_codes}
+
+        # evdev code -> (offset, scale) for mapping raw values to -1..1
+        self.axis_scale = {}
+        for code, absinfo in self.abs_codes.items():
+            span = absinfo.max - absinfo.min
+            if span > 0:
+                self.axis_scale[code] = (absinfo.min, 2.0 / span)
+
+        self.hat = [0, 0]
+        self.report_events = []
+        self.reports = 0
+        self._loop = None
+        self._closed = None
+
+        self.resync()
+
+    def _timestamp(self, event):
+        t = event.timestamp()
+        if not self.monotonic:
+            t += time.perf_counter() - time.time()
+        return t
+
+    def _normalize(self, code, value):
+        scale = self.axis_scale.get(code)
+        if scale is None:
+            return float(value)
+        return (value - scale[0]) * scale[1] - 1.0
+
+    def resync(self):
+        """
+        Read the full current state from the kernel (at start and after SYN_DROPPED,
+        when the kernel's buffer overflowed and some events were lost).
+        """
+        now = time.perf_counter()
+        active = set(self.device.active_keys())
+        mask = 0
+        for code, index in self.button_index.items():
+            if code in active:
+                mask |= 1 << index
+        self.state.update_buttons(mask, now)
+        for code, index in self.axis_index.items():
+            self.state.set_axis(index, self._normalize(code, self.device.absinfo(code).value), now)
+        if HAT_X_CODE in self.abs_codes and HAT_Y_CODE in self.abs_codes:
+            self.hat = [self.device.absinfo(HAT_X_CODE).value, self.device.absinfo(HAT_Y_CODE).value]
+            self.state.set_hat(0, (self.hat[0], -self.hat[1]), now)
+        self.state.end_frame()
+
+    def _apply(self, event):
+        if event.type == ecodes.EV_SYN:
+            if event.code == ecodes.SYN_REPORT:
+                self.reports += 1
+                events, self.report_events = self.report_events, []
+                for callback in self.on_report:
+                    callback(self, events)
+            elif event.code == ecodes.SYN_DROPPED:
+                self.report_events = []
+                self.resync()
+            return
+
+        if event.type == ecodes.EV_KEY:
+            index = self.button_index.get(event.code)
+            if index is None or event.value == 2:  # 2 = autorepeat
+                return
+            self.state.set_button(index, event.value, self._timestamp(event))
+        elif event.type == ecodes.EV_ABS:
+            if event.code == HAT_X_CODE or event.code == HAT_Y_CODE:
+                self.hat[event.code == HAT_Y_CODE] = event.value
+                # evdev reports "up" as -1, pygame/SDL as +1
+                self.state.set_hat(0, (self.hat[0], -self.hat[1]), self._timestamp(event))
+            else:
+                index = self.axis_index.get(event.code)
+                if index is None:
+                    return
+                self.state.set_axis(index, self._normalize(event.code, event.value), self._timestamp(event))
+        else:
+            return
+        self.report_events.append(event)
+
+    def _on_readable(self):
+        try:
+            # One read() drains everything the kernel has buffered for us
+            for event in self.device.read():
+                self._apply(event)
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            # Pad unplugged
+            print(f"Lost {self.device.path}: {e}")
+            self.close()
+
+    def start(self, loop=None):
+        """
+        Register with an asyncio loop (the running one by default) and start reading.
+        """
+        self._loop = loop or asyncio.get_running_loop()
+        self._closed = self._loop.create_future()
+        self._loop.add_reader(self.device.fd, self._on_readable)
+
+    async def run(self):
+        """
+        Read until close() is called or the device goes away.
+        """
+        if self._loop is None:
+            self.start()
+        await self._closed
+
+    def close(self):
+        if self._loop is not None and self.device.fd >= 0:
+            self._loop.remove_reader(self.device.fd)
+        if self._closed is not None and not self._closed.done():
+            self._closed.set_result(None)
+        self.device.close()
+
+    # Name-based accessors, same names as the controller profile
+
+    def button(self, name):
+        return self.state.get_button(self.button_mapping[name])
+
+    def axis(self, name):
+        return self.state.get_axis(self.axis_mapping[name])
+
+    def hat_value(self):
+        return self.state.get_hat(0)
+
+
+async def _print_changes(device_path):
+    controller = EvdevController(device_path)
+    print(f"Reading {controller.device.name} from {controller.device.path} (Ctrl+C to stop)")
+    button_names = {index: name for name, index in controller.button_mapping.items()}
+    axis_names = {index: name for name, index in controller.axis_mapping.items()}
+    last_seq = [controller.state.seq]
+
+    def report(ctrl, events):
+        now = time.perf_counter()
+        for edge in ctrl.state.edges_since(last_seq[0]):
+            if edge.kind == "button":
+                label = button_names.get(edge.index, edge.index)
+            elif edge.kind == "axis":
+                label = axis_names.get(edge.index, edge.index)
+            else:
+                label = f"Hat {edge.index}"
+            print(f"{label} = {edge.value}  ({(now - edge.timestamp) * 1000:.2f} ms after the kernel stamp)")
+            last_seq[0] = edge.seq
+
+    controller.on_report.append(report)
+    await controller.run()
+
+
+def main():
+    device_path = sys.argv[1] if len(sys.argv) > 1 else EVENT_DEVICE_PATH
+    try:
+        asyncio.run(_print_changes(device_path))
+    except OSError as e:
+        print(f"Could not open {device_path or 'a gamepad'}: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import time
+
+import pygame
+
+
+class FramePacer:
+    """
+    Adaptive frame scheduler shared by all the tools.
+
+    Replaces the fixed `clock.tick(30)` loop. While nothing happens it blocks inside
+    pygame.event.wait() (so an untouched controller costs no CPU at all); as soon as
+    an event arrives it switches to active mode and hands out frames at up to
+    `max_fps` until `active_linger` seconds have passed without another event.
+
+    Usage:
+        pacer = FramePacer(max_fps=60)
+        while running:
+            events = pacer.wait()
+            for event in events:
+                ...
+            if not pacer.frame_due:
+                continue
+            ... draw ...
+
+    It also measures how much CPU the process used while idle vs. active; call
+    report() (or print summary()) when the tool exits.
+    """
+
+    def __init__(self, max_fps=60, idle_timeout=1.0, active_linger=0.5):
+        self.max_fps = max_fps
+        self.idle_timeout = idle_timeout
+        self.active_linger = active_linger
+
+        self.clock = pygame.time.Clock()
+        self.last_activity = None
+        self.active = False
+        self.frame_due = True  # the very first frame is always drawn
+        self.frames = 0
+
+        # CPU accounting: process time and wall time spent in each mode
+        self.idle_cpu = 0.0
+        self.idle_wall = 0.0
+        self.active_cpu = 0.0
+        self.active_wall = 0.0
+        self.started = time.perf_counter()
+        self._mark_cpu = time.process_time()
+        self._mark_wall = self.started
+
+    def mark_active(self):
+        """
+        Keep the frame rate up, e.g. while an animation or a rumble is running.
+        """
+        if not self.active:
+            # The time up to now (e.g. blocked in event.wait()) was spent idle
+            self._account()
+        self.last_activity = time.perf_counter()
+        self.active = True
+
+    def wait(self):
+        """
+        Block until the next frame or the next event and return the pending events.
+        """
+        if self.frames == 0:
+            # Startup (window, image, font loading) is neither idle nor a frame
+            self.started = self._mark_wall = time.perf_counter()
+            self._mark_cpu = time.process_time()
+        else:
+            self._account()
+
+        if self.active and time.perf_counter() - self.last_activity > self.active_linger:
+            # Already accounted as active above; from here on the time counts as idle
+            self.active = False
+
+        if self.active:
+            # Active: pace frames at max_fps, events queue up meanwhile
+            self.clock.tick(self.max_fps)
+            events = pygame.event.get()
+        else:
+            # Idle: sleep in SDL until something happens (or the timeout runs out)
+            timeout_ms = int(self.idle_timeout * 1000) if self.idle_timeout else 0
+            first = pygame.event.wait(timeout_ms)
+            events = [] if first.type == pygame.NOEVENT else [first] + pygame.event.get()
+            # Restart the clock so the first active frame isn't "late"
+            self.clock.tick()
+
+        if events:
+            self.mark_active()
+
+        self.frame_due = self.active or bool(events) or self.frames == 0
+        if self.frame_due:
+            self.frames += 1
+        return events
+
+    def _account(self):
+        now_cpu = time.process_time()
+        now_wall = time.perf_counter()
+        if self.active:
+            self.active_cpu += now_cpu - self._mark_cpu
+            self.active_wall += now_wall - self._mark_wall
+        else:
+            self.idle_cpu += now_cpu - self._mark_cpu
+            self.idle_wall += now_wall - self._mark_wall
+        self._mark_cpu = now_cpu
+        self._mark_wall = now_wall
+
+    def report(self):
+        """
+        Return CPU use (percent of one core) while idle and while active, plus frame stats.
+        """
+        self._account()
+        elapsed = time.perf_counter() - self.started
+        return {
+            "frames": self.frames,
+            "elapsed_s": elapsed,
+            "avg_fps": self.frames / elapsed if elapsed > 0 else 0.0,
+            "idle_s": self.idle_wall,
+            "idle_cpu_percent": 100.0 * self.idle_cpu / self.idle_wall if self.idle_wall > 0 else 0.0,
+            "active_s": self.active_wall,
+            "active_cpu_percent": 100.0 * self.active_cpu / self.active_wall if self.active_wall > 0 else 0.0,
+        }
+
+    def summary(self):
+        r = self.report()
+        return (f"{r['frames']} frames in {r['elapsed_s']:.1f}s ({r['avg_fps']:.1f} FPS avg), "
+                f"idle CPU {r['idle_cpu_percent']:.1f}% over {r['idle_s']:.1f}s, "
+                f"active CPU {r['active_cpu_percent']:.1f}% over {r['active_s']:.1f}s")
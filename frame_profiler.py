@@ -0,0 +1,342 @@
+import json
+import math
+import os
+import time
+
+# Frame phases, in the order they happen. "wait" (blocked in the frame pacer) is
+# recorded but not counted in the frame's own time.
+PHASES = ("wait", "events", "reads", "background", "highlights", "text", "dirty_rects", "flip", "rumble")
+IDLE_PHASES = ("wait",)
+
+# Histogram precision: 2**SUB_BUCKET_BITS linear sub-buckets per power of two, i.e.
+# values are kept to within 1 / 2**(SUB_BUCKET_BITS - 1) (~3%) from 1 us to hours
+SUB_BUCKET_BITS = 6
+
+# The overlay's numbers are recomputed this often (not every frame), so the text on
+# screen only changes twice a second
+OVERLAY_INTERVAL = 0.5
+OVERLAY_PERCENTILES = (50, 99)
+
+# Profiling can also be switched on without editing the tools
+PROFILE_ENV = "PDP_PROFILE"
+
+DEFAULT_EXPORT = "frame_profile.hgrm"
+
+
+class Histogram:
+    """
+    HDR-style log-linear histogram of integer microsecond values.
+
+    Values below 2**SUB_BUCKET_BITS get a bucket each; above that every power of two is
+    split into 2**(SUB_BUCKET_BITS - 1) equal buckets, so the relative error stays
+    constant from microseconds to seconds and recording is a few integer operations.
+    """
+
+    def __init__(self, sub_bucket_bits=SUB_BUCKET_BITS):
+        self.bits = sub_bucket_bits
+        self.counts = []
+        self.total = 0
+        self.sum = 0
+        self.sum_sq = 0
+        self.max = 0
+        self.min = None
+
+    def index(self, value):
+        if value < (1 << self.bits):
+            return value
+        shift = value.bit_length() - self.bits
+        return (shift << (self.bits - 1)) + (value >> shift)
+
+    def value_at(self, index):
+        """
+        Lowest value that lands in bucket `index`.
+        """
+        if index < (1 << self.bits):
+            return index
+        shift = (index >> (self.bits - 1)) - 1
+        return (index - (shift << (self.bits - 1))) << shift
+
+    def record(self, value):
+        value = int(value)
+        if value < 0:
+            value = 0
+        i = self.index(value)
+        if i >= len(self.counts):
+            self.counts.extend([0] * (i + 1 - len(self.counts)))
+        self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+        self.sum_sq += value * value
+        if value > self.max:
+            self.max = value
+        if self.min is None or value < self.min:
+            self.min = value
+
+    def percentile(self, p):
+        if not self.total:
+            return 0
+        target = max(1, math.ceil(self.total * p / 100.0))
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                # Report the bucket's highest value (never above the real maximum)
+                return min(self.value_at(i + 1) - 1, self.max)
+        return self.max
+
+    def mean(self):
+        return self.sum / self.total if self.total else 0.0
+
+    def stddev(self):
+        if not self.total:
+            return 0.0
+        mean = self.mean()
+        return math.sqrt(max(0.0, self.sum_sq / self.total - mean * mean))
+
+    def buckets(self):
+        """
+        (lowest value, count) of every non-empty bucket.
+        """
+        return [(self.value_at(i), c) for i, c in enumerate(self.counts) if c]
+
+    def percentile_distribution(self, scale=1000.0, ticks_per_half=5):
+        """
+        The classic HdrHistogram text output (.hgrm), with values divided by `scale`
+        (microseconds -> milliseconds by default), so the usual plotting tools read it.
+        """
+        lines = [f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}", ""]
+        if self.total:
+            percentile = 0.0
+            reported = set()
+            while True:
+                value = self.percentile(percentile)
+                cumulative = self._count_at_or_below(value)
+                key = (value, round(percentile, 9))
+                if key not in reported:
+                    reported.add(key)
+                    inverse = f"{1.0 / (1.0 - percentile / 100.0):14.2f}" if percentile < 100 else ""
+                    lines.append(f"{value / scale:12.3f} {percentile / 100.0:14.12f} {cumulative:10d} {inverse}")
+                if percentile >= 100 or cumulative >= self.total:
+                    break
+                # Halve the remaining distance to 100% in `ticks_per_half` steps
+                remaining = 100.0 - percentile
+                step = max(remaining / 2 / ticks_per_half, 1e-7)
+                percentile = min(100.0, percentile + step)
+            lines.append(f"{self.max / scale:12.3f} {1.0:14.12f} {self.total:10d}")
+        lines.append(f"#[Mean    = {self.mean() / scale:12.3f}, StdDeviation   = {self.stddev() / scale:12.3f}]")
+        lines.append(f"#[Max     = {self.max / scale:12.3f}, Total count    = {self.total:12d}]")
+        lines.append(f"#[Buckets = {len(self.counts):12d}, SubBuckets     = {1 << self.bits:12d}]")
+        return "\n".join(lines)
+
+    def _count_at_or_below(self, value):
+        limit = self.index(value)
+        return sum(self.counts[:limit + 1])
+
+
+class FrameProfiler:
+    """
+    Times the phases of each frame and keeps one Histogram per phase (plus "frame",
+    the sum of the non-idle phases).
+
+    Usage per frame:
+        profiler.begin_frame()
+        ... pacer.wait() ...        profiler.lap("wait")
+        ... handle events ...       profiler.lap("events")
+        ... display.update() ...    profiler.lap("flip")
+        profiler.end_frame()
+
+    lap(phase) charges the time since the previous lap to `phase`. Code that times
+    itself in finer pieces (DirtyRenderer with a profiler) calls add(); that time is
+    then left out of the surrounding lap so nothing is counted twice. Frames that are
+    started but never ended (nothing to draw) are dropped, and a phase's histogram only
+    counts the frames in which that phase ran (e.g. "background" after a layout change).
+    """
+
+    enabled = True
+
+    def __init__(self, phases=PHASES):
+        self.histograms = {name: Histogram() for name in tuple(phases) + ("frame",)}
+        self.current = {}
+        self._last = time.perf_counter()
+        self._added = 0.0
+        self.frames = 0
+        self._overlay = []
+        self._overlay_at = 0.0
+
+    def reset(self):
+        """
+        Forget everything recorded so far (e.g. the startup frames of a benchmark).
+        """
+        self.histograms = {name: Histogram() for name in self.histograms}
+        self.frames = 0
+
+    def begin_frame(self):
+        self.current = {}
+        self._last = time.perf_counter()
+        self._added = 0.0
+
+    def mark(self):
+        """
+        Restart the lap timer without charging anything.
+        """
+        self._last = time.perf_counter()
+        self._added = 0.0
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0.0) + (now - self._last - self._added)
+        self._last = now
+        self._added = 0.0
+
+    def add(self, phase, seconds):
+        self.current[phase] = self.current.get(phase, 0.0) + seconds
+        self._added += seconds
+
+    def end_frame(self):
+        total = 0.0
+        for phase, seconds in self.current.items():
+            histogram = self.histograms.get(phase)
+            if histogram is None:
+                histogram = self.histograms[phase] = Histogram()
+            histogram.record(seconds * 1e6)
+            if phase not in IDLE_PHASES:
+                total += seconds
+        self.histograms["frame"].record(total * 1e6)
+        self.current = {}
+        self.frames += 1
+
+    def overlay_lines(self):
+        """
+        Text for the live overlay: p50 / p99 / max per phase in milliseconds.
+        """
+        now = time.perf_counter()
+        if now - self._overlay_at >= OVERLAY_INTERVAL:
+            self._overlay_at = now
+            header = " ".join(f"p{p}" for p in OVERLAY_PERCENTILES)
+            lines = [f"{'ms':<11} {header}  max"]
+            for name, h in self.histograms.items():
+                if not h.total:
+                    continue
+                values = " ".join(f"{h.percentile(p) / 1000:.2f}" for p in OVERLAY_PERCENTILES)
+                lines.append(f"{name:<11} {values}  {h.max / 1000:.2f}")
+            self._overlay = lines
+        return self._overlay
+
+    def draw_overlay(self, renderer, font, area, color=(0, 0, 160)):
+        """
+        Queue the overlay on a DirtyRenderer (one text item per line), in the bottom-left
+        corner of `area`.
+        """
+        lines = self.overlay_lines()
+        step = font.get_linesize()
+        y = area.bottom - len(lines) * step - 4
+        for i, line in enumerate(lines):
+            renderer.text(("profile", i), font, line, color, (area.x + 4, y + i * step))
+
+    def blit_overlay(self, surface, font, area=None, color=(255, 255, 0), text_cache=None):
+        """
+        Draw the overlay straight onto a surface (tools that repaint everything), in the
+        bottom-left corner of `area` (default: the whole surface).
+        """
+        area = area or surface.get_rect()
+        lines = self.overlay_lines()
+        step = font.get_linesize()
+        y = area.bottom - len(lines) * step - 4
+        for i, line in enumerate(lines):
+            if text_cache is not None:
+                text = text_cache.render(font, line, color)
+            else:
+                text = font.render(line, True, color)
+            surface.blit(text, (area.x + 4, y + i * step))
+
+    def export(self, path=DEFAULT_EXPORT):
+        """
+        Write every histogram: .json = buckets + percentiles, anything else = one .hgrm
+        percentile distribution per phase (values in milliseconds).
+        """
+        histograms = {name: h for name, h in self.histograms.items() if h.total}
+        if path.endswith(".json"):
+            data = {
+                "unit": "us",
+                "sub_bucket_bits": SUB_BUCKET_BITS,
+                "frames": self.frames,
+                "phases": {
+                    name: {
+                        "count": h.total,
+                        "mean": round(h.mean(), 2),
+                        "max": h.max,
+                        "percentiles": {str(p): h.percentile(p) for p in (50, 90, 99, 99.9, 100)},
+                        "buckets": h.buckets(),
+                    } for name, h in histograms.items()
+                },
+            }
+            with open(path, "w") as f:
+                json.dump(data, f, indent=1)
+        else:
+            with open(path, "w") as f:
+                for name, h in histograms.items():
+                    f.write(f"#[Phase = {name}]\n")
+                    f.write(h.percentile_distribution())
+                    f.write("\n\n")
+        return path
+
+    def summary(self):
+        frame = self.histograms["frame"]
+        return (f"{self.frames} profiled frames, frame time p50 {frame.percentile(50) / 1000:.2f} ms, "
+                f"p99 {frame.percentile(99) / 1000:.2f} ms, max {frame.max / 1000:.2f} ms")
+
+
+class NullProfiler:
+    """
+    Stand-in used when profiling is off: every method is an empty call, so the
+    instrumentation can stay in the tools at a cost of a few dozen ns per phase.
+    """
+
+    enabled = False
+
+    def begin_frame(self):
+        pass
+
+    def mark(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def add(self, phase, seconds):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def draw_overlay(self, renderer, font, area, color=None):
+        pass
+
+    def blit_overlay(self, surface, font, area=None, color=None, text_cache=None):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def make_profiler(enabled=False):
+    """
+    A FrameProfiler if `enabled` (or PDP_PROFILE=1 is set), else the shared NullProfiler.
+    """
+    if enabled or os.environ.get(PROFILE_ENV) == "1":
+        return FrameProfiler()
+    return NULL_PROFILER
+
+
+def finish(profiler, path=DEFAULT_EXPORT):
+    """
+    At exit: export the histograms and print the frame-time summary (no-op when off).
+    """
+    if not profiler.enabled:
+        return
+    try:
+        profiler.export(path)
+    except OSError as e:
+        print(f"Could not write {path}: {e}")
+        return
+    print(f"{profiler.summary()} (histograms in {path})")
@@ -0,0 +1,377 @@
+import argparse
+import heapq
+import math
+import os
+import time
+from collections import deque
+
+from controller_profile import load_profile
+
+# Sticks that produce flick tokens ("LS:up", "RS:left" ...): name -> (x axis, y axis)
+STICKS = {"LS": ("LX", "LY"), "RS": ("RX", "RY")}
+
+# A flick = the stick leaves the rest zone and passes FLICK_RADIUS within FLICK_TIME;
+# it has to come back inside REST_RADIUS before it can flick again
+REST_RADIUS = 0.3
+FLICK_RADIUS = 0.85
+FLICK_TIME = 0.12  # seconds
+
+# Defaults for the pattern builders
+CHORD_WINDOW = 0.15       # all chord buttons pressed within this long
+SEQUENCE_GAP = 0.3        # max time between two steps of a sequence
+DOUBLE_TAP_GAP = 0.3
+LONG_PRESS_TIME = 0.6
+
+
+class _Sequence:
+    def __init__(self, name, tokens, max_gap):
+        self.name = name
+        self.tokens = tuple(tokens)
+        self.max_gap = max_gap
+
+
+class GestureEngine:
+    """
+    Recognizes chords, timed sequences, double taps, long presses and stick flicks in
+    the input event stream.
+
+    Register patterns with chord() / sequence() / double_tap() / flick() / long_press(),
+    then feed ControllerState edges with process(state) (or single edges with feed()).
+    Recognized gestures are returned as (name, time) and passed to the callbacks in
+    `on_gesture`.
+
+    Every ordered pattern (sequences, double taps, flicks) is compiled into one
+    Aho-Corasick style automaton over input tokens (button presses and flick
+    directions): each token is a single table lookup that advances all patterns at once,
+    however many there are. Only patterns that actually complete at that point have
+    their timing windows checked. Chords use tables indexed by button bit, and long
+    presses use timers, so those also cost nothing for buttons that aren't involved.
+    """
+
+    def __init__(self, button_mapping=None, axis_mapping=None):
+        if button_mapping is None or axis_mapping is None:
+            profile = load_profile()
+            button_mapping = button_mapping if button_mapping is not None else profile.buttons
+            axis_mapping = axis_mapping if axis_mapping is not None else profile.axes
+        self.button_mapping = button_mapping
+        self.axis_mapping = axis_mapping
+        self.button_names = {index: name for name, index in self.button_mapping.items()}
+
+        self.sequences = []
+        self.chords = []       # (name, mask, window)
+        self.long_presses = []  # (name, button index, duration)
+        self.on_gesture = []
+        self._compiled = False
+
+        # Flick detection: axis index -> (stick name, 0 for x / 1 for y)
+        self.stick_axes = {}
+        for stick, (x_name, y_name) in STICKS.items():
+            if x_name in self.axis_mapping and y_name in self.axis_mapping:
+                self.stick_axes[self.axis_mapping[x_name]] = (stick, 0)
+                self.stick_axes[self.axis_mapping[y_name]] = (stick, 1)
+        self.reset()
+
+    # ---- Pattern definitions ----
+
+    def _token(self, step):
+        """
+        Sequence steps are button names (a press) or flick tokens like "LS:up".
+        """
+        if ":" in step:
+            stick, direction = step.split(":", 1)
+            if stick not in STICKS or direction not in ("up", "down", "left", "right"):
+                raise ValueError(f"Unknown flick '{step}'")
+            return step
+        if step not in self.button_mapping:
+            raise ValueError(f"Unknown button '{step}'")
+        return step
+
+    def sequence(self, name, steps, max_gap=SEQUENCE_GAP):
+        self.sequences.append(_Sequence(name, [self._token(step) for step in steps], max_gap))
+        self._compiled = False
+
+    def double_tap(self, name, button, max_gap=DOUBLE_TAP_GAP):
+        self.sequence(name, [button, button], max_gap)
+
+    def flick(self, name, stick, direction):
+        self.sequence(name, [f"{stick}:{direction}"])
+
+    def chord(self, name, buttons, window=CHORD_WINDOW):
+        mask = 0
+        for button in buttons:
+            mask |= 1 << self.button_mapping[button]
+        self.chords.append((name, mask, window))
+        self._compiled = False
+
+    def long_press(self, name, button, duration=LONG_PRESS_TIME):
+        self.long_presses.append((name, self.button_mapping[button], duration))
+        self._compiled = False
+
+    # ---- Compilation ----
+
+    def compile(self):
+        """
+        Build the automaton and the per-bit tables (done automatically on first use).
+        """
+        # Trie of all sequences
+        goto = [{}]
+        outputs = [[]]
+        for pattern in self.sequences:
+            node = 0
+            for token in pattern.tokens:
+                nxt = goto[node].get(token)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][token] = nxt
+                    goto.append({})
+                    outputs.append([])
+                node = nxt
+            outputs[node].append(pattern)
+
+        # Failure links (breadth first), then fold them into a complete transition table
+        # so each input token is exactly one dict lookup
+        alphabet = {token for pattern in self.sequences for token in pattern.tokens}
+        fail = [0] * len(goto)
+        queue = deque()
+        for token, nxt in goto[0].items():
+            queue.append(nxt)
+        while queue:
+            node = queue.popleft()
+            for token, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and token not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(token, 0)
+                outputs[nxt] = outputs[nxt] + outputs[fail[nxt]]
+
+        order = [0]
+        for node in order:
+            order.extend(goto[node].values())
+        self.transitions = [None] * len(goto)
+        for node in order:
+            table = {}
+            for token in alphabet:
+                if token in goto[node]:
+                    table[token] = goto[node][token]
+                elif node:
+                    table[token] = self.transitions[fail[node]].get(token, 0)
+                else:
+                    table[token] = 0
+            self.transitions[node] = table
+        self.outputs = [tuple(o) for o in outputs]
+        self.max_gap = max((p.max_gap for p in self.sequences), default=0.0)
+        self.history = deque(maxlen=max((len(p.tokens) for p in self.sequences), default=1))
+
+        # Chords, indexed by each of their bits: a press only looks at chords containing it
+        self.chord_table = {}
+        for chord in self.chords:
+            for index in range(chord[1].bit_length()):
+                if chord[1] >> index & 1:
+                    self.chord_table.setdefault(index, []).append(chord)
+
+        self.long_press_table = {}
+        for name, index, duration in self.long_presses:
+            self.long_press_table.setdefault(index, []).append((name, duration))
+
+        self.node = 0
+        self._compiled = True
+
+    def reset(self):
+        self.node = 0
+        self.last_token_time = None
+        self.history = deque(maxlen=1)
+        self.mask = 0
+        self.press_times = {}
+        self.timers = []        # heap of (due, order, name, button index, press time)
+        self._timer_order = 0
+        self.stick = {stick: [0.0, 0.0] for stick in STICKS}
+        self.stick_armed = {stick: True for stick in STICKS}
+        self.stick_left_rest = {stick: None for stick in STICKS}
+        self.last_seq = 0
+        self._compiled = False
+
+    # ---- Input ----
+
+    def _emit(self, name, t, found):
+        found.append((name, t))
+        for callback in self.on_gesture:
+            callback(name, t)
+
+    def _token_input(self, token, t, found):
+        if self.last_token_time is not None and t - self.last_token_time > self.max_gap:
+            self.node = 0  # too slow for any sequence: start over
+        self.last_token_time = t
+        self.history.append(t)
+        self.node = self.transitions[self.node].get(token, 0)
+        for pattern in self.outputs[self.node]:
+            # Check this pattern's own gap limit over its last len(tokens) steps
+            times = list(self.history)[-len(pattern.tokens):]
+            if all(b - a <= pattern.max_gap for a, b in zip(times, times[1:])):
+                self._emit(pattern.name, t, found)
+
+    def feed(self, kind, index, value, t, found=None):
+        """
+        Apply one input change ("button" / "axis" / "hat", like InputEdge). Returns the
+        gestures it completed.
+        """
+        if not self._compiled:
+            self.compile()
+        found = [] if found is None else found
+        self.advance(t, found)
+
+        if kind == "button":
+            bit = 1 << index
+            if value:
+                if self.mask & bit:
+                    return found
+                self.mask |= bit
+                self.press_times[index] = t
+                for name, mask, window in self.chord_table.get(index, ()):
+                    if self.mask & mask == mask and \
+                            t - min(self.press_times[i] for i in range(mask.bit_length()) if mask >> i & 1) <= window:
+                        self._emit(name, t, found)
+                for name, duration in self.long_press_table.get(index, ()):
+                    self._timer_order += 1
+                    heapq.heappush(self.timers, (t + duration, self._timer_order, name, index, t))
+                button = self.button_names.get(index)
+                if button is not None:
+                    self._token_input(button, t, found)
+            else:
+                self.mask &= ~bit
+        elif kind == "axis":
+            stick_axis = self.stick_axes.get(index)
+            if stick_axis is not None:
+                self._stick_input(stick_axis[0], stick_axis[1], value, t, found)
+        return found
+
+    def _stick_input(self, stick, component, value, t, found):
+        position = self.stick[stick]
+        position[component] = value
+        radius = math.hypot(position[0], position[1])
+        if radius <= REST_RADIUS:
+            self.stick_armed[stick] = True
+            self.stick_left_rest[stick] = None
+            return
+        if self.stick_left_rest[stick] is None:
+            self.stick_left_rest[stick] = t
+        if self.stick_armed[stick] and radius >= FLICK_RADIUS:
+            self.stick_armed[stick] = False
+            if t - self.stick_left_rest[stick] <= FLICK_TIME:
+                x, y = position
+                if abs(x) >= abs(y):
+                    direction = "right" if x > 0 else "left"
+                else:
+                    direction = "down" if y > 0 else "up"  # pygame: +y is down
+                self._token_input(f"{stick}:{direction}", t, found)
+
+    def advance(self, now, found=None):
+        """
+        Fire long presses that are due by `now` (call it regularly, e.g. once per frame).
+        """
+        found = [] if found is None else found
+        while self.timers and self.timers[0][0] <= now:
+            due, _, name, index, pressed_at = heapq.heappop(self.timers)
+            # Still the same press?
+            if self.mask >> index & 1 and self.press_times.get(index) == pressed_at:
+                self._emit(name, due, found)
+        return found
+
+    def process(self, state, now=None):
+        """
+        Consume the new edges of a ControllerState and fire due long presses.
+        """
+        if not self._compiled:
+            self.compile()
+        found = []
+        for edge in state.edges_since(self.last_seq):
+            self.feed(edge.kind, edge.index, edge.value, edge.timestamp, found)
+            self.last_seq = edge.seq
+        self.advance(time.perf_counter() if now is None else now, found)
+        return found
+
+
+def example_engine():
+    engine = GestureEngine()
+    engine.chord("LB+RB+A", ["LB", "RB", "A"])
+    engine.double_tap("double tap A", "A")
+    engine.double_tap("double tap B", "B")
+    engine.long_press("hold Menu", "Menu(Start)", 0.8)
+    engine.long_press("hold Xbox", "Xbox", 1.0)
+    engine.sequence("quarter circle + X", ["LS:down", "LS:right", "X"], max_gap=0.25)
+    engine.sequence("Konami", ["Y", "Y", "A", "A", "X", "B", "X", "B"], max_gap=0.5)
+    for stick in STICKS:
+        for direction in ("up", "down", "left", "right"):
+            engine.flick(f"flick {stick} {direction}", stick, direction)
+    return engine
+
+
+def run_recording(path, device):
+    """
+    Run the example gestures over a recorded session, as fast as it can be read.
+    """
+    from recording import Recording, record_device, record_kind, record_value, KIND_NAMES
+
+    engine = example_engine()
+    start = time.perf_counter()
+    count = 0
+    with Recording(path) as recording:
+        for record in recording.records():
+            if record_device(record) != device:
+                continue
+            count += 1
+            for name, t in engine.feed(KIND_NAMES[record_kind(record)], record[2], record_value(record), record[0]):
+                print(f"{t:10.3f}s  {name}")
+    elapsed = time.perf_counter() - start
+    print(f"{count} events in {elapsed * 1000:.1f} ms")
+
+
+def run_live():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from controller_state import ControllerHub
+
+    pygame.init()
+    pygame.joystick.init()
+    hub = ControllerHub()
+    hub.open_all()
+    if len(hub) == 0:
+        print("No joystick connected yet, waiting for one...")
+
+    engines = {}
+    print("Try LB+RB+A, double taps, holding Menu, quarter circle + X or flicking a stick (Ctrl+C to stop)")
+    try:
+        running = True
+        while running:
+            # Wake up at least every 20 ms so long presses fire on time
+            first = pygame.event.wait(20)
+            events = [] if first.type == pygame.NOEVENT else [first] + pygame.event.get()
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
+                hub.handle_event(event)
+            for controller in hub.controllers():
+                engine = engines.get(controller.instance_id)
+                if engine is None:
+                    engine = engines[controller.instance_id] = example_engine()
+                    engine.last_seq = controller.state.seq
+                for name, _ in engine.process(controller.state):
+                    print(f"Pad {controller.slot}: {name}")
+            hub.end_frame()
+    except KeyboardInterrupt:
+        pass
+    pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recognize chords, sequences, long presses and flicks.")
+    parser.add_argument("--recording", help="run over a recording.py file instead of live input")
+    parser.add_argument("--device", type=int, default=0, help="pad slot in the recording")
+    args = parser.parse_args()
+    if args.recording:
+        run_recording(args.recording, args.device)
+    else:
+        run_live()
+
+if __name__ == "__main__":
+    main()
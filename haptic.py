@@ -1,28 +1,52 @@
-import pygame
-import sys
+import argparse
+import errno
+import json
 import os
+import select
+import sys
 import time
 
 # Evdev imports for force-feedback
-from evdev import InputDevice, ff, ecodes
+from evdev import ff, ecodes
+
+from device_index import find_event_device
+from haptic_manager import HapticManager
+from haptic_scheduler import FakeHapticDevice, HapticScheduler
+
+# pygame and the drawing modules are only imported by main(), so firing a rumble from a
+# script (rumble_once / `pdp.py rumble`) doesn't pay for them
 
 ###################################
-# Set your event device here:
+# Event device: None = find the pad's node automatically (device_index.py); set a path
+# such as "/dev/input/event7" to force one
 ###################################
-EVENT_DEVICE_PATH = "/dev/input/event7"
+EVENT_DEVICE_PATH = None
 
-def vibrate_strong():
+# Redraw only what changed (False = repaint and flip the whole window every frame)
+DIRTY_RECT_RENDERING = True
+
+# Frame rate cap while the controller is in use (idle = no frames at all)
+MAX_FPS = 60
+
+# Height of the strip of on-screen rumble buttons at the bottom of the window (pads are
+# tiled above it when there are several)
+RUMBLE_ROW_HEIGHT = 95
+
+# Pad buttons that also fire the on-screen rumble buttons (by label), e.g.
+# {"LB": "Strong", "RB": "Weak", "Y": "Sine", "X": "Pulse"}. Empty = only the mouse does.
+PAD_RUMBLE_BUTTONS = {}
+
+# Per-phase frame timing with an overlay, including the time blocked in rumble
+# callbacks; histograms go to PROFILE_EXPORT on exit (or set PDP_PROFILE=1)
+PROFILE_FRAMES = False
+PROFILE_EXPORT = "haptic_profile.hgrm"
+
+def strong_effect():
     """
     Example of a 'strong rumble' effect, playing the large motor at full magnitude.
     """
-    try:
-        dev = InputDevice(EVENT_DEVICE_PATH)
-    except OSError as e:
-        print(f"Could not open {EVENT_DEVICE_PATH}: {e}")
-        return
-    
     # Strong rumble = strong_magnitude=0xFFFF, weak_magnitude=0
-    effect = ff.Effect(
+    return ff.Effect(
         ecodes.FF_RUMBLE,
         -1, 
         0,
@@ -33,23 +57,12 @@ def vibrate_strong():
         )
     )
 
-    eid = dev.upload_effect(effect)
-    dev.write(ecodes.EV_FF, eid, 1)  # play it once
-    time.sleep(1.0)
-    dev.erase_effect(eid)
-
 
-def vibrate_weak():
+def weak_effect():
     """
     Example of a 'weak rumble' effect, playing the smaller motor at full magnitude.
     """
-    try:
-        dev = InputDevice(EVENT_DEVICE_PATH)
-    except OSError as e:
-        print(f"Could not open {EVENT_DEVICE_PATH}: {e}")
-        return
-    
-    effect = ff.Effect(
+    return ff.Effect(
         ecodes.FF_RUMBLE,
         -1, 
         0,
@@ -60,25 +73,14 @@ def vibrate_weak():
         )
     )
 
-    eid = dev.upload_effect(effect)
-    dev.write(ecodes.EV_FF, eid, 1)
-    time.sleep(1.0)
-    dev.erase_effect(eid)
-
 
-def vibrate_sine():
+def sine_effect():
     """
     Example of a 'sine wave' periodic effect. This often produces a pulsing or buzzing rumble.
     """
-    try:
-        dev = InputDevice(EVENT_DEVICE_PATH)
-    except OSError as e:
-        print(f"Could not open {EVENT_DEVICE_PATH}: {e}")
-        return
-    
     # A sine wave periodic effect, ~2 seconds
     # Adjust 'magnitude', 'period', etc. as desired.
-    effect = ff.Effect(
+    return ff.Effect(
         ecodes.FF_PERIODIC,
         -1, 
         0,
@@ -101,179 +103,443 @@ def vibrate_sine():
         )
     )
 
-    eid = dev.upload_effect(effect)
-    dev.write(ecodes.EV_FF, eid, 1)
-    time.sleep(2)
-    dev.erase_effect(eid)
 
+EFFECTS = {"strong": strong_effect, "weak": weak_effect, "sine": sine_effect}
+
+# Short strong/weak/strong pattern used by the "Pulse" button: (effect, seconds)
+PULSE_SEQUENCE = [("strong", 0.15), ("weak", 0.15), ("strong", 0.15)]
+
+# Device writes are rate limited to this many updates per second
+MAX_HAPTIC_RATE = 100.0
+
+# Continuous rumble: strengths that follow an input (trigger pressure, a telemetry
+# stream) are applied to one effect that keeps playing, updated in place at most
+# RUMBLE_UPDATE_RATE times per second and only when the quantized level changes
+CONTINUOUS_EFFECT = "continuous"
+RUMBLE_UPDATE_RATE = 30.0
+
+# In the window, let the first pad's triggers drive the motors (also --triggers):
+# trigger -> motor
+TRIGGER_RUMBLE = False
+TRIGGER_MOTORS = {"LT": "strong", "RT": "weak"}
+
+# follow_telemetry() / `pdp.py rumble follow`: stop the motors if no sample arrived for
+# this many seconds, so a stalled producer doesn't leave the pad rumbling
+TELEMETRY_TIMEOUT = 0.5
+
+# Record rumble commands instead of opening the event device (no hardware needed)
+FAKE_HAPTIC_DEVICE = False
+
+###################################
+# One open device, effects uploaded once,
+# driven from a worker thread
+###################################
+_haptics = None
+# Instance id of the pygame joystick the open rumble device belongs to (None = the first
+# gamepad found, or nothing open)
+_haptics_instance = None
+
+def rumble_device(device_path=None, joystick=None):
+    """
+    The event node to rumble: `device_path`, else EVENT_DEVICE_PATH, else the node of
+    `joystick` (a pygame Joystick) or of the first gamepad that supports force feedback.
+    Raises OSError(ENODEV) if there is none.
+    """
+    path = device_path or EVENT_DEVICE_PATH or find_event_device(joystick, need_ff=True)
+    if path is None:
+        raise OSError(errno.ENODEV, "No force-feedback gamepad found under /dev/input "
+                                    "(set EVENT_DEVICE_PATH to choose one)")
+    return path
+
+
+def get_haptics(joystick=None):
+    """
+    Open the rumble device on first use (the node of `joystick` if given), pre-upload
+    the example effects and start the scheduler thread. Returns None (after printing
+    why) if the device can't be opened; the next call tries again, which only costs a
+    cached device-index lookup until a pad is plugged in.
+    """
+    global _haptics
+    if _haptics is None:
+        if FAKE_HAPTIC_DEVICE:
+            backend = FakeHapticDevice(effects=("strong", "weak", "sine"))
+        else:
+            try:
+                path = rumble_device(joystick=joystick)
+            except OSError as e:
+                print(e.strerror)
+                return None
+            try:
+                backend = HapticManager(path, {
+                    "strong": strong_effect(),
+                    "weak": weak_effect(),
+                    "sine": sine_effect(),
+                })
+            except OSError as e:
+                print(f"Could not open {path}: {e}")
+                return None
+        _haptics = HapticScheduler(backend, max_rate=MAX_HAPTIC_RATE, rumble_rate=RUMBLE_UPDATE_RATE)
+    return _haptics
+
+
+def close_haptics():
+    global _haptics, _haptics_instance
+    if _haptics is not None:
+        _haptics.close()
+        _haptics.backend.close()
+        _haptics = None
+    _haptics_instance = None
+
+
+def follow_first_pad(hub):
+    """
+    Keep the rumble device on the node of the hub's first pad: call it at startup and
+    on every hotplug. A replugged pad comes back on a new eventN, so the old device is
+    closed (its writes would only fail with ENODEV) and the node is looked up again,
+    which is a cached device-index lookup. Returns the scheduler or None.
+    """
+    global _haptics_instance
+    controllers = hub.controllers()
+    first = controllers[0] if controllers else None
+    wanted = first.instance_id if first is not None else None
+    if _haptics is not None and wanted == _haptics_instance:
+        return _haptics
+    close_haptics()
+    if first is None:
+        return None
+    haptics = get_haptics(first.joystick)
+    if haptics is not None:
+        _haptics_instance = wanted
+    return haptics
+
+
+def play_effect(name):
+    """
+    Queue a pre-uploaded effect and return immediately; the scheduler thread does the
+    EV_FF write. The effect's replay length stops it on the device.
+    """
+    haptics = get_haptics()
+    if haptics is not None:
+        haptics.play(name)
+
+
+def vibrate_strong():
+    play_effect("strong")
+
+
+def vibrate_weak():
+    play_effect("weak")
+
+
+def vibrate_sine():
+    play_effect("sine")
 
-def main():
-    pygame.init()
 
-    screen_width, screen_height = 640, 640
-    screen = pygame.display.set_mode((screen_width, screen_height))
-    pygame.display.set_caption("Xbox Controller Visualizer + 3 Rumble Buttons")
+def vibrate_pulse():
+    haptics = get_haptics()
+    if haptics is not None:
+        haptics.sequence(PULSE_SEQUENCE)
 
-    # Load controller image
-    script_dir = os.path.dirname(os.path.realpath(__file__))
-    image_path = os.path.join(script_dir, "xbox_controller.png")
+
+def rumble_once(name, device_path=None, fake=None, on_played=None):
+    """
+    Play one rumble ("strong", "weak", "sine" or "pulse") and return once it is over,
+    for scripts and shell hooks. Only the effects it needs are uploaded, and no
+    scheduler thread is started. on_played() is called right after the first EV_FF
+    write. Raises OSError if the device can't be opened.
+    """
+    steps = PULSE_SEQUENCE if name == "pulse" else [(name, None)]
+    effects = {effect: EFFECTS[effect]() for effect, _ in steps}
+    lengths = {effect: e.ff_replay.length / 1000.0 for effect, e in effects.items()}
+    if fake if fake is not None else FAKE_HAPTIC_DEVICE:
+        backend = FakeHapticDevice(effects=effects)
+    else:
+        backend = HapticManager(rumble_device(device_path), effects)
     try:
-        controller_image = pygame.image.load(image_path).convert_alpha()
-    except pygame.error as e:
-        print(f"Could not load image from '{image_path}': {e}")
-        pygame.quit()
-        sys.exit()
+        for i, (effect, seconds) in enumerate(steps):
+            backend.play(effect)
+            if i == 0 and on_played is not None:
+                on_played()
+            # The effects are erased when the device is closed, so stay until it's done
+            time.sleep(seconds if seconds is not None else lengths.get(effect, 0.0))
+            if seconds is not None:
+                backend.stop(effect)
+    finally:
+        backend.close()
+
+
+def parse_telemetry(line):
+    """
+    (strong, weak) strengths (0..1) from one telemetry line: a JSON object with "strong"
+    and/or "weak", or one or two numbers ("0.8 0.2", "0.8,0.2"; one number drives both
+    motors). None for lines that aren't either.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        try:
+            sample = json.loads(line)
+            return float(sample.get("strong", 0.0)), float(sample.get("weak", 0.0))
+        except (ValueError, TypeError, AttributeError):
+            return None
+    try:
+        values = [float(v) for v in line.replace(",", " ").split()]
+    except ValueError:
+        return None
+    if len(values) == 1:
+        return values[0], values[0]
+    if len(values) == 2:
+        return values[0], values[1]
+    return None
+
+
+def follow_telemetry(stream=None, device_path=None, fake=None, timeout=TELEMETRY_TIMEOUT):
+    """
+    Drive the motors from a stream of telemetry lines (stdin by default, see
+    parse_telemetry) until it ends. Only the newest sample of each read counts, updates
+    go through the scheduler's in-place continuous rumble, and the motors stop when the
+    stream is quiet for `timeout` seconds or closes. Raises OSError if the device can't
+    be opened.
+    """
+    fd = (stream or sys.stdin).fileno()
+    if fake if fake is not None else FAKE_HAPTIC_DEVICE:
+        backend = FakeHapticDevice()
+    else:
+        backend = HapticManager(rumble_device(device_path))
+    haptics = HapticScheduler(backend, max_rate=MAX_HAPTIC_RATE, rumble_rate=RUMBLE_UPDATE_RATE)
+    pending = b""
+    try:
+        while True:
+            ready, _, _ = select.select([fd], [], [], timeout)
+            if not ready:
+                haptics.rumble(CONTINUOUS_EFFECT, 0.0, 0.0)
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            *lines, pending = (pending + chunk).split(b"\n")
+            for line in reversed(lines):
+                strengths = parse_telemetry(line.decode(errors="replace"))
+                if strengths is not None:
+                    haptics.rumble(CONTINUOUS_EFFECT, *strengths)
+                    break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        haptics.rumble(CONTINUOUS_EFFECT, 0.0, 0.0)
+        haptics.flush()
+        haptics.close()
+        backend.close()
+    return haptics.stats()
+
+
+def trigger_pressure(state, index):
+    """
+    How far trigger axis `index` is pulled, 0..1. Calibrated triggers already read
+    0 (released) .. 1; raw SDL triggers rest at -1.
+    """
+    value = state.get_axis(index)
+    calibration = state.calibration
+    if calibration is not None and index < len(calibration.trigger) and calibration.trigger[index]:
+        return min(1.0, max(0.0, value))
+    return min(1.0, max(0.0, (value + 1.0) / 2.0))
+
+
+def place_rumble_buttons(rumble_buttons, size):
+    """
+    Lay the on-screen rumble buttons out along the bottom of a `size` window.
+    """
+    width, height = size
+    for btn in rumble_buttons:
+        btn["pos"] = (int(round(btn["x"] * width)), height - RUMBLE_ROW_HEIGHT + 35)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Controller visualizer with rumble buttons.")
+    parser.add_argument("--triggers", action="store_true",
+                        help="continuous rumble from trigger pressure (LT = strong, RT = weak motor)")
+    args = parser.parse_args()
+    trigger_rumble = TRIGGER_RUMBLE or args.triggers
+
+    import pygame
+    from controller_profile import load_profile
+    from controller_state import ButtonDispatcher, ControllerHub
+    from controller_view import ControllerView, tile_rects
+    from dirty_renderer import DirtyRenderer
+    from frame_pacing import FramePacer
+    from frame_profiler import finish, make_profiler
+    from text_cache import TextCache
 
-    img_width, img_height = controller_image.get_size()
-    if img_width > screen_width or img_height > screen_height:
-        scale_factor = min(screen_width / img_width, screen_height / img_height)
-        new_w = int(img_width * scale_factor)
-        new_h = int(img_height * scale_factor)
-        controller_image = pygame.transform.scale(controller_image, (new_w, new_h))
-        img_width, img_height = new_w, new_h
+    pygame.init()
 
-    # Center the image
-    img_x = (screen_width - img_width) // 2
-    img_y = (screen_height - img_height) // 2
+    # Mappings and button positions from the shared profile; the window can be resized
+    profile = load_profile()
+    screen = pygame.display.set_mode(profile.window_size, pygame.RESIZABLE)
+    pygame.display.set_caption("Xbox Controller Visualizer + Rumble Buttons")
 
-    # Initialize joystick
+    # Initialize joysticks (more can be plugged in while the window is open)
     pygame.joystick.init()
-    if pygame.joystick.get_count() == 0:
-        print("No joystick connected!")
-        pygame.quit()
-        sys.exit()
-    joystick = pygame.joystick.Joystick(0)
-    joystick.init()
-    print(f"Using joystick: {joystick.get_name()}")
-
-    # Mappings (same as your code)
-    xbox_one_mapping = {
-        "A": 0, "B": 1, "X": 2, "Y": 3,
-        "LB": 4, "RB": 5, "View(Back)": 6, "Menu(Start)": 7,
-        "Xbox": 8, "LS_Click": 9, "RS_Click": 10
-    }
-    xbox_one_axes = {"LX": 0, "LY": 1, "LT": 2, "RX": 3, "RY": 4, "RT": 5}
-    button_positions = {
-        "A": (458, 333),
-        "B": (496, 297),
-        "X": (424, 296),
-        "Y": (458, 261),
-        "LB": (182, 205),
-        "RB": (456, 206),
-        "View(Back)": (282, 297),
-        "Menu(Start)": (360, 297),
-        "Xbox": (322, 240),
-        "LS_Click": (184, 294),
-        "RS_Click": (392, 373),
-    }
-    left_stick_center = button_positions["LS_Click"]
-    right_stick_center = button_positions["RS_Click"]
-    stick_radius = 30
+    hub = ControllerHub()
+    hub.open_all()
+    if len(hub) == 0:
+        print("No joystick connected yet, waiting for one...")
+    for controller in hub.controllers():
+        print(f"Using joystick {controller.slot}: {controller.joystick.get_name()}")
+
+    # Open the first pad's rumble device and upload the effects now, so the first click
+    # is instant, and move to the right node whenever pads are plugged in or out
+    follow_first_pad(hub)
+    hub.on_added.append(lambda controller: follow_first_pad(hub))
+    hub.on_removed.append(lambda controller: follow_first_pad(hub))
+    trigger_axes = {motor: profile.axes[axis] for axis, motor in TRIGGER_MOTORS.items() if axis in profile.axes}
+    if trigger_rumble:
+        print("Trigger rumble on: " + ", ".join(f"{axis} = {motor}" for axis, motor in TRIGGER_MOTORS.items()))
 
     font = pygame.font.SysFont(None, 24)
-    clock = pygame.time.Clock()
+    pacer = FramePacer(max_fps=MAX_FPS)
+    profiler = make_profiler(PROFILE_FRAMES)
+    overlay_font = pygame.font.SysFont("monospace", 14) if profiler.enabled else None
 
-    # 3 rumble buttons
-    #  let's arrange them in a row near bottom:
+    # 4 rumble buttons
+    #  let's arrange them in a row near bottom ("x" is a fraction of the window width,
+    #  "pos" is set by place_rumble_buttons() for the current window size):
     rumble_buttons = [
         {
             "label": "Strong",
-            "pos": (180, 580),
+            "x": 0.172,
             "radius": 30,
             "callback": vibrate_strong,
         },
         {
             "label": "Weak",
-            "pos": (320, 580),
+            "x": 0.391,
             "radius": 30,
             "callback": vibrate_weak,
         },
         {
             "label": "Sine",
-            "pos": (460, 580),
+            "x": 0.609,
             "radius": 30,
             "callback": vibrate_sine,
         },
+        {
+            "label": "Pulse",
+            "x": 0.828,
+            "radius": 30,
+            "callback": vibrate_pulse,
+        },
     ]
 
+    # Pad buttons -> rumble callbacks, called on press edges only
+    dispatcher = ButtonDispatcher(profile.buttons)
+    for pad_button, label in PAD_RUMBLE_BUTTONS.items():
+        for btn in rumble_buttons:
+            if btn["label"] == label:
+                dispatcher.on_press(pad_button, lambda index, callback=btn["callback"]: callback())
+
+    place_rumble_buttons(rumble_buttons, screen.get_size())
+
+    # Scaled image and sprites are built once per tile size (the first one comes
+    # pre-scaled from the layout cache on disk)
+    view = ControllerView(profile)
+    try:
+        view.assets_for(screen.get_size())
+    except RuntimeError as e:
+        print(e)
+        pygame.quit()
+        sys.exit()
+
+    # Static background: fill, controller images and the rumble buttons are composed
+    # once per layout. A single pad uses the whole window (as before); several pads are
+    # tiled above the row of rumble buttons.
+    renderer = DirtyRenderer(screen, None, full_redraw=not DIRTY_RECT_RENDERING,
+                             text_cache=TextCache(), profiler=profiler)
+    layout_version = None
+    tiles = []
+
     running = True
     while running:
-        clock.tick(30)
-        for event in pygame.event.get():
+        profiler.begin_frame()
+        events = pacer.wait()
+        profiler.lap("wait")
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.VIDEOEXPOSE:
+                renderer.invalidate()
+            elif event.type == pygame.VIDEORESIZE:
+                screen = pygame.display.get_surface()
+                renderer.screen = screen
+                place_rumble_buttons(rumble_buttons, screen.get_size())
+                layout_version = None
+            hub.handle_event(event)
             if event.type == pygame.MOUSEBUTTONDOWN:
                 mx, my = pygame.mouse.get_pos()
-                # Check if we clicked inside any of the 3 rumble buttons
+                # Check if we clicked inside any of the rumble buttons
                 for btn in rumble_buttons:
                     dx = mx - btn["pos"][0]
                     dy = my - btn["pos"][1]
                     if dx*dx + dy*dy <= btn["radius"]**2:
                         print(f"Clicked {btn['label']} Rumble!")
+                        start = time.perf_counter()
                         btn["callback"]()
-
-        # Draw background + controller
-        screen.fill((255, 255, 255))
-        screen.blit(controller_image, (img_x, img_y))
-
-        # Draw rumble buttons
-        for btn in rumble_buttons:
-            pygame.draw.circle(screen, (200, 200, 200), btn["pos"], btn["radius"])
-            label_surf = font.render(btn["label"], True, (0, 0, 0))
-            label_rect = label_surf.get_rect(center=btn["pos"])
-            screen.blit(label_surf, label_rect)
-
-        # Check joystick buttons
-        for bname, bindex in xbox_one_mapping.items():
-            if joystick.get_button(bindex):
-                if bname in button_positions:
-                    (bx, by) = button_positions[bname]
-                    pygame.draw.circle(screen, (255, 0, 0), (bx, by), 15)
-
-        # Sticks + triggers
-        lx = joystick.get_axis(xbox_one_axes["LX"])
-        ly = joystick.get_axis(xbox_one_axes["LY"])
-        rx = joystick.get_axis(xbox_one_axes["RX"])
-        ry = joystick.get_axis(xbox_one_axes["RY"])
-        lt = joystick.get_axis(xbox_one_axes["LT"])
-        rt = joystick.get_axis(xbox_one_axes["RT"])
-
-        left_stick_pos = (
-            left_stick_center[0] + int(lx * stick_radius),
-            left_stick_center[1] + int(ly * stick_radius)
-        )
-        pygame.draw.circle(screen, (0, 255, 0), left_stick_pos, 8)
-
-        right_stick_pos = (
-            right_stick_center[0] + int(rx * stick_radius),
-            right_stick_center[1] + int(ry * stick_radius)
-        )
-        pygame.draw.circle(screen, (0, 255, 0), right_stick_pos, 8)
-
-        # Hats
-        hat_count = joystick.get_numhats()
-        hat_text_lines = []
-        for i in range(hat_count):
-            hat_val = joystick.get_hat(i)
-            hat_text_lines.append(f"Hat {i} = {hat_val}")
-
-        # Debug text
-        trigger_text = f"LT={lt:.2f}, RT={rt:.2f}"
-        stick_text = f"L=({lx:.2f},{ly:.2f}), R=({rx:.2f},{ry:.2f})"
-        debug_surf1 = font.render(trigger_text, True, (0, 0, 0))
-        debug_surf2 = font.render(stick_text, True, (0, 0, 0))
-
-        screen.blit(debug_surf1, (10, 10))
-        screen.blit(debug_surf2, (10, 35))
-
-        y_offset = 60
-        for line in hat_text_lines:
-            surf = font.render(line, True, (0, 0, 0))
-            screen.blit(surf, (10, y_offset))
-            y_offset += 25
-
-        pygame.display.flip()
-
+                        profiler.add("rumble", time.perf_counter() - start)
+        profiler.lap("events")
+
+        for controller in hub.controllers():
+            dispatcher.dispatch_state(controller.state)
+        if trigger_rumble and _haptics is not None:
+            # Called every wake-up; the scheduler drops values that round to the
+            # current level, so a resting or steady trigger costs no device I/O
+            controllers = hub.controllers()
+            strength = {motor: trigger_pressure(controllers[0].state, index) if controllers else 0.0
+                        for motor, index in trigger_axes.items()}
+            _haptics.rumble(CONTINUOUS_EFFECT, strength.get("strong", 0.0), strength.get("weak", 0.0))
+        profiler.lap("rumble")
+
+        if not pacer.frame_due:
+            continue
+
+        if hub.version != layout_version:
+            layout_version = hub.version
+            width, height = screen.get_size()
+            area = screen.get_rect() if len(hub) <= 1 else pygame.Rect(0, 0, width, height - RUMBLE_ROW_HEIGHT)
+            tiles = tile_rects(len(hub), area)
+            background = view.compose_background((width, height), tiles)
+            for btn in rumble_buttons:
+                pygame.draw.circle(background, (200, 200, 200), btn["pos"], btn["radius"])
+                label_surf = font.render(btn["label"], True, (0, 0, 0))
+                label_rect = label_surf.get_rect(center=btn["pos"])
+                background.blit(label_surf, label_rect)
+            renderer.set_background(background)
+            profiler.lap("background")
+
+        renderer.begin_frame()
+
+        # Buttons, sticks, triggers and hats of every pad, each in its own tile
+        controllers = hub.controllers()
+        if not controllers:
+            renderer.text("waiting", font, "Waiting for a controller...", (0, 0, 0), (10, 10))
+        for controller, tile in zip(controllers, tiles):
+            label = f"{controller.slot}: {controller.joystick.get_name()}" if len(controllers) > 1 else None
+            view.draw(renderer, controller.instance_id, controller.state, tile, label)
+        profiler.lap("reads")
+        width, height = screen.get_size()
+        profiler.draw_overlay(renderer, overlay_font, pygame.Rect(0, 0, width, height - RUMBLE_ROW_HEIGHT))
+        profiler.mark()
+
+        dirty_rects = renderer.end_frame()
+        profiler.lap("dirty_rects")
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+        profiler.lap("flip")
+        hub.end_frame()
+        profiler.end_frame()
+
+    print(pacer.summary())
+    finish(profiler, PROFILE_EXPORT)
+    close_haptics()
     pygame.quit()
     sys.exit()
 
@@ -0,0 +1,177 @@
+import errno
+from collections import OrderedDict
+
+from evdev import InputDevice, ecodes, ff
+
+# Used when the driver doesn't report how many effects it can hold
+DEFAULT_EFFECT_SLOTS = 16
+
+
+def continuous_rumble(strong=0, weak=0):
+    """
+    FF_RUMBLE effect with no replay length (it plays until stopped), for rumble whose
+    magnitudes (0..0xFFFF) are changed while it plays with update_rumble().
+    """
+    return ff.Effect(
+        ecodes.FF_RUMBLE,
+        -1,
+        0,
+        ff.Trigger(0, 0),
+        ff.Replay(0, 0),
+        ff.EffectType(ff_rumble_effect=ff.Rumble(strong_magnitude=strong, weak_magnitude=weak))
+    )
+
+
+class HapticManager:
+    """
+    Keeps one force-feedback device open and a named set of effects uploaded to it.
+
+    Opening the event node, uploading the effect (an ioctl) and erasing it again on every
+    click made each rumble cost tens of milliseconds. Here the device is opened once,
+    effects are uploaded ahead of time with define(), and play() is a single EV_FF write.
+
+    Continuous rumble (update_rumble) changes an uploaded effect in place instead: the
+    new magnitudes are uploaded under the effect's existing id, which the kernel applies
+    to the running effect without erasing or restarting anything.
+
+    Gamepads only have a handful of effect slots (ff_effects_count). When more effects are
+    defined than fit, the least recently played one is erased to make room and uploaded
+    again transparently the next time it is played.
+    """
+
+    def __init__(self, device_path, effects=None, max_slots=None):
+        self.device_path = device_path
+        self.device = InputDevice(device_path)
+        if ecodes.EV_FF not in self.device.capabilities():
+            self.device.close()
+            raise OSError(errno.ENOTSUP, f"{device_path} has no force-feedback support")
+
+        self.max_slots = max_slots or self.device.ff_effects_count or DEFAULT_EFFECT_SLOTS
+
+        # name -> ff.Effect definition (kept so evicted effects can be re-uploaded)
+        self.definitions = {}
+        # name -> uploaded effect id, least recently used first
+        self.slots = OrderedDict()
+        # name -> (strong, weak) of continuous rumble effects that are playing
+        self.rumbling = {}
+        self.updates = 0
+
+        for name, effect in (effects or {}).items():
+            self.define(name, effect)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def define(self, name, effect, upload=True):
+        """
+        Register (or replace) a named effect and, by default, upload it right away.
+        """
+        if name in self.slots:
+            self._erase(name)
+        self.definitions[name] = effect
+        if upload and len(self.slots) < self.max_slots:
+            self._upload(name)
+
+    def _upload(self, name):
+        effect = self.definitions[name]
+        effect.id = -1  # let the kernel pick a free slot
+        while True:
+            try:
+                eid = self.device.upload_effect(effect)
+                break
+            except OSError as e:
+                # The driver may hold fewer effects than it advertises
+                if e.errno != errno.ENOSPC or not self.slots:
+                    raise
+                self._erase(next(iter(self.slots)))
+                self.max_slots = max(1, len(self.slots))
+        self.slots[name] = eid
+        return eid
+
+    def _erase(self, name):
+        eid = self.slots.pop(name)
+        self.rumbling.pop(name, None)
+        try:
+            self.device.erase_effect(eid)
+        except OSError:
+            pass
+
+    def effect_id(self, name):
+        """
+        Return the uploaded id of `name`, uploading it (and evicting the LRU effect) if needed.
+        """
+        eid = self.slots.get(name)
+        if eid is not None:
+            self.slots.move_to_end(name)
+            return eid
+        if name not in self.definitions:
+            raise KeyError(f"Unknown haptic effect '{name}'")
+        if len(self.slots) >= self.max_slots:
+            self._erase(next(iter(self.slots)))
+        return self._upload(name)
+
+    def play(self, name, repeat=1):
+        """
+        Start a named effect. Once uploaded this is one write() on the open device.
+        """
+        self.device.write(ecodes.EV_FF, self.effect_id(name), repeat)
+
+    def update_rumble(self, name, strong, weak):
+        """
+        Set the motor magnitudes (0..0xFFFF) of continuous rumble effect `name`, defining
+        it on first use. A playing effect is re-uploaded under its own id (one ioctl);
+        it is started when it goes from silent to non-zero and stopped at 0/0. Returns
+        False, without any syscall, if the magnitudes are the ones already playing.
+        """
+        magnitudes = (strong, weak)
+        if self.rumbling.get(name, (0, 0)) == magnitudes:
+            return False
+        if magnitudes == (0, 0):
+            self.stop(name)
+            return True
+
+        effect = self.definitions.get(name)
+        if effect is None:
+            effect = self.definitions[name] = continuous_rumble()
+        elif effect.type != ecodes.FF_RUMBLE:
+            raise KeyError(f"Haptic effect '{name}' is not a rumble effect")
+        effect.u.ff_rumble_effect.strong_magnitude = strong
+        effect.u.ff_rumble_effect.weak_magnitude = weak
+
+        eid = self.slots.get(name)
+        if eid is None:
+            eid = self.effect_id(name)
+        else:
+            effect.id = eid
+            self.device.upload_effect(effect)
+            self.slots.move_to_end(name)
+        if name not in self.rumbling:
+            self.device.write(ecodes.EV_FF, eid, 1)
+        self.rumbling[name] = magnitudes
+        self.updates += 1
+        return True
+
+    def stop(self, name):
+        self.rumbling.pop(name, None)
+        eid = self.slots.get(name)
+        if eid is not None:
+            self.device.write(ecodes.EV_FF, eid, 0)
+
+    def stop_all(self):
+        self.rumbling.clear()
+        for eid in self.slots.values():
+            self.device.write(ecodes.EV_FF, eid, 0)
+
+    def close(self):
+        """
+        Erase every uploaded effect and close the device.
+        """
+        if self.device is None:
+            return
+        for name in list(self.slots):
+            self._erase(name)
+        self.device.close()
+        self.device = None
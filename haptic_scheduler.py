@@ -0,0 +1,312 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+# Continuous rumble strengths (0..1) are rounded to this many steps per motor; finer
+# changes can't be felt, and a value that rounds to the current step costs nothing
+RUMBLE_LEVELS = 32
+
+
+def rumble_magnitude(strength, levels=RUMBLE_LEVELS):
+    """
+    A 0..1 motor strength as a quantized FF magnitude (0..0xFFFF).
+    """
+    step = round(min(1.0, max(0.0, strength)) * (levels - 1))
+    return step * 0xFFFF // (levels - 1)
+
+
+class HapticScheduler:
+    """
+    Non-blocking front end for a haptic backend (a HapticManager or FakeHapticDevice).
+
+    play() / stop() / sequence() only record what should happen and return right away;
+    a worker thread talks to the device. That keeps the pygame loop free of device I/O
+    and of any waiting inside effect sequences.
+
+    - Coalescing: there is at most one pending command per effect name, so a burst of
+      play("strong") calls collapses into a single write, and play+stop before the
+      worker gets to it becomes just the stop.
+    - Rate limiting: the device never sees more than `max_rate` updates per second.
+    - Sequences: a list of (effect_name, seconds) steps, each started when the previous
+      one ends. Starting a new sequence replaces the running one.
+    - Continuous rumble: rumble() sets the strengths of an effect that keeps playing.
+      Requests that round to the current levels are dropped before waking the worker,
+      and each effect is updated in place at most `rumble_rate` times per second.
+    """
+
+    def __init__(self, backend, max_rate=100.0, rumble_rate=30.0, clock=time.monotonic):
+        self.backend = backend
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self.rumble_interval = 1.0 / rumble_rate if rumble_rate else 0.0
+        self.clock = clock
+
+        # name -> ("play", repeat) or ("stop",), oldest request first
+        self.pending = OrderedDict()
+        # Steps of the running sequence: heap of (due_time, order, name, command)
+        self.timeline = []
+        # Effects the running sequence has started and not stopped yet
+        self.sequence_playing = set()
+        self._order = itertools.count()
+        self.sequence_id = 0
+        # name -> (strong, weak) magnitudes last requested / time of the last update
+        self.rumble_levels = {}
+        self.rumble_written = {}
+
+        self.requests = 0
+        self.coalesced = 0
+        self.unchanged = 0
+        self.writes = 0
+        self.errors = 0
+        self.last_write = None
+        # Commands taken off `pending` whose device write hasn't finished yet
+        self.in_flight = 0
+
+        self._cond = threading.Condition()
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="haptic-scheduler", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- Requests (called from any thread, never block) ----
+
+    def play(self, name, repeat=1):
+        self._request(name, ("play", repeat))
+
+    def stop(self, name):
+        self._request(name, ("stop",))
+
+    def rumble(self, name, strong, weak):
+        """
+        Continuous rumble: set the strong/weak motor strengths (0..1) of effect `name`,
+        which starts playing when either is non-zero and stops at 0/0. Call it as often
+        as the input changes (every frame, every telemetry sample); only changes of the
+        quantized levels reach the device.
+        """
+        levels = (rumble_magnitude(strong), rumble_magnitude(weak))
+        with self._cond:
+            if self.rumble_levels.get(name, (0, 0)) == levels:
+                self.unchanged += 1
+                return
+        self._request(name, ("rumble",) + levels)
+
+    def _request(self, name, command):
+        with self._cond:
+            self.requests += 1
+            if command[0] == "rumble":
+                self.rumble_levels[name] = command[1:]
+            elif command[0] == "stop":
+                self.rumble_levels.pop(name, None)
+            if name in self.pending:
+                self.coalesced += 1
+                del self.pending[name]
+            self.pending[name] = command
+            self._cond.notify()
+
+    def sequence(self, steps):
+        """
+        Play `steps` = [(effect_name, seconds), ...] back to back, replacing any
+        sequence that is still running. Returns the new sequence id.
+        """
+        with self._cond:
+            self.requests += 1
+            self.sequence_id += 1
+            self._drop_sequence()
+
+            t = self.clock()
+            for name, duration in steps:
+                heapq.heappush(self.timeline, (t, next(self._order), name, ("play", 1)))
+                t += duration
+                heapq.heappush(self.timeline, (t, next(self._order), name, ("stop",)))
+            self._cond.notify()
+            return self.sequence_id
+
+    def cancel_sequence(self):
+        with self._cond:
+            self._drop_sequence()
+            self._cond.notify()
+
+    def _drop_sequence(self):
+        """
+        Forget the remaining steps of the running sequence. Their stop steps go with
+        them, so whatever it already started is stopped now instead of playing out its
+        whole replay length. Called with the lock held.
+        """
+        self.timeline = []
+        for name in self.sequence_playing:
+            self.pending.pop(name, None)
+            self.pending[name] = ("stop",)
+        self.sequence_playing.clear()
+
+    def flush(self, timeout=1.0):
+        """
+        Wait until every pending command (not future sequence steps) reached the device,
+        i.e. its write has returned. Mostly for tests and for shutting down cleanly.
+        """
+        deadline = self.clock() + timeout
+        with self._cond:
+            while (self.pending or self.in_flight) and self.clock() < deadline:
+                self._cond.wait(0.005)
+            return not (self.pending or self.in_flight)
+
+    def close(self):
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join(timeout=1.0)
+        try:
+            self.backend.stop_all()
+        except OSError:
+            pass
+
+    def stats(self):
+        with self._cond:
+            return {
+                "requests": self.requests,
+                "coalesced": self.coalesced,
+                "unchanged": self.unchanged,
+                "writes": self.writes,
+                "errors": self.errors,
+                "pending": len(self.pending),
+            }
+
+    # ---- Worker ----
+
+    def _next_due(self, now):
+        """
+        (name, time) of the pending command that may go out first: the oldest one, but a
+        continuous-rumble update waits until its effect's last update is rumble_interval old.
+        """
+        first = None
+        for name, command in self.pending.items():
+            due = now
+            if command[0] == "rumble" and name in self.rumble_written:
+                due = max(now, self.rumble_written[name] + self.rumble_interval)
+            if due <= now:
+                return name, now
+            if first is None or due < first[1]:
+                first = (name, due)
+        return first
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closing:
+                        return
+                    now = self.clock()
+
+                    # Move due sequence steps into the pending set
+                    while self.timeline and self.timeline[0][0] <= now:
+                        _, _, name, command = heapq.heappop(self.timeline)
+                        if command[0] == "play":
+                            self.sequence_playing.add(name)
+                        else:
+                            self.sequence_playing.discard(name)
+                        self.pending.pop(name, None)
+                        self.pending[name] = command
+
+                    wait = None
+                    if self.pending:
+                        name, due = self._next_due(now)
+                        if self.last_write is not None:
+                            due = max(due, self.last_write + self.min_interval)
+                        if due <= now:
+                            command = self.pending.pop(name)
+                            break
+                        wait = due - now
+                    if self.timeline:
+                        until_step = self.timeline[0][0] - now
+                        wait = until_step if wait is None else min(wait, until_step)
+                    self._cond.wait(wait)
+
+                self.last_write = now
+                self.writes += 1
+                self.in_flight += 1
+                if command[0] == "rumble":
+                    self.rumble_written[name] = now
+
+            # Device I/O happens outside the lock so requests never wait on it
+            try:
+                if command[0] == "play":
+                    self.backend.play(name, command[1])
+                elif command[0] == "rumble":
+                    self.backend.update_rumble(name, command[1], command[2])
+                else:
+                    self.backend.stop(name)
+            except (OSError, KeyError) as e:
+                with self._cond:
+                    self.errors += 1
+                print(f"Haptic '{name}' {command[0]} failed: {e}")
+            finally:
+                with self._cond:
+                    self.in_flight -= 1
+                    self._cond.notify_all()
+
+
+class FakeHapticDevice:
+    """
+    Stand-in for HapticManager that records every command with its timestamp instead of
+    touching hardware, so the scheduler's timing (coalescing, rate limit, sequences)
+    can be checked on any machine. `latency` simulates a slow device write.
+    """
+
+    def __init__(self, effects=(), latency=0.0, clock=time.monotonic):
+        self.effects = set(effects)
+        self.latency = latency
+        self.clock = clock
+        self.log = []
+        self.playing = set()
+        self.rumbling = {}
+
+    def _check(self, name):
+        if self.effects and name not in self.effects:
+            raise KeyError(f"Unknown haptic effect '{name}'")
+
+    def play(self, name, repeat=1):
+        self._check(name)
+        if self.latency:
+            time.sleep(self.latency)
+        self.playing.add(name)
+        self.log.append((self.clock(), "play", name))
+
+    def stop(self, name):
+        self._check(name)
+        if self.latency:
+            time.sleep(self.latency)
+        self.playing.discard(name)
+        self.rumbling.pop(name, None)
+        self.log.append((self.clock(), "stop", name))
+
+    def update_rumble(self, name, strong, weak):
+        """
+        Like HapticManager.update_rumble: logged as "rumble" (magnitudes in `rumbling`),
+        and unchanged magnitudes are not logged at all.
+        """
+        if self.effects:
+            # Continuous effects are defined on first use, as on the real device
+            self.effects.add(name)
+        if self.rumbling.get(name, (0, 0)) == (strong, weak):
+            return False
+        if (strong, weak) == (0, 0):
+            self.stop(name)
+            return True
+        if self.latency:
+            time.sleep(self.latency)
+        self.playing.add(name)
+        self.rumbling[name] = (strong, weak)
+        self.log.append((self.clock(), "rumble", name))
+        return True
+
+    def stop_all(self):
+        for name in list(self.playing):
+            self.stop(name)
+
+    def close(self):
+        pass
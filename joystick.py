@@ -1,181 +1,175 @@
 import pygame
 import sys
-import os
+
+from controller_profile import load_profile
+from controller_state import ControllerHub
+from controller_view import ControllerView, tile_rects
+from dirty_renderer import DirtyRenderer
+from frame_pacing import FramePacer
+from frame_profiler import finish, make_profiler
+from text_cache import TextCache
+from shm_state import SharedStatePublisher, default_name
+
+# Redraw only what changed and push it with display.update(rects).
+# Set to False to repaint and flip the whole window every frame.
+DIRTY_RECT_RENDERING = True
+
+# Frame rate cap while the controller is in use (idle = no frames at all)
+MAX_FPS = 60
+
+# Publish each pad's state to shared memory (pdp_controller_<slot>) so other processes
+# can read it with shm_state.SharedStateReader without touching the device
+PUBLISH_SHARED_MEMORY = False
+
+# Correct axes with the profile saved by `python calibrate_joy.py --axes` (if there is one)
+USE_AXIS_CALIBRATION = True
+
+# Time every phase of each frame, show p50/p99/max in an overlay and write the
+# histograms to PROFILE_EXPORT on exit (PDP_PROFILE=1 in the environment does the same).
+# Switched off, the timing calls do nothing and can stay in.
+PROFILE_FRAMES = False
+PROFILE_EXPORT = "joystick_profile.hgrm"
+
+def publish_states(hub, publishers):
+    """
+    Push the state of every pad that changed since the last call to its shared memory
+    segment (one per slot, created when the slot is first seen).
+    """
+    for controller in hub.controllers():
+        publisher, last_seq = publishers.get(controller.slot, (None, None))
+        if publisher is None:
+            joystick = controller.joystick
+            publisher = SharedStatePublisher(default_name(controller.slot),
+                                             axis_count=joystick.get_numaxes(),
+                                             hat_count=joystick.get_numhats())
+            print(f"Publishing slot {controller.slot} to shared memory '{publisher.name}'")
+        if controller.state.seq != last_seq:
+            publisher.publish_state(controller.state)
+        publishers[controller.slot] = (publisher, controller.state.seq)
 
 def main():
     pygame.init()
 
-    # 1) CREATE A DISPLAY
-    screen_width, screen_height = 640, 640
-    screen = pygame.display.set_mode((screen_width, screen_height))
-    pygame.display.set_caption("Xbox One Controller Visualizer")
-
-    # 2) LOAD YOUR CONTROLLER IMAGE
-    #    Adjust path if needed. Right now, assumes the PNG is in the same folder.
-    script_dir = os.path.dirname(os.path.realpath(__file__))
-    image_path = os.path.join(script_dir, "xbox_controller.png")
+    # 1) LOAD YOUR CONTROLLER PROFILE
+    #    Mappings and button positions come from controller_profile.json (written by
+    #    calibrate_joy.py; the built-in Xbox One layout if there is none). Positions are
+    #    relative to the image, so the window can have any size.
+    profile = load_profile()
 
-    try:
-        controller_image = pygame.image.load(image_path).convert_alpha()
-    except pygame.error as e:
-        print(f"Could not load image from '{image_path}'. Error: {e}")
-        pygame.quit()
-        sys.exit()
+    # 2) CREATE A (RESIZABLE) DISPLAY
+    screen = pygame.display.set_mode(profile.window_size, pygame.RESIZABLE)
+    pygame.display.set_caption("Xbox One Controller Visualizer")
 
-    # Scale or move your image if needed.
-    img_width, img_height = controller_image.get_size()
-    if img_width > screen_width or img_height > screen_height:
-        # Example: scale it down to fit
-        scale_factor = min(screen_width / img_width, screen_height / img_height)
-        new_w = int(img_width * scale_factor)
-        new_h = int(img_height * scale_factor)
-        controller_image = pygame.transform.scale(controller_image, (new_w, new_h))
-        img_width, img_height = new_w, new_h
-
-    # Let's center the image in the window
-    img_x = (screen_width - img_width) // 2
-    img_y = (screen_height - img_height) // 2
-
-    # 3) INITIALIZE JOYSTICK
+    # 3) INITIALIZE JOYSTICKS
+    #    Every connected pad gets its own state store. Input is consumed from the event
+    #    queue, so presses shorter than a frame are not lost and the drawing below never
+    #    polls the devices. Pads can be plugged in and out while the window is open.
     pygame.joystick.init()
-    if pygame.joystick.get_count() == 0:
-        print("No joystick connected!")
+    calibration = None
+    if USE_AXIS_CALIBRATION:
+        try:
+            from axis_calibration import load_default
+            calibration = load_default()
+        except ImportError:
+            pass  # NumPy not installed: raw axes
+    if calibration is not None:
+        print("Using the saved axis calibration")
+    hub = ControllerHub(calibration=calibration)
+    hub.open_all()
+    if len(hub) == 0:
+        print("No joystick connected yet, waiting for one...")
+    for controller in hub.controllers():
+        print(f"Using joystick {controller.slot}: {controller.joystick.get_name()}")
+
+    # 4) ONE VIEW DRAWS EVERY PAD, EACH INTO ITS OWN TILE
+    #    Highlights, stick dots, hat state and debug text for one pad are drawn by
+    #    ControllerView.draw(). The scaled image and the sprites are built once per tile
+    #    size (the first one comes pre-scaled from the layout cache on disk).
+    view = ControllerView(profile)
+    try:
+        view.assets_for(screen.get_size())
+    except RuntimeError as e:
+        print(e)
         pygame.quit()
         sys.exit()
-    joystick = pygame.joystick.Joystick(0)
-    joystick.init()
-    print(f"Using joystick: {joystick.get_name()}")
-
-    # 4) DEFINE YOUR BUTTON / AXIS / HAT MAPPINGS
-    xbox_one_mapping = {
-        "A": 0,
-        "B": 1,
-        "X": 2,
-        "Y": 3,
-        "LB": 4,
-        "RB": 5,
-        "View(Back)": 6,
-        "Menu(Start)": 7,
-        "Xbox": 8,
-        "LS_Click": 9,
-        "RS_Click": 10
-    }
-
-    xbox_one_axes = {
-        "LX": 0,
-        "LY": 1,
-        "LT": 2,
-        "RX": 3,
-        "RY": 4,
-        "RT": 5
-    }
-
-    # If you want to observe D-pad hats:
-    xbox_one_hats = {
-        "right": (1, 0),
-        "left": (-1, 0),
-        "up": (0, 1),
-        "down": (0, -1)
-    }
-
-    # 5) USE YOUR CALIBRATED BUTTON POSITIONS (from calibrate_joy.py output)
-    button_positions = {
-        "A": (458, 333),
-        "B": (496, 297),
-        "X": (424, 296),
-        "Y": (458, 261),
-        "LB": (182, 205),
-        "RB": (456, 206),
-        "View(Back)": (282, 297),
-        "Menu(Start)": (360, 297),
-        "Xbox": (322, 240),
-        "LS_Click": (184, 294),
-        "RS_Click": (392, 373),
-    }
-
-    # 6) DEFINE STICK CENTERS & RADIUS FOR YOUR IMAGE
-    #    Adjust these so the green dot lines up with the actual stick in the PNG.
-    left_stick_center = button_positions["LS_Click"]  # an easy way is to start from LS_Click
-    right_stick_center = button_positions["RS_Click"]  # same for RS_Click
-    # But these "click" positions might not be exactly center. If that doesn't look right,
-    # give them custom coordinates:
-    # left_stick_center = (200, 300)
-    # right_stick_center = (400, 300)
-
-    stick_radius = 30  # how far from center the green dot can move visually
 
     font = pygame.font.SysFont(None, 24)
-    clock = pygame.time.Clock()
+    pacer = FramePacer(max_fps=MAX_FPS)
+    profiler = make_profiler(PROFILE_FRAMES)
+    overlay_font = pygame.font.SysFont("monospace", 14) if profiler.enabled else None
+
+    # The static background (white fill + one controller image per tile) is composed
+    # once per layout and only the pieces under moving items get restored from it.
+    renderer = DirtyRenderer(screen, None, full_redraw=not DIRTY_RECT_RENDERING,
+                             text_cache=TextCache(), profiler=profiler)
+    layout_version = None
+    tiles = []
+
+    # slot -> (publisher, last published state.seq)
+    publishers = {}
 
     running = True
     while running:
-        clock.tick(30)
+        profiler.begin_frame()
+        events = pacer.wait()
+        profiler.lap("wait")
 
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
-
-        # 7) DRAW THE BACKGROUND AND YOUR CONTROLLER IMAGE
-        screen.fill((255, 255, 255))
-        screen.blit(controller_image, (img_x, img_y))
-
-        # 8) CHECK EACH BUTTON AND HIGHLIGHT IF PRESSED
-        for bname, bindex in xbox_one_mapping.items():
-            if joystick.get_button(bindex):
-                if bname in button_positions:
-                    (bx, by) = button_positions[bname]
-                    pygame.draw.circle(screen, (255, 0, 0), (bx, by), 15)
-
-        # 9) READ THE AXES FOR STICKS & TRIGGERS
-        lx = joystick.get_axis(xbox_one_axes["LX"])
-        ly = joystick.get_axis(xbox_one_axes["LY"])
-        rx = joystick.get_axis(xbox_one_axes["RX"])
-        ry = joystick.get_axis(xbox_one_axes["RY"])
-        lt = joystick.get_axis(xbox_one_axes["LT"])  # might be 0..1 or -1..1
-        rt = joystick.get_axis(xbox_one_axes["RT"])  # might be 0..1 or -1..1
-
-        # Position of left stick's green dot
-        left_stick_pos = (
-            left_stick_center[0] + int(lx * stick_radius),
-            left_stick_center[1] + int(ly * stick_radius)
-        )
-        pygame.draw.circle(screen, (0, 255, 0), left_stick_pos, 8)
-
-        # Position of right stick's green dot
-        right_stick_pos = (
-            right_stick_center[0] + int(rx * stick_radius),
-            right_stick_center[1] + int(ry * stick_radius)
-        )
-        pygame.draw.circle(screen, (0, 255, 0), right_stick_pos, 8)
-
-        # 10) READ AND SHOW HAT (D-PAD) STATE
-        # Many Xbox One controllers have 1 hat with values like (0,0), (1,0), (-1,0), (0,1), (0,-1).
-        # Just to display them as text:
-        hat_count = joystick.get_numhats()
-        hat_text_lines = []
-        for i in range(hat_count):
-            hat_val = joystick.get_hat(i)
-            hat_text_lines.append(f"Hat {i} = {hat_val}")
-
-        # 11) (OPTIONAL) DRAW SOME DEBUG TEXT
-        trigger_text = f"LT={lt:.2f}, RT={rt:.2f}"
-        stick_text = f"L=({lx:.2f},{ly:.2f}), R=({rx:.2f},{ry:.2f})"
-        debug_surf1 = font.render(trigger_text, True, (0, 0, 0))
-        debug_surf2 = font.render(stick_text, True, (0, 0, 0))
-
-        screen.blit(debug_surf1, (10, 10))
-        screen.blit(debug_surf2, (10, 35))
-
-        # Show any hat messages
-        y_offset = 60
-        for line in hat_text_lines:
-            surf = font.render(line, True, (0,0,0))
-            screen.blit(surf, (10, y_offset))
-            y_offset += 25
-
-        # 12) UPDATE THE DISPLAY
-        pygame.display.flip()
-
+            elif event.type == pygame.VIDEOEXPOSE:
+                renderer.invalidate()
+            elif event.type == pygame.VIDEORESIZE:
+                # New window size: retile and recompose the background once
+                screen = pygame.display.get_surface()
+                renderer.screen = screen
+                layout_version = None
+            hub.handle_event(event)
+        profiler.lap("events")
+
+        # Published on every wake-up, not only on drawn frames
+        if PUBLISH_SHARED_MEMORY:
+            publish_states(hub, publishers)
+            profiler.lap("publish")
+
+        if not pacer.frame_due:
+            continue
+
+        # Pads were plugged in or out, or the window was resized: rebuild the tiled
+        # layout and its background
+        if hub.version != layout_version:
+            layout_version = hub.version
+            tiles = tile_rects(len(hub), screen.get_rect())
+            renderer.set_background(view.compose_background(screen.get_size(), tiles))
+            profiler.lap("background")
+
+        renderer.begin_frame()
+
+        controllers = hub.controllers()
+        if not controllers:
+            renderer.text("waiting", font, "Waiting for a controller...", (0, 0, 0), (10, 10))
+        for controller, tile in zip(controllers, tiles):
+            label = f"{controller.slot}: {controller.joystick.get_name()}" if len(controllers) > 1 else None
+            view.draw(renderer, controller.instance_id, controller.state, tile, label)
+        profiler.lap("reads")
+        profiler.draw_overlay(renderer, overlay_font, screen.get_rect())
+        profiler.mark()
+
+        # 5) UPDATE ONLY THE CHANGED PARTS OF THE DISPLAY
+        #    With profiling on, end_frame() charges its blits to "background",
+        #    "highlights" and "text"; what is left is finding the dirty rects.
+        dirty_rects = renderer.end_frame()
+        profiler.lap("dirty_rects")
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+        profiler.lap("flip")
+        hub.end_frame()
+        profiler.end_frame()
+
+    for publisher, _ in publishers.values():
+        publisher.close()
+    print(pacer.summary())
+    finish(profiler, PROFILE_EXPORT)
     pygame.quit()
     sys.exit()
 
@@ -0,0 +1,698 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+# End-to-end latency benchmark: runs the real main() loops of joystick.py,
+# discover_inputs.py and haptic.py (SDL dummy video driver, one child process per tool)
+# and feeds them a synthetic controller, then writes every number to one JSON file so
+# two versions can be compared with --compare.
+#
+#   event-to-state  injection of an input event -> ControllerHub.handle_event() done
+#   event-to-frame  injection -> the end of the first frame drawn after it was handled
+#   lost events     injected but never handled
+#   presses not drawn  button presses that no drawn frame ever showed (taps shorter
+#                   than a frame, in tools that poll instead of latching)
+#   frame time      per-frame work time (frame_profiler.py "frame" phase)
+#   CPU per frame   process CPU time during the run / frames drawn
+#   rumble latency  haptic.py only: press of a BENCH_RUMBLE_BUTTONS button (bound for
+#                   the run) -> the effect's play command on the (fake) rumble device
+#
+# The synthetic pad is either a stand-in pygame Joystick fed by posting events (default,
+# works anywhere), or with --source uinput a virtual evdev gamepad that SDL opens like a
+# real one (needs write access to /dev/uinput), so the kernel and SDL input paths are
+# included too.
+
+TOOLS = ("joystick", "discover_inputs", "haptic")
+DEFAULT_OUTPUT = "latency_bench.json"
+
+# Default scenario: this many input events per second for this long, after WARMUP
+# seconds of letting the tool settle; SETTLE seconds are left for the last frames
+SECONDS = 5.0
+RATE = 200
+SEED = 1
+WARMUP = 0.5
+SETTLE = 0.5
+
+# Share of button taps / hat changes in the scenario (the rest moves axes) and the range
+# of tap lengths; the shortest taps are well below one 60 FPS frame
+TAP_SHARE = 0.4
+HAT_SHARE = 0.1
+TAP_SECONDS = (0.004, 0.12)
+
+# --compare flags a metric as a regression when it grew by more than this fraction (and
+# by more than REGRESSION_FLOOR_MS, so sub-0.1 ms noise doesn't count). Only medians and
+# means are gated, and only with at least MIN_COMPARE_SAMPLES samples on both sides:
+# the p99 of a few hundred frames moves by half from one run of the same tree to the
+# next, so tails are printed for information only.
+REGRESSION_THRESHOLD = 0.2
+REGRESSION_FLOOR_MS = 0.1
+MIN_COMPARE_SAMPLES = 100
+
+# How the drawn frame shows a button: "state" tools draw ControllerState.active_mask()
+# (presses latched until the frame), "joystick" tools poll the joystick while drawing
+VISIBILITY = {"joystick": "state", "haptic": "state", "discover_inputs": "joystick"}
+
+# Pad buttons bound to haptic.py's rumble buttons for the run (haptic.PAD_RUMBLE_BUTTONS is
+# empty by default). No "Pulse": its sequence replays "strong" and would be mistaken
+# for LB presses.
+BENCH_RUMBLE_BUTTONS = {"LB": "Strong", "RB": "Weak", "Y": "Sine"}
+
+CHILD_MARKER = "--child"
+
+
+def make_scenario(seconds, rate, seed, buttons, axes, hats):
+    """
+    A reproducible list of (t, kind, index, value) input changes: button taps of random
+    length, axis moves and hat changes, `rate` per second on average.
+    """
+    rng = random.Random(seed)
+    events = []
+    busy_until = {}
+    axis_values = {}
+    t = 0.0
+    while True:
+        t += rng.expovariate(rate)
+        if t >= seconds:
+            break
+        roll = rng.random()
+        if roll < TAP_SHARE:
+            index = rng.randrange(buttons)
+            if busy_until.get(index, -1.0) >= t:
+                continue
+            hold = rng.uniform(*TAP_SECONDS)
+            events.append((t, "button", index, 1))
+            events.append((min(t + hold, seconds), "button", index, 0))
+            busy_until[index] = t + hold
+        elif roll < TAP_SHARE + HAT_SHARE and hats:
+            value = rng.choice(((1, 0), (-1, 0), (0, 1), (0, -1), (0, 0)))
+            events.append((t, "hat", 0, value))
+        else:
+            index = rng.randrange(axes)
+            value = round(rng.uniform(-1.0, 1.0), 3)
+            if axis_values.get(index) == value:
+                continue
+            axis_values[index] = value
+            events.append((t, "axis", index, value))
+    events.sort(key=lambda e: e[0])
+    return events
+
+
+def load_scenario(path, device=0):
+    """
+    The input changes of one pad of a recording.py session, as a scenario.
+    """
+    from recording import KIND_NAMES, Recording, record_device, record_kind, record_value
+
+    with Recording(path) as recording:
+        events = []
+        for record in recording.records():
+            if record_device(record) != device:
+                continue
+            kind = KIND_NAMES[record_kind(record)]
+            value = record_value(record)
+            if kind == "button":
+                value = int(value)
+            events.append((record[0], kind, record[2], value))
+    return events
+
+
+def _stats(values):
+    """
+    min / mean / p50 / p90 / p99 / max of a list of milliseconds (None if empty).
+    """
+    if not values:
+        return None
+    values = sorted(values)
+
+    def pick(p):
+        return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+    return {
+        "count": len(values),
+        "min": round(values[0], 4),
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(pick(50), 4),
+        "p90": round(pick(90), 4),
+        "p99": round(pick(99), 4),
+        "max": round(values[-1], 4),
+    }
+
+
+class Probe:
+    """
+    Collects the timestamps of one run: when each scenario event was injected, handled
+    by a ControllerHub, and first shown in a frame, plus which presses were drawn.
+    """
+
+    def __init__(self, visibility):
+        self.visibility = visibility
+        self.injected = {}      # event id -> perf_counter()
+        self.handled = {}
+        self.framed = {}
+        self.presses = {}       # event id -> button index, for presses
+        self.drawn = set()      # press ids some frame showed
+        self.press_handled = {}  # button index -> ids of its presses handled since the last frame
+        self.pending = []       # handled since the last frame
+        self.fifo = {}          # kind -> deque of ids, when events carry no id (uinput)
+        self.hub = None
+        self.first_frame = threading.Event()
+
+    def inject(self, event_id, kind, index, value):
+        self.injected[event_id] = time.perf_counter()
+        if kind == "button" and value:
+            self.presses[event_id] = index
+
+    def on_handled(self, hub, event, kind, index, value):
+        now = time.perf_counter()
+        event_id = getattr(event, "bench_id", None)
+        if event_id is None:
+            queue = self.fifo.get(kind)
+            event_id = queue.popleft() if queue else None
+        if event_id is None or event_id in self.handled:
+            return
+        self.hub = hub
+        self.handled[event_id] = now
+        self.pending.append(event_id)
+        if event_id in self.presses:
+            self.press_handled.setdefault(index, []).append(event_id)
+
+    def on_frame(self):
+        now = time.perf_counter()
+        for event_id in self.pending:
+            self.framed[event_id] = now
+        self.pending = []
+        if self.visibility == "state" and self.hub is not None:
+            from controller_state import iter_bits
+
+            # A latched bit shows every press of that button since the last frame
+            for controller in self.hub.controllers():
+                for bit in iter_bits(controller.state.active_mask()):
+                    self.drawn.update(self.press_handled.get(bit, ()))
+        self.press_handled = {}
+        self.first_frame.set()
+
+    def results(self, since):
+        ids = [i for i, t in self.injected.items() if t >= since]
+        to_state = [(self.handled[i] - self.injected[i]) * 1000 for i in ids if i in self.handled]
+        to_frame = [(self.framed[i] - self.injected[i]) * 1000 for i in ids if i in self.framed]
+        presses = [i for i in ids if i in self.presses]
+        return {
+            "events": len(ids),
+            "event_to_state_ms": _stats(to_state),
+            "event_to_frame_ms": _stats(to_frame),
+            "lost_events": sum(1 for i in ids if i not in self.handled),
+            "presses": len(presses),
+            "presses_not_drawn": (sum(1 for i in presses if i not in self.drawn)
+                                  if self.visibility is not None else None),
+        }
+
+
+class SyntheticJoystick:
+    """
+    Stand-in for pygame.joystick.Joystick with the built-in Xbox One layout. send()
+    changes a value and posts the matching pygame event (stamped with the scenario event
+    id), the way SDL updates a joystick and then queues its event.
+    """
+
+    def __init__(self, probe, buttons, axes, hats):
+        self.probe = probe
+        self.buttons = [0] * buttons
+        self.axes = [0.0] * axes
+        self.hats = [(0, 0)] * hats
+        self.press_ids = {}
+
+    def init(self):
+        pass
+
+    def quit(self):
+        pass
+
+    def get_instance_id(self):
+        return 0
+
+    def get_name(self):
+        return "Synthetic pad"
+
+    def get_guid(self):
+        return "00000000000000000000000000000000"
+
+    def get_numbuttons(self):
+        return len(self.buttons)
+
+    def get_numaxes(self):
+        return len(self.axes)
+
+    def get_numhats(self):
+        return len(self.hats)
+
+    def get_button(self, i):
+        value = self.buttons[i]
+        if value and self.probe.visibility == "joystick":
+            # Polling tools draw what they read: this press made it to the screen
+            self.probe.drawn.add(self.press_ids.get(i))
+        return value
+
+    def get_axis(self, i):
+        return self.axes[i]
+
+    def get_hat(self, i):
+        return self.hats[i]
+
+    def rumble(self, *args):
+        return False
+
+    def stop_rumble(self):
+        pass
+
+    def send(self, event_id, kind, index, value):
+        import pygame
+
+        if kind == "button":
+            self.buttons[index] = value
+            if value:
+                self.press_ids[index] = event_id
+            event = pygame.event.Event(pygame.JOYBUTTONDOWN if value else pygame.JOYBUTTONUP,
+                                       button=index, instance_id=0, joy=0, bench_id=event_id)
+        elif kind == "axis":
+            self.axes[index] = value
+            event = pygame.event.Event(pygame.JOYAXISMOTION, axis=index, value=value,
+                                       instance_id=0, joy=0, bench_id=event_id)
+        else:
+            self.hats[index] = tuple(value)
+            event = pygame.event.Event(pygame.JOYHATMOTION, hat=index, value=tuple(value),
+                                       instance_id=0, joy=0, bench_id=event_id)
+        self.probe.inject(event_id, kind, index, value)
+        pygame.event.post(event)
+
+
+class UInputPad:
+    """
+    A virtual evdev gamepad (python-evdev UInput) laid out like xpad's Xbox One pad, so
+    SDL numbers its buttons and axes like the built-in profile. Handled events carry no
+    id; they are matched to the injected ones in order, per kind.
+    """
+
+    def __init__(self, probe):
+        from evdev import AbsInfo, UInput, ecodes
+
+        self.ecodes = ecodes
+        self.probe = probe
+        self.button_codes = [ecodes.BTN_SOUTH, ecodes.BTN_EAST, ecodes.BTN_NORTH, ecodes.BTN_WEST,
+                             ecodes.BTN_TL, ecodes.BTN_TR, ecodes.BTN_SELECT, ecodes.BTN_START,
+                             ecodes.BTN_MODE, ecodes.BTN_THUMBL, ecodes.BTN_THUMBR]
+        self.axis_codes = [ecodes.ABS_X, ecodes.ABS_Y, ecodes.ABS_Z, ecodes.ABS_RX, ecodes.ABS_RY,
+                           ecodes.ABS_RZ]
+        stick = AbsInfo(value=0, min=-32768, max=32767, fuzz=0, flat=0, resolution=0)
+        hat = AbsInfo(value=0, min=-1, max=1, fuzz=0, flat=0, resolution=0)
+        capabilities = {
+            ecodes.EV_KEY: self.button_codes,
+            ecodes.EV_ABS: [(code, stick) for code in self.axis_codes] +
+                           [(ecodes.ABS_HAT0X, hat), (ecodes.ABS_HAT0Y, hat)],
+        }
+        self.device = UInput(capabilities, name="PDP latency bench pad", vendor=0x0E6F, product=0x02A4)
+        self.hat = (0, 0)
+        # Give udev and SDL time to see the new node before the tool starts
+        time.sleep(1.0)
+
+    def send(self, event_id, kind, index, value):
+        e = self.ecodes
+        if kind == "button":
+            self.device.write(e.EV_KEY, self.button_codes[index], int(value))
+        elif kind == "axis":
+            self.device.write(e.EV_ABS, self.axis_codes[index], int(round(value * 32767)))
+        else:
+            # evdev's hat Y axis points down, SDL/pygame's points up
+            if value[0] != self.hat[0]:
+                self.device.write(e.EV_ABS, e.ABS_HAT0X, value[0])
+            if value[1] != self.hat[1]:
+                self.device.write(e.EV_ABS, e.ABS_HAT0Y, -value[1])
+            self.hat = tuple(value)
+        self.probe.fifo.setdefault(kind, deque()).append(event_id)
+        self.probe.inject(event_id, kind, index, value)
+        self.device.syn()
+
+    def close(self):
+        self.device.close()
+
+
+def _rumble_latencies(scenario, probe, scheduler, offset, since):
+    """
+    Pair every play command on the fake device with the latest press of a button that
+    plays that effect before it, and return (latencies in ms, presses without a play of
+    their own). The scheduler merges presses that come faster than it writes, so those
+    show up as presses without a play.
+    """
+    from controller_profile import load_profile
+
+    effects = {"Strong": "strong", "Weak": "weak", "Sine": "sine"}
+    buttons = load_profile().buttons
+    effect_of = {buttons[b]: effects[label] for b, label in BENCH_RUMBLE_BUTTONS.items()
+                 if b in buttons and label in effects}
+
+    presses = {}
+    for event_id, (_, kind, index, value) in enumerate(scenario):
+        injected = probe.injected.get(event_id)
+        if injected is not None and injected >= since and kind == "button" and value and index in effect_of:
+            presses.setdefault(effect_of[index], []).append(injected)
+
+    latencies = []
+    matched = 0
+    for stamp, command, name in scheduler.backend.log:
+        queue = presses.get(name)
+        if command != "play" or not queue:
+            continue
+        stamp += offset
+        # Latest press before this play; older unmatched ones were merged into it
+        before = [t for t in queue if t <= stamp]
+        if not before:
+            continue
+        latencies.append((stamp - before[-1]) * 1000)
+        matched += 1
+        presses[name] = [t for t in queue if t > stamp]
+    total = sum(1 for event_id, (_, kind, index, value) in enumerate(scenario)
+                if kind == "button" and value and index in effect_of
+                and probe.injected.get(event_id, -1.0) >= since)
+    return latencies, total - matched
+
+
+def run_tool(tool, scenario, source):
+    """
+    Run `tool`'s main() against the scenario in this process and return its results.
+    """
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import importlib
+    import pygame
+    import frame_profiler
+    from controller_profile import XBOX_ONE_AXES, XBOX_ONE_BUTTONS
+    from controller_state import ControllerHub
+
+    probe = Probe(VISIBILITY.get(tool) if source == "synthetic" or VISIBILITY.get(tool) == "state" else None)
+
+    # Frame times come from the tool's own frame profiler, switched on here; its
+    # histograms are read directly instead of being exported
+    profilers = []
+
+    def make_profiler(enabled=False):
+        profilers.append(frame_profiler.FrameProfiler())
+        return profilers[-1]
+
+    frame_profiler.make_profiler = make_profiler
+    frame_profiler.finish = lambda profiler, path=None: None
+
+    if source == "uinput":
+        pad = UInputPad(probe)
+    else:
+        pad = SyntheticJoystick(probe, len(XBOX_ONE_BUTTONS), len(XBOX_ONE_AXES), 1)
+        pygame.joystick.get_count = lambda: 1
+        pygame.joystick.Joystick = lambda device_index: pad
+
+    # Hooks: events handled by the hub, and the end of each frame (a display update, or
+    # hub.end_frame() when nothing needed updating)
+    kinds = {pygame.JOYBUTTONDOWN: "button", pygame.JOYBUTTONUP: "button",
+             pygame.JOYAXISMOTION: "axis", pygame.JOYHATMOTION: "hat"}
+    handle_event = ControllerHub.handle_event
+    hub_end_frame = ControllerHub.end_frame
+
+    def hooked_handle_event(hub, event):
+        changed = handle_event(hub, event)
+        kind = kinds.get(event.type)
+        if kind is not None:
+            index = getattr(event, "button", getattr(event, "axis", getattr(event, "hat", 0)))
+            probe.on_handled(hub, event, kind, index, getattr(event, "value", None))
+        return changed
+
+    def hooked_end_frame(hub):
+        probe.on_frame()
+        hub_end_frame(hub)
+
+    ControllerHub.handle_event = hooked_handle_event
+    ControllerHub.end_frame = hooked_end_frame
+    for name in ("flip", "update"):
+        original = getattr(pygame.display, name)
+
+        def hooked(*args, _original=original):
+            _original(*args)
+            probe.on_frame()
+
+        setattr(pygame.display, name, hooked)
+
+    schedulers = []
+    if tool == "haptic":
+        import haptic
+
+        haptic.FAKE_HAPTIC_DEVICE = True
+        haptic.PAD_RUMBLE_BUTTONS = dict(BENCH_RUMBLE_BUTTONS)
+        get_haptics = haptic.get_haptics
+
+        def hooked_get_haptics(joystick=None):
+            scheduler = get_haptics(joystick)
+            if scheduler is not None and scheduler not in schedulers:
+                schedulers.append(scheduler)
+            return scheduler
+
+        haptic.get_haptics = hooked_get_haptics
+
+    module = importlib.import_module(tool)
+    sys.argv = [tool + ".py"]
+    window = {}
+
+    def drive():
+        if not probe.first_frame.wait(30):
+            window["error"] = "the tool never drew a frame"
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+            return
+        time.sleep(WARMUP)
+        if profilers:
+            profilers[0].reset()
+        window["cpu"] = time.process_time()
+        window["start"] = start = time.perf_counter()
+        for event_id, (t, kind, index, value) in enumerate(scenario):
+            delay = start + t - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pad.send(event_id, kind, index, value)
+        time.sleep(SETTLE)
+        window["cpu"] = time.process_time() - window["cpu"]
+        window["seconds"] = time.perf_counter() - start
+        window["frames"] = profilers[0].frames if profilers else None
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+    # Monotonic clock of FakeHapticDevice -> perf_counter
+    clock_offset = time.perf_counter() - time.monotonic()
+    threading.Thread(target=drive, daemon=True).start()
+    try:
+        module.main()
+    except SystemExit:
+        pass
+    finally:
+        if source == "uinput":
+            pad.close()
+
+    if "error" in window:
+        return {"error": window["error"]}
+    result = probe.results(window["start"])
+    frames = window["frames"]
+    if profilers and frames:
+        frame = profilers[0].histograms["frame"]
+        result["frames"] = frames
+        result["fps"] = round(frames / window["seconds"], 2)
+        result["frame_time_ms"] = {
+            "count": frame.total,
+            "p50": frame.percentile(50) / 1000,
+            "p90": frame.percentile(90) / 1000,
+            "p99": frame.percentile(99) / 1000,
+            "max": frame.max / 1000,
+            "mean": round(frame.mean() / 1000, 4),
+        }
+        result["cpu_ms_per_frame"] = round(window["cpu"] * 1000 / frames, 4)
+    result["cpu_percent"] = round(100 * window["cpu"] / window["seconds"], 2)
+    if schedulers:
+        latencies, unmatched = _rumble_latencies(scenario, probe, schedulers[0], clock_offset, window["start"])
+        result["rumble_latency_ms"] = _stats(latencies)
+        result["rumble_presses_merged"] = unmatched
+    return result
+
+
+def _git_version():
+    try:
+        out = subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_suite(args):
+    """
+    Run every requested tool in its own child process and collect the results.
+    """
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    results = {
+        "version": _git_version(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "source": args.source,
+        "scenario": {"recording": args.recording} if args.recording else
+                    {"seconds": args.seconds, "rate": args.rate, "seed": args.seed},
+        "tools": {},
+    }
+    for tool in args.tools:
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        command = [sys.executable, os.path.abspath(__file__), CHILD_MARKER, tool, "--child-output", path,
+                   "--seconds", str(args.seconds), "--rate", str(args.rate), "--seed", str(args.seed),
+                   "--source", args.source]
+        if args.recording:
+            command += ["--recording", args.recording]
+        print(f"Running {tool}...", file=sys.stderr)
+        try:
+            proc = subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                  text=True, timeout=args.seconds + 120)
+        except subprocess.TimeoutExpired:
+            results["tools"][tool] = {"error": "timed out"}
+            os.unlink(path)
+            continue
+        try:
+            with open(path) as f:
+                results["tools"][tool] = json.load(f)
+        except ValueError:
+            # The child died before writing its results: keep the last line of its stderr
+            results["tools"][tool] = {"error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+        finally:
+            os.unlink(path)
+    return results
+
+
+def print_results(results):
+    print(f"{'':<16} {'state p50/p99':>14} {'frame p50/p99':>14} {'lost':>5} {'undrawn':>8} "
+          f"{'frame ms p99':>12} {'cpu ms/frame':>12} {'rumble p50/p99':>15}")
+    for tool, r in results["tools"].items():
+        if "error" in r:
+            print(f"{tool:<16} error: {r['error']}")
+            continue
+
+        def pair(stats):
+            return f"{stats['p50']:.2f}/{stats['p99']:.2f}" if stats else "-"
+
+        frame = r.get("frame_time_ms")
+        undrawn = "-" if r["presses_not_drawn"] is None else f"{r['presses_not_drawn']}/{r['presses']}"
+        print(f"{tool:<16} {pair(r['event_to_state_ms']):>14} {pair(r['event_to_frame_ms']):>14} "
+              f"{r['lost_events']:>5} {undrawn:>8} "
+              f"{frame['p99'] if frame else '-':>12} {r.get('cpu_ms_per_frame', '-'):>12} "
+              f"{pair(r.get('rumble_latency_ms')):>15}")
+
+
+# (metric, statistic, gated) --compare prints; statistic None = the value itself, and
+# only gated ones can fail the comparison
+COMPARED = [
+    ("event_to_state_ms", "p50", True), ("event_to_state_ms", "p99", False),
+    ("event_to_frame_ms", "p50", True), ("event_to_frame_ms", "p99", False),
+    ("frame_time_ms", "p50", True), ("frame_time_ms", "p99", False),
+    ("cpu_ms_per_frame", None, True),
+    ("rumble_latency_ms", "p50", True), ("rumble_latency_ms", "p99", False),
+]
+
+
+def compare(old, new, threshold=REGRESSION_THRESHOLD):
+    """
+    Print every compared metric of two result files side by side and return the list of
+    regressions (gated metrics with enough samples only).
+    """
+    regressions = []
+    print(f"\nComparing with {old.get('version') or 'previous results'} ({old.get('time', '?')}):")
+    for tool, r in new["tools"].items():
+        before = old.get("tools", {}).get(tool)
+        if not before or "error" in before or "error" in r:
+            continue
+        for metric, stat, gated in COMPARED:
+            a, b = before.get(metric), r.get(metric)
+            if stat is not None:
+                counts = (a.get("count", 0) if a else 0, b.get("count", 0) if b else 0)
+                a = a.get(stat) if a else None
+                b = b.get(stat) if b else None
+            else:
+                counts = (MIN_COMPARE_SAMPLES, MIN_COMPARE_SAMPLES)
+            if a is None or b is None:
+                continue
+            change = (b - a) / a if a else 0.0
+            flag = ""
+            if not gated:
+                flag = "  (info)"
+            elif min(counts) < MIN_COMPARE_SAMPLES:
+                flag = f"  (only {min(counts)} samples, not gated)"
+            elif change > threshold and b - a > REGRESSION_FLOOR_MS:
+                flag = "  REGRESSION"
+                regressions.append((tool, metric, stat, a, b))
+            label = metric + (f" {stat}" if stat else "")
+            print(f"  {tool:<16} {label:<24} {a:9.3f} -> {b:9.3f} ms ({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end input latency / frame time benchmark "
+                                                 "of the tools with a synthetic controller.")
+    parser.add_argument("--tools", nargs="+", choices=TOOLS, default=list(TOOLS))
+    parser.add_argument("--seconds", type=float, default=SECONDS, help="scenario length")
+    parser.add_argument("--rate", type=float, default=RATE, help="input events per second")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--recording", help="replay this recording.py session instead of a generated scenario")
+    parser.add_argument("--source", choices=("synthetic", "uinput"), default="synthetic",
+                        help="uinput = a virtual evdev gamepad (needs /dev/uinput)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="results file (JSON)")
+    parser.add_argument("--compare", metavar="OLD.json", help="compare with an earlier results file")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="relative growth counted as a regression by --compare")
+    parser.add_argument(CHILD_MARKER, choices=TOOLS, help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        from controller_profile import XBOX_ONE_AXES, XBOX_ONE_BUTTONS
+
+        if args.recording:
+            scenario = load_scenario(args.recording)
+        else:
+            scenario = make_scenario(args.seconds, args.rate, args.seed, len(XBOX_ONE_BUTTONS),
+                                     len(XBOX_ONE_AXES), 1)
+        result = run_tool(args.child, scenario, args.source)
+        with open(args.child_output, "w") as f:
+            json.dump(result, f)
+        return
+
+    if args.source == "uinput" and not os.access("/dev/uinput", os.W_OK):
+        print("/dev/uinput is not writable (load the uinput module and check permissions), "
+              "or use --source synthetic")
+        sys.exit(1)
+
+    results = run_suite(args)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print_results(results)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        try:
+            with open(args.compare) as f:
+                old = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read {args.compare}: {e}")
+            sys.exit(1)
+        regressions = compare(old, results, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s)")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
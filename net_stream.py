@@ -0,0 +1,599 @@
+import argparse
+import os
+import random
+import select
+import socket
+import struct
+import sys
+import time
+from collections import OrderedDict
+
+from controller_profile import XBOX_ONE_AXES, XBOX_ONE_BUTTONS, load_profile
+
+# Stream one controller's state to another machine (e.g. a robot) over UDP.
+#
+# Every packet = HEADER + payload:
+#   HEADER: magic "PD", version, type, sequence number, base sequence, sender timestamp
+#   FULL:   the whole frame (FRAME, 16 bytes)
+#   DELTA:  a change mask + only the fields that differ from frame `base`, which is a
+#           FULL the receiver has acknowledged. Deltas never depend on other deltas, so
+#           a lost packet is simply superseded by the next one.
+#   ACK:    receiver -> sender, "I have FULL `seq`" (it becomes the new delta base)
+#   NACK:   receiver -> sender, "I don't have base `seq`" (send a FULL again)
+#
+# While nothing changes the sender repeats the current state every HEARTBEAT_INTERVAL,
+# and the receiver falls back to a neutral state (failsafe) if nothing arrives for
+# FAILSAFE_TIMEOUT.
+
+DEFAULT_PORT = 47800
+HEARTBEAT_INTERVAL = 0.1   # seconds between packets while the pad is idle
+KEYFRAME_INTERVAL = 1.0    # refresh the delta base at least this often
+FAILSAFE_TIMEOUT = 0.3     # receiver goes neutral after this long without packets
+FULL_HISTORY = 8           # FULL frames remembered on both sides
+RESTART_GAP = 256          # a FULL this many seqs behind the last one is from a restarted sender
+FILTER_INTERVAL = 0.005    # with --filter, how often the filtered axes are re-evaluated
+
+HEADER = struct.Struct("<2sBBIId")
+MAGIC = b"PD"
+VERSION = 1
+TYPE_FULL, TYPE_DELTA, TYPE_ACK, TYPE_NACK = range(4)
+
+# Wire order of the frame fields. Buttons are a bitmask in WIRE_BUTTONS order, axes are
+# int16 (value * AXIS_SCALE), the hat is two int8.
+# The wire order is the built-in Xbox One layout, whatever the local profile maps, so
+# both ends always agree.
+WIRE_BUTTONS = tuple(sorted(XBOX_ONE_BUTTONS, key=XBOX_ONE_BUTTONS.get))
+WIRE_AXES = tuple(sorted(XBOX_ONE_AXES, key=XBOX_ONE_AXES.get))
+TRIGGER_AXES = ("LT", "RT")
+AXIS_SCALE = 32767
+
+# Flat frame tuple: (buttons, hat_x, hat_y, axis_0 .. axis_5)
+FRAME = struct.Struct("<Hbb" + "h" * len(WIRE_AXES))
+# Delta groups: bit 0 = buttons, bit 1 = hat, bit 2+i = axis i -> (frame slice, format)
+DELTA_GROUPS = [(slice(0, 1), "H"), (slice(1, 3), "bb")] + \
+               [(slice(3 + i, 4 + i), "h") for i in range(len(WIRE_AXES))]
+
+# What the receiver reports when the link is down: nothing pressed, sticks centered,
+# triggers released (-1, like pygame reports them at rest)
+NEUTRAL_FRAME = (0, 0, 0) + tuple(-AXIS_SCALE if name in TRIGGER_AXES else 0 for name in WIRE_AXES)
+
+_delta_structs = {}
+
+
+def _delta_struct(mask):
+    """
+    struct for the fields selected by `mask`, built once per mask.
+    """
+    s = _delta_structs.get(mask)
+    if s is None:
+        fmt = "<B" + "".join(fmt for bit, (_, fmt) in enumerate(DELTA_GROUPS) if mask & (1 << bit))
+        s = _delta_structs[mask] = struct.Struct(fmt)
+    return s
+
+
+def encode_delta(base, frame):
+    mask = 0
+    values = []
+    for bit, (fields, _) in enumerate(DELTA_GROUPS):
+        if frame[fields] != base[fields]:
+            mask |= 1 << bit
+            values.extend(frame[fields])
+    return _delta_struct(mask).pack(mask, *values)
+
+
+def decode_delta(base, payload):
+    mask = payload[0]
+    values = iter(_delta_struct(mask).unpack(payload)[1:])
+    frame = list(base)
+    for bit, (fields, _) in enumerate(DELTA_GROUPS):
+        if mask & (1 << bit):
+            for i in range(fields.start, fields.stop):
+                frame[i] = next(values)
+    return tuple(frame)
+
+
+def _newer(seq, than):
+    """
+    Sequence comparison that survives the 32-bit wrap.
+    """
+    return than is None or 0 < ((seq - than) & 0xFFFFFFFF) < 0x80000000
+
+
+def _quantize_axis(value):
+    return max(-AXIS_SCALE, min(AXIS_SCALE, int(round(value * AXIS_SCALE))))
+
+
+class StateSender:
+    """
+    Sends a controller's state to `address` whenever it changes, and as a heartbeat
+    while it doesn't. Call update() after handling input and service() regularly (it
+    reads ACKs and sends heartbeats); neither blocks.
+
+    `filters` is an optional axis_filters.FilterPipeline over the axes in WIRE_AXES
+    order. Smoothing keeps moving after the input stops, so service() re-evaluates it
+    with the last state.
+    """
+
+    def __init__(self, address, button_mapping=None, axis_mapping=None,
+                 heartbeat_interval=HEARTBEAT_INTERVAL, keyframe_interval=KEYFRAME_INTERVAL, sock=None,
+                 filters=None):
+        if button_mapping is None or axis_mapping is None:
+            profile = load_profile()
+            button_mapping = button_mapping if button_mapping is not None else profile.buttons
+            axis_mapping = axis_mapping if axis_mapping is not None else profile.axes
+        self.button_mapping = button_mapping
+        self.axis_mapping = axis_mapping
+        # Local button index -> wire bit, so only pressed buttons are visited
+        self.wire_bits = {self.button_mapping[name]: 1 << bit for bit, name in enumerate(WIRE_BUTTONS)
+                          if name in self.button_mapping}
+        self.heartbeat_interval = heartbeat_interval
+        self.keyframe_interval = keyframe_interval
+        self.filters = filters
+        self.state = None
+
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.connect(address)
+        sock.setblocking(False)
+        self.sock = sock
+
+        self.seq = 0
+        self.frame = NEUTRAL_FRAME
+        self.full_frames = OrderedDict()  # seq -> frame of recent FULL packets
+        self.base_seq = None              # last FULL the receiver acknowledged
+        self.base = None
+        self.last_send = None
+        self.last_full = None
+
+        self.packets = 0
+        self.full_packets = 0
+        self.bytes = 0
+        self.acks = 0
+        self.errors = 0
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def frame_from_state(self, state, now=None):
+        buttons = 0
+        mask = state.button_mask
+        while mask:
+            low = mask & -mask
+            buttons |= self.wire_bits.get(low.bit_length() - 1, 0)
+            mask ^= low
+        hat = state.get_hat(0) if state.get_numhats() else (0, 0)
+        axes = []
+        for name in WIRE_AXES:
+            index = self.axis_mapping.get(name)
+            if index is None:
+                axes.append(NEUTRAL_FRAME[3 + len(axes)] / AXIS_SCALE)
+            else:
+                axes.append(state.get_axis(index))
+        if self.filters is not None:
+            axes = self.filters.process_sample(time.perf_counter() if now is None else now, axes)
+        return (buttons, hat[0], hat[1], *(_quantize_axis(value) for value in axes))
+
+    def update(self, state, now=None):
+        """
+        Send the state of a ControllerState if it changed since the last packet.
+        """
+        self.state = state
+        frame = self.frame_from_state(state, now)
+        if frame != self.frame:
+            self.frame = frame
+            self.send(now)
+
+    def service(self, now=None):
+        now = time.perf_counter() if now is None else now
+        self._read_acks()
+        if self.filters is not None and self.state is not None:
+            self.update(self.state, now)
+        if self.last_send is None or now - self.last_send >= self.heartbeat_interval:
+            self.send(now)
+
+    def next_timeout(self, now=None):
+        """
+        Seconds until service() needs to send the next heartbeat.
+        """
+        if self.last_send is None:
+            return 0.0
+        now = time.perf_counter() if now is None else now
+        return max(0.0, self.last_send + self.heartbeat_interval - now)
+
+    def send(self, now=None):
+        now = time.perf_counter() if now is None else now
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+
+        payload = None
+        if self.base is not None and now - self.last_full < self.keyframe_interval:
+            payload = encode_delta(self.base, self.frame)
+            if len(payload) >= FRAME.size:
+                payload = None
+        if payload is None:
+            packet = HEADER.pack(MAGIC, VERSION, TYPE_FULL, self.seq, 0, now) + FRAME.pack(*self.frame)
+            self.full_frames[self.seq] = self.frame
+            while len(self.full_frames) > FULL_HISTORY:
+                self.full_frames.popitem(last=False)
+            self.last_full = now
+            self.full_packets += 1
+        else:
+            packet = HEADER.pack(MAGIC, VERSION, TYPE_DELTA, self.seq, self.base_seq, now) + payload
+
+        self.last_send = now
+        try:
+            self.sock.send(packet)
+        except OSError:
+            # Nobody listening yet (ICMP port unreachable) or buffer full: the next
+            # packet carries the state anyway
+            self.errors += 1
+            return
+        self.packets += 1
+        self.bytes += len(packet)
+
+    def _read_acks(self):
+        while True:
+            try:
+                data = self.sock.recv(64)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                self.errors += 1
+                return
+            if len(data) < HEADER.size:
+                continue
+            magic, version, kind, seq, _, _ = HEADER.unpack_from(data)
+            if magic != MAGIC or version != VERSION:
+                continue
+            if kind == TYPE_ACK:
+                frame = self.full_frames.get(seq)
+                if frame is not None and _newer(seq, self.base_seq):
+                    self.acks += 1
+                    self.base_seq = seq
+                    self.base = frame
+            elif kind == TYPE_NACK and seq == self.base_seq:
+                # Receiver restarted or lost the base: go back to FULL frames
+                self.base_seq = None
+                self.base = None
+
+    def stats(self):
+        return {
+            "packets": self.packets,
+            "full_packets": self.full_packets,
+            "bytes": self.bytes,
+            "acks": self.acks,
+            "errors": self.errors,
+        }
+
+    def close(self):
+        self.sock.close()
+
+
+class StateReceiver:
+    """
+    Receives a StateSender's stream. poll() applies every packet that arrived and
+    returns True if the state changed; button()/axis()/hat() read the result by the same
+    names as WIRE_BUTTONS / WIRE_AXES.
+
+    Old or duplicated packets are dropped by sequence number. If no packet arrives for
+    `failsafe_timeout`, the state goes neutral and `failsafe` becomes True until the
+    stream comes back; callbacks in `on_failsafe` get (receiver, active) on each switch.
+    """
+
+    def __init__(self, port=DEFAULT_PORT, host="0.0.0.0", failsafe_timeout=FAILSAFE_TIMEOUT, sock=None):
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((host, port))
+        sock.setblocking(False)
+        self.sock = sock
+        self.failsafe_timeout = failsafe_timeout
+
+        self.frame = NEUTRAL_FRAME
+        self.full_frames = OrderedDict()
+        self.last_seq = None
+        self.last_packet = None
+        self.last_sent_time = None
+        self.failsafe = True
+        self.on_failsafe = []
+
+        self.received = 0
+        self.applied = 0
+        self.stale = 0
+        self.lost = 0
+        self.missing_base = 0
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def poll(self, timeout=0.0):
+        """
+        Wait up to `timeout` seconds for packets, apply all of them and check the failsafe.
+        """
+        if timeout:
+            select.select([self.sock], [], [], timeout)
+        before = self.frame
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(256)
+            except (BlockingIOError, InterruptedError):
+                break
+            self._handle(data, addr)
+        self.check_failsafe()
+        return self.frame != before
+
+    def _handle(self, data, addr):
+        if len(data) < HEADER.size:
+            return
+        magic, version, kind, seq, base_seq, sent_time = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            return
+        self.received += 1
+        payload = memoryview(data)[HEADER.size:]
+
+        if kind == TYPE_FULL:
+            if len(payload) != FRAME.size:
+                return
+            frame = FRAME.unpack(payload)
+            if self.last_seq is not None and _newer(self.last_seq, seq):
+                behind = (self.last_seq - seq) & 0xFFFFFFFF
+                if behind > RESTART_GAP or self.failsafe:
+                    # A restarted sender counts from 1 again: forget the old sequence
+                    # numbers and bases, or every new packet would look stale. A late
+                    # FULL from the old stream is never this far behind (or this late).
+                    self.last_seq = None
+                    self.full_frames.clear()
+            self.full_frames[seq] = frame
+            while len(self.full_frames) > FULL_HISTORY:
+                self.full_frames.popitem(last=False)
+            self._reply(TYPE_ACK, seq, addr)
+        elif kind == TYPE_DELTA:
+            base = self.full_frames.get(base_seq)
+            if base is None:
+                self.missing_base += 1
+                self._reply(TYPE_NACK, base_seq, addr)
+                return
+            try:
+                frame = decode_delta(base, payload)
+            except (struct.error, IndexError):
+                return
+        else:
+            return
+
+        if not _newer(seq, self.last_seq):
+            self.stale += 1
+            return
+        if self.last_seq is not None:
+            self.lost += ((seq - self.last_seq) & 0xFFFFFFFF) - 1
+        self.last_seq = seq
+        self.last_packet = time.perf_counter()
+        self.last_sent_time = sent_time
+        self.frame = frame
+        self.applied += 1
+
+    def _reply(self, kind, seq, addr):
+        try:
+            self.sock.sendto(HEADER.pack(MAGIC, VERSION, kind, seq, 0, time.perf_counter()), addr)
+        except OSError:
+            pass
+
+    def check_failsafe(self, now=None):
+        now = time.perf_counter() if now is None else now
+        active = self.last_packet is None or now - self.last_packet > self.failsafe_timeout
+        if active:
+            # The delta bases are kept: after a burst of loss the same stream resumes
+            self.frame = NEUTRAL_FRAME
+        if active != self.failsafe:
+            self.failsafe = active
+            for callback in self.on_failsafe:
+                callback(self, active)
+        return active
+
+    def button(self, name):
+        return bool(self.frame[0] & (1 << WIRE_BUTTONS.index(name)))
+
+    def axis(self, name):
+        return self.frame[3 + WIRE_AXES.index(name)] / AXIS_SCALE
+
+    def hat(self):
+        return (self.frame[1], self.frame[2])
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "applied": self.applied,
+            "stale": self.stale,
+            "lost": self.lost,
+            "missing_base": self.missing_base,
+        }
+
+    def close(self):
+        self.sock.close()
+
+
+def describe(receiver):
+    pressed = [name for name in WIRE_BUTTONS if receiver.button(name)]
+    axes = " ".join(f"{name}={receiver.axis(name):+.2f}" for name in WIRE_AXES)
+    return f"{axes} hat={receiver.hat()} buttons={pressed}"
+
+
+def run_sender(host, port, filtered=False):
+    """
+    Stream the first connected pad to host:port. No window is opened. With `filtered`,
+    the axes go through axis_filters.default_pipeline() first.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from controller_state import ControllerHub
+
+    pygame.init()
+    pygame.joystick.init()
+    hub = ControllerHub()
+    hub.open_all()
+    if len(hub) == 0:
+        print("No joystick connected yet, waiting for one...")
+
+    filters = None
+    if filtered:
+        from axis_filters import default_pipeline
+        filters = default_pipeline()
+    sender = StateSender((host, port), filters=filters)
+    print(f"Streaming to {host}:{port} (Ctrl+C to stop)")
+    try:
+        running = True
+        while running:
+            # Wake on input, or when the next heartbeat is due
+            timeout = sender.next_timeout()
+            if filters is not None:
+                timeout = min(timeout, FILTER_INTERVAL)
+            first = pygame.event.wait(max(1, int(timeout * 1000)))
+            events = [] if first.type == pygame.NOEVENT else [first] + pygame.event.get()
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
+                hub.handle_event(event)
+            controllers = hub.controllers()
+            if controllers:
+                sender.update(controllers[0].state)
+            sender.service()
+            hub.end_frame()
+    except KeyboardInterrupt:
+        pass
+    print(sender.stats())
+    sender.close()
+    pygame.quit()
+
+
+def run_receiver(port):
+    receiver = StateReceiver(port)
+
+    def failsafe(_, active):
+        print("FAILSAFE: link lost, state neutral" if active else "Link up")
+
+    receiver.on_failsafe.append(failsafe)
+    print(f"Listening on UDP port {port} (Ctrl+C to stop)")
+    try:
+        while True:
+            if receiver.poll(timeout=0.05):
+                print(describe(receiver))
+    except KeyboardInterrupt:
+        pass
+    print(receiver.stats())
+    receiver.close()
+
+
+class _LossySocket:
+    """
+    Drops a fraction of outgoing packets; for the loopback self-test.
+    """
+
+    def __init__(self, sock, loss):
+        self.sock = sock
+        self.loss = loss
+
+    def send(self, data):
+        if random.random() >= self.loss:
+            return self.sock.send(data)
+        return len(data)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+def selftest(loss, seconds):
+    """
+    Sender and receiver on 127.0.0.1 with `loss` of the sender's packets dropped: checks
+    that the receiver converges on the sender's state, that it goes into failsafe
+    when the stream stops, and that it follows a restarted sender (sequence numbers
+    starting over) afterwards.
+    """
+    from controller_state import ControllerState
+
+    receiver = StateReceiver(0, host="127.0.0.1")
+    port = receiver.sock.getsockname()[1]
+    raw = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    raw.connect(("127.0.0.1", port))
+    sender = StateSender(None, sock=_LossySocket(raw, loss))
+    state = ControllerState()
+    rng = random.Random(1)
+
+    mismatches = 0
+    checks = 0
+    latencies = []
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        # A few random changes at ~500 Hz
+        if rng.random() < 0.5:
+            state.set_button(rng.randrange(11), rng.random() < 0.5)
+        state.set_axis(rng.randrange(6), rng.uniform(-1, 1))
+        if rng.random() < 0.05:
+            state.set_hat(0, (rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1))))
+        sender.update(state)
+        sender.service()
+        if receiver.poll(timeout=0.002):
+            latencies.append(time.perf_counter() - receiver.last_sent_time)
+        sender.service()
+
+        # With the pad idle, heartbeats must bring the receiver to the exact state
+        if rng.random() < 0.01:
+            settle = time.perf_counter() + 10 * sender.heartbeat_interval
+            while receiver.frame != sender.frame and time.perf_counter() < settle:
+                sender.service()
+                receiver.poll(timeout=0.002)
+            checks += 1
+            mismatches += receiver.frame != sender.frame
+
+    time.sleep(receiver.failsafe_timeout * 1.5)
+    receiver.poll()
+    failsafe_ok = receiver.failsafe and receiver.frame == NEUTRAL_FRAME
+
+    # Sender restart: a new sender (seq from 1 again) must bring the receiver back
+    raw2 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    raw2.connect(("127.0.0.1", port))
+    restarted = StateSender(None, sock=raw2)
+    state.set_axis(0, 0.5)
+    restarted.update(state)
+    settle = time.perf_counter() + 1.0
+    while (receiver.failsafe or receiver.frame != restarted.frame) and time.perf_counter() < settle:
+        restarted.service()
+        receiver.poll(timeout=0.002)
+    restart_ok = not receiver.failsafe and receiver.frame == restarted.frame
+    restarted.close()
+
+    sent = sender.stats()
+    print(f"loss={loss:.0%}: {sent['packets']} packets, {sent['bytes'] / max(1, sent['packets']):.1f} bytes avg, "
+          f"{sent['full_packets']} full, {sent['acks']} acks")
+    print(f"receiver: {receiver.stats()}")
+    if latencies:
+        latencies.sort()
+        print(f"loopback latency median {latencies[len(latencies) // 2] * 1e6:.0f} us, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f} us")
+    print(f"converged {checks - mismatches}/{checks} times, failsafe {'OK' if failsafe_ok else 'FAILED'}, "
+          f"sender restart {'OK' if restart_ok else 'FAILED'}")
+    sender.close()
+    receiver.close()
+    return mismatches == 0 and failsafe_ok and restart_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream controller state over UDP.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    send = sub.add_parser("send", help="stream the local pad to HOST")
+    send.add_argument("host")
+    send.add_argument("--port", type=int, default=DEFAULT_PORT)
+    send.add_argument("--filter", action="store_true",
+                      help="smooth and shape the axes with axis_filters.default_pipeline() (needs NumPy)")
+    receive = sub.add_parser("receive", help="print the state streamed to this machine")
+    receive.add_argument("--port", type=int, default=DEFAULT_PORT)
+    test = sub.add_parser("selftest", help="sender + receiver on loopback with simulated packet loss")
+    test.add_argument("--loss", type=float, default=0.2, help="fraction of packets to drop (default: %(default)s)")
+    test.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    if args.command == "send":
+        run_sender(args.host, args.port, args.filter)
+    elif args.command == "receive":
+        run_receiver(args.port)
+    else:
+        sys.exit(0 if selftest(args.loss, args.seconds) else 1)
+
+if __name__ == "__main__":
+    main()
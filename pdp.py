@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# One entry point for the tools:
+#
+#   python pdp.py inspect [--headless ...]      discover_inputs.py
+#   python pdp.py visualize                     joystick.py
+#   python pdp.py calibrate [--axes]            calibrate_joy.py
+#   python pdp.py rumble strong|weak|sine|pulse haptic.rumble_once (no window)
+#   ... | python pdp.py rumble follow          haptic.follow_telemetry (strengths from stdin)
+#   python pdp.py quality [--recording F]       signal_quality.py (report rate, noise, bounce)
+#   python pdp.py record FILE [--ring N]        recording.py record
+#   python pdp.py replay FILE [--speed X]       recording.py replay
+#   python pdp.py bench-startup                 time-to-first-frame / time-to-first-rumble
+#   python pdp.py bench-latency [--compare F]   latency_bench.py (input latency, frame time)
+#   python pdp.py devices [--pygame]            device_index.py (which event node is which pad)
+#
+# Only the standard library is imported here. Each subcommand imports its own tool when
+# it runs, so `rumble` never loads pygame or NumPy and `replay --info` loads neither
+# pygame nor evdev.
+
+# With this environment variable set, the first frame (or first rumble write) prints a
+# STARTUP_MARKER line to stderr and the process exits right away. bench-startup uses it.
+PROBE_ENV = "PDP_STARTUP_PROBE"
+STARTUP_MARKER = "PDP_STARTUP"
+
+# Modules whose presence the startup benchmark reports for each subcommand
+HEAVY_MODULES = ("pygame", "evdev", "numpy")
+
+BENCH_RUNS = 10
+
+
+def _probe_marker(what):
+    """
+    Report `what` happened now (perf_counter uses the system-wide monotonic clock, so
+    the parent can subtract its own start time) and which heavy modules were loaded.
+    """
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    sys.stderr.write(f"{STARTUP_MARKER} {what} {time.perf_counter():.9f} {','.join(loaded) or '-'}\n")
+    sys.stderr.flush()
+    os._exit(0)
+
+
+def _probe_first_frame():
+    """
+    Under PDP_STARTUP_PROBE, report the first display flip/update and exit.
+    """
+    if not os.environ.get(PROBE_ENV):
+        return
+    import pygame
+
+    for name in ("flip", "update"):
+        original = getattr(pygame.display, name)
+
+        def wrapper(*args, _original=original):
+            _original(*args)
+            _probe_marker("first-frame")
+
+        setattr(pygame.display, name, wrapper)
+
+
+def _delegate(module_name, argv, window=False):
+    """
+    Run a tool's own main() with `argv` as its command line.
+    """
+    import importlib
+
+    if window:
+        _probe_first_frame()
+    module = importlib.import_module(module_name)
+    sys.argv = [module_name + ".py"] + list(argv)
+    module.main()
+
+
+def cmd_inspect(args):
+    _delegate("discover_inputs", args.args, window=True)
+
+
+def cmd_visualize(args):
+    _delegate("joystick", args.args, window=True)
+
+
+def cmd_calibrate(args):
+    _delegate("calibrate_joy", args.args, window=True)
+
+
+def cmd_rumble(args):
+    import haptic
+
+    on_played = (lambda: _probe_marker("first-rumble")) if os.environ.get(PROBE_ENV) else None
+    device_path = args.device
+    try:
+        if not args.fake:
+            device_path = haptic.rumble_device(args.device)
+        if args.effect == "follow":
+            haptic.follow_telemetry(device_path=device_path, fake=args.fake or None)
+        else:
+            haptic.rumble_once(args.effect, device_path=device_path, fake=args.fake or None, on_played=on_played)
+    except OSError as e:
+        print(f"Could not rumble {device_path or 'the pad'}: {e}")
+        sys.exit(1)
+
+
+def cmd_quality(args):
+    _delegate("signal_quality", args.args)
+
+
+def cmd_record(args):
+    argv = ["record", args.file] + (["--ring", str(args.ring)] if args.ring else [])
+    _delegate("recording", argv)
+
+
+def cmd_replay(args):
+    argv = ["replay", args.file, "--speed", str(args.speed)] + (["--info"] if args.info else [])
+    _delegate("recording", argv)
+
+
+def _run_probe(argv, env):
+    """
+    Start `pdp.py argv` and return (seconds until its startup marker, loaded modules),
+    or (seconds until exit, None) if it exited without one.
+    """
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, os.path.realpath(__file__)] + argv, env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=60)
+    end = time.perf_counter()
+    for line in proc.stderr.splitlines():
+        if line.startswith(STARTUP_MARKER):
+            _, _, stamp, modules = line.split()
+            return float(stamp) - start, modules
+    return end - start, None
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def cmd_bench_startup(args):
+    """
+    Launch fresh processes and time how long each one takes to reach its first frame
+    (visualize, dummy video driver) or its first rumble write (rumble, fake device), plus
+    a bare `--help` for the interpreter + argparse baseline.
+    """
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy",
+               PYGAME_HIDE_SUPPORT_PROMPT="1")
+    probe_env = dict(env, **{PROBE_ENV: "1"})
+    cases = [
+        ("help", ["--help"], env),
+        ("first-frame", ["visualize"], probe_env),
+        ("first-rumble", ["rumble", "strong", "--fake"], probe_env),
+    ]
+    results = {}
+    for name, argv, case_env in cases:
+        times = []
+        modules = None
+        for _ in range(args.runs):
+            elapsed, loaded = _run_probe(argv, case_env)
+            times.append(elapsed * 1000)
+            modules = loaded if loaded is not None else modules
+        if name != "help" and modules is None:
+            print(f"{name}: no startup marker (the command failed?)")
+        results[name] = {
+            "command": "pdp.py " + " ".join(argv),
+            "runs": args.runs,
+            "min_ms": round(min(times), 2),
+            "median_ms": round(_percentile(times, 50), 2),
+            "p90_ms": round(_percentile(times, 90), 2),
+            "modules": [] if modules in (None, "-") else modules.split(","),
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'':<14} {'min':>8} {'median':>8} {'p90':>8}  heavy modules loaded")
+    for name, r in results.items():
+        print(f"{name:<14} {r['min_ms']:>6.1f}ms {r['median_ms']:>6.1f}ms {r['p90_ms']:>6.1f}ms  "
+              f"{', '.join(r['modules']) or '-'}")
+
+
+def cmd_bench_latency(args):
+    _delegate("latency_bench", args.args)
+
+
+def cmd_devices(args):
+    _delegate("device_index", args.args)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="pdp", description="PDP / Xbox controller tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("inspect", help="show every input live (discover_inputs.py)")
+    p.add_argument("args", nargs=argparse.REMAINDER, help="passed on, e.g. --headless")
+    p.set_defaults(func=cmd_inspect)
+
+    p = sub.add_parser("visualize", help="controller visualizer (joystick.py)")
+    p.add_argument("args", nargs=argparse.REMAINDER)
+    p.set_defaults(func=cmd_visualize)
+
+    p = sub.add_parser("calibrate", help="button positions, or --axes (calibrate_joy.py)")
+    p.add_argument("args", nargs=argparse.REMAINDER, help="passed on, e.g. --axes")
+    p.set_defaults(func=cmd_calibrate)
+
+    p = sub.add_parser("rumble", help="play one rumble and exit, or follow strengths on stdin (no window)")
+    p.add_argument("effect", choices=("strong", "weak", "sine", "pulse", "follow"),
+                   help="follow = continuous rumble from 'strong weak' lines (0..1) on stdin")
+    p.add_argument("--device", help="event node (default: haptic.EVENT_DEVICE_PATH, or found automatically)")
+    p.add_argument("--fake", action="store_true", help="don't touch hardware")
+    p.set_defaults(func=cmd_rumble)
+
+    p = sub.add_parser("quality", help="one-minute signal-quality test of a pad (signal_quality.py)")
+    p.add_argument("args", nargs=argparse.REMAINDER, help="passed on, e.g. --sdl or --recording FILE")
+    p.set_defaults(func=cmd_quality)
+
+    p = sub.add_parser("record", help="record the first joystick (recording.py)")
+    p.add_argument("file")
+    p.add_argument("--ring", type=int, default=None, metavar="N",
+                   help="keep only the last N changes in memory and write them on exit")
+    p.set_defaults(func=cmd_record)
+
+    p = sub.add_parser("replay", help="print the events of a recording (recording.py)")
+    p.add_argument("file")
+    p.add_argument("--speed", type=float, default=1.0, help="playback speed (0 = as fast as possible)")
+    p.add_argument("--info", action="store_true", help="only print a summary")
+    p.set_defaults(func=cmd_replay)
+
+    p = sub.add_parser("bench-startup", help="time-to-first-frame and time-to-first-rumble")
+    p.add_argument("--runs", type=int, default=BENCH_RUNS)
+    p.add_argument("--json", action="store_true", help="machine-readable output")
+    p.set_defaults(func=cmd_bench_startup)
+
+    p = sub.add_parser("bench-latency", help="input latency / frame time benchmark (latency_bench.py)")
+    p.add_argument("args", nargs=argparse.REMAINDER, help="passed on, e.g. --compare old.json")
+    p.set_defaults(func=cmd_bench_latency)
+
+    p = sub.add_parser("devices", help="list gamepad event nodes and their rumble support (device_index.py)")
+    p.add_argument("args", nargs=argparse.REMAINDER, help="passed on, e.g. --pygame or --all")
+    p.set_defaults(func=cmd_devices)
+
+    # argparse.REMAINDER only starts at the first positional word, so options in front
+    # of it (`calibrate --axes`) come back as unknown: hand them on with the rest
+    args, unknown = parser.parse_known_args()
+    if unknown:
+        if not hasattr(args, "args"):
+            parser.error(f"unrecognized arguments: {' '.join(unknown)}")
+        args.args = unknown + args.args
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
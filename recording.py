@@ -0,0 +1,412 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+
+# File layout:
+#   header  = magic, version, record size, flags, start time (perf_counter), start time (wall clock)
+#   records = fixed 16-byte entries, appended one after another
+HEADER = struct.Struct("<8sHHIdd")
+MAGIC = b"PDPREC\x00\x01"
+VERSION = 1
+
+# One input change:
+#   t      - seconds since the recording started (float64)
+#   kind   - KIND_BUTTON / KIND_AXIS / KIND_HAT in the low 4 bits, the pad's slot
+#            (ControllerHub.slot, 0 for single-pad sessions) in the high 4 bits
+#   index  - pygame button / axis / hat index
+#   hat_x, hat_y - hat value (int8 each), 0 for other kinds
+#   value  - axis value, or 1.0 / 0.0 for a button (float32)
+RECORD = struct.Struct("<dBBbbf")
+
+KIND_BUTTON = 1
+KIND_AXIS = 2
+KIND_HAT = 3
+KIND_NAMES = {KIND_BUTTON: "button", KIND_AXIS: "axis", KIND_HAT: "hat"}
+KIND_CODES = {name: code for code, name in KIND_NAMES.items()}
+KIND_MASK = 0x0F
+DEVICE_SHIFT = 4
+MAX_DEVICES = 16  # the device slot shares the kind byte: 4 bits, pads 0..15
+
+FLAG_RING = 1  # written from a ring buffer, oldest records were dropped
+
+# Records buffered in memory before they are written to disk in one go
+DEFAULT_BATCH = 256
+
+
+def pack_record(buf, offset, t, kind, index, value, device=0):
+    if not 0 <= device < MAX_DEVICES:
+        raise ValueError(f"Device slot {device} can't be recorded (binary records hold slots 0..{MAX_DEVICES - 1})")
+    kind_byte = kind | (device << DEVICE_SHIFT)
+    if kind == KIND_HAT:
+        RECORD.pack_into(buf, offset, t, kind_byte, index, value[0], value[1], 0.0)
+    else:
+        RECORD.pack_into(buf, offset, t, kind_byte, index, 0, 0, float(value))
+
+
+class Recorder:
+    """
+    Streams input changes into an append-only file of fixed-size binary records.
+
+    Records are packed straight into a preallocated bytearray and written out in batches,
+    so recording costs one struct.pack_into per change and one write() per `batch`.
+
+    With ring_size set, nothing is written while recording: the last `ring_size` records
+    are kept in a circular buffer (always-on capture), and save() dumps them in order.
+
+    `path` may also be an already open binary stream (e.g. sys.stdout.buffer); it is
+    flushed but not closed by close().
+    """
+
+    def __init__(self, path=None, ring_size=None, batch=DEFAULT_BATCH, start_time=None):
+        self.path = path
+        self.ring_size = ring_size
+        self.start = time.perf_counter() if start_time is None else start_time
+        self.start_wall = time.time()
+        self.count = 0          # records accepted so far
+        self.last_seq = 0       # for capture() from a ControllerState
+
+        if ring_size:
+            self.buffer = bytearray(ring_size * RECORD.size)
+            self.file = None
+        else:
+            if path is None:
+                raise ValueError("A path is required unless ring_size is set")
+            self.buffer = bytearray(batch * RECORD.size)
+            self.batch = batch
+            self.used = 0
+            self.owns_file = not hasattr(path, "write")
+            self.file = open(path, "wb") if self.owns_file else path
+            self.file.write(self._header(0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _header(self, flags):
+        return HEADER.pack(MAGIC, VERSION, RECORD.size, flags, self.start, self.start_wall)
+
+    def record(self, kind, index, value, timestamp=None, device=0):
+        """
+        Add one change. `kind` is KIND_* or "button"/"axis"/"hat"; `timestamp` is on the
+        time.perf_counter() clock (defaults to now); `device` is the pad's slot (0-15).
+        """
+        if isinstance(kind, str):
+            kind = KIND_CODES[kind]
+        t = (time.perf_counter() if timestamp is None else timestamp) - self.start
+
+        if self.ring_size:
+            pack_record(self.buffer, (self.count % self.ring_size) * RECORD.size, t, kind, index, value, device)
+        else:
+            pack_record(self.buffer, self.used * RECORD.size, t, kind, index, value, device)
+            self.used += 1
+            if self.used == self.batch:
+                self.flush()
+        self.count += 1
+
+    def capture(self, state):
+        """
+        Record every transition a single ControllerState logged since the last call.
+        """
+        for edge in state.edges_since(self.last_seq):
+            self.record(edge.kind, edge.index, edge.value, edge.timestamp)
+            self.last_seq = edge.seq
+
+    def flush(self):
+        if self.file is not None and self.used:
+            self.file.write(memoryview(self.buffer)[:self.used * RECORD.size])
+            self.used = 0
+            self.file.flush()
+
+    def save(self, path=None):
+        """
+        Ring mode: write the buffered records, oldest first, as a normal recording file.
+        """
+        path = path or self.path
+        size = self.ring_size
+        n = min(self.count, size)
+        first = self.count % size if self.count > size else 0
+        view = memoryview(self.buffer)
+        with open(path, "wb") as f:
+            f.write(self._header(FLAG_RING if self.count > size else 0))
+            f.write(view[first * RECORD.size:n * RECORD.size])
+            f.write(view[:first * RECORD.size])
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            if self.owns_file:
+                self.file.close()
+            self.file = None
+        elif self.ring_size and self.path:
+            self.save()
+
+
+class Recording:
+    """
+    Memory-mapped, read-only view of a recording file. Records are decoded lazily from
+    the mapping, so opening even a very long session costs nothing up front.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError(f"{path} is not a controller recording")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, record_size, self.flags, self.start, self.start_wall = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or record_size != RECORD.size:
+            self.close()
+            raise ValueError(f"{path} is not a controller recording (or an unsupported version)")
+        # A partially written last record (crash while recording) is ignored
+        self.count = (size - HEADER.size) // RECORD.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return RECORD.unpack_from(self.map, HEADER.size + i * RECORD.size)
+
+    def records(self, start=0):
+        """
+        Yield (t, kind, index, hat_x, hat_y, value) tuples from record `start` on.
+        """
+        view = memoryview(self.map)[HEADER.size + start * RECORD.size:HEADER.size + self.count * RECORD.size]
+        try:
+            yield from RECORD.iter_unpack(view)
+        finally:
+            view.release()
+
+    def duration(self):
+        return self[-1][0] if self.count else 0.0
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+
+def record_value(record):
+    """
+    The value in the same form the live sources use (bool / float / (x, y)).
+    """
+    _, kind, _, hat_x, hat_y, value = record
+    kind &= KIND_MASK
+    if kind == KIND_BUTTON:
+        return value != 0.0
+    if kind == KIND_HAT:
+        return (hat_x, hat_y)
+    return value
+
+
+def record_kind(record):
+    return record[1] & KIND_MASK
+
+
+def record_device(record):
+    return record[1] >> DEVICE_SHIFT
+
+
+class ReplayJoystick:
+    """
+    Plays a recording back through the same interface as pygame.joystick.Joystick
+    (get_button / get_axis / get_hat / get_num* / get_name ...).
+
+    Call pump() regularly (e.g. once per frame): it applies every record whose time has
+    come and returns the matching pygame JOYBUTTONDOWN/UP, JOYAXISMOTION and JOYHATMOTION
+    events, so an event-driven loop can consume a replay exactly like live input.
+    post=True puts them on pygame's event queue instead. speed=2.0 replays twice as fast;
+    speed=None replays everything on the first pump(). Multi-pad recordings are replayed
+    one pad (`device` slot) per ReplayJoystick.
+    """
+
+    def __init__(self, path, speed=1.0, instance_id=0, name="Replay", device=0):
+        self.recording = Recording(path)
+        self.speed = speed
+        self.device = device
+        self.instance_id = instance_id
+        self.name = f"{name} ({os.path.basename(path)})"
+        self.buttons = {}
+        self.axes = {}
+        self.hats = {}
+        # Scan once for the controls used, so get_num*() match the recorded pad
+        for record in self.recording.records():
+            if record_device(record) != self.device:
+                continue
+            kind, index, value = record_kind(record), record[2], record_value(record)
+            target = self.buttons if kind == KIND_BUTTON else self.axes if kind == KIND_AXIS else self.hats
+            target.setdefault(index, (0, 0) if kind == KIND_HAT else type(value)())
+        self.position = 0
+        self.started = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.quit()
+
+    def init(self):
+        pass
+
+    def quit(self):
+        self.recording.close()
+
+    def get_instance_id(self):
+        return self.instance_id
+
+    def get_name(self):
+        return self.name
+
+    def get_numbuttons(self):
+        return max(self.buttons, default=-1) + 1
+
+    def get_numaxes(self):
+        return max(self.axes, default=-1) + 1
+
+    def get_numhats(self):
+        return max(self.hats, default=-1) + 1
+
+    def get_button(self, i):
+        return int(self.buttons.get(i, False))
+
+    def get_axis(self, i):
+        return self.axes.get(i, 0.0)
+
+    def get_hat(self, i):
+        return self.hats.get(i, (0, 0))
+
+    def finished(self):
+        return self.position >= len(self.recording)
+
+    def pump(self, post=False):
+        import pygame
+
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now
+        limit = float("inf") if not self.speed else (now - self.started) * self.speed
+
+        events = []
+        for record in self.recording.records(self.position):
+            if record[0] > limit:
+                break
+            self.position += 1
+            if record_device(record) != self.device:
+                continue
+            kind, index, value = record_kind(record), record[2], record_value(record)
+            if kind == KIND_BUTTON:
+                self.buttons[index] = value
+                etype = pygame.JOYBUTTONDOWN if value else pygame.JOYBUTTONUP
+                events.append(pygame.event.Event(etype, button=index, instance_id=self.instance_id,
+                                                 joy=self.instance_id))
+            elif kind == KIND_AXIS:
+                self.axes[index] = value
+                events.append(pygame.event.Event(pygame.JOYAXISMOTION, axis=index, value=value,
+                                                 instance_id=self.instance_id, joy=self.instance_id))
+            else:
+                self.hats[index] = value
+                events.append(pygame.event.Event(pygame.JOYHATMOTION, hat=index, value=value,
+                                                 instance_id=self.instance_id, joy=self.instance_id))
+        if post:
+            for event in events:
+                pygame.event.post(event)
+        return events
+
+
+def _record(args):
+    import pygame
+    from controller_state import ControllerState
+
+    pygame.init()
+    pygame.joystick.init()
+    if pygame.joystick.get_count() == 0:
+        print("No joystick connected!")
+        pygame.quit()
+        sys.exit()
+    joystick = pygame.joystick.Joystick(0)
+    joystick.init()
+    state = ControllerState(joystick)
+
+    recorder = Recorder(args.file, ring_size=args.ring)
+    mode = f"keeping the last {args.ring} changes" if args.ring else "streaming to disk"
+    print(f"Recording {joystick.get_name()} into {args.file} ({mode}), Ctrl+C to stop")
+    # Start with a full snapshot: sync() doesn't log edges, so without it a replay would
+    # start with every axis at 0.0 and lose buttons held (or sticks off-centre) from the start
+    now = time.perf_counter()
+    for i in range(joystick.get_numaxes()):
+        recorder.record(KIND_AXIS, i, state.axes[i], now)
+    for i in range(joystick.get_numbuttons()):
+        recorder.record(KIND_BUTTON, i, bool(state.button_mask >> i & 1), now)
+    for i in range(joystick.get_numhats()):
+        recorder.record(KIND_HAT, i, state.hats[i], now)
+    try:
+        while True:
+            event = pygame.event.wait(250)
+            events = [event] + pygame.event.get()
+            for event in events:
+                if event.type == pygame.QUIT:
+                    raise KeyboardInterrupt
+                state.handle_event(event)
+            recorder.capture(state)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.close()
+        pygame.quit()
+    print(f"{recorder.count} changes recorded")
+
+
+def _replay(args):
+    speed = None if args.speed <= 0 else args.speed
+    with ReplayJoystick(args.file, speed=speed) as joystick:
+        rec = joystick.recording
+        print(f"{args.file}: {len(rec)} changes over {rec.duration():.2f}s"
+              f"{' (ring buffer, oldest dropped)' if rec.flags & FLAG_RING else ''}")
+        if args.info:
+            return
+        while not joystick.finished():
+            events = joystick.pump()
+            for event in events:
+                print(event)
+            if not events:
+                time.sleep(0.001)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record controller sessions and replay them.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="record the first joystick")
+    rec.add_argument("file")
+    rec.add_argument("--ring", type=int, default=None, metavar="N",
+                     help="keep only the last N changes in memory and write them on exit")
+    rec.set_defaults(func=_record)
+
+    rep = sub.add_parser("replay", help="print the events of a recording at recorded speed")
+    rep.add_argument("file")
+    rep.add_argument("--speed", type=float, default=1.0, help="playback speed (0 = as fast as possible)")
+    rep.add_argument("--info", action="store_true", help="only print a summary")
+    rep.set_defaults(func=_replay)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import argparse
+import struct
+import sys
+import time
+from multiprocessing import shared_memory
+
+# Shared memory layout (little endian):
+#   offset 0  header  = magic, version, axis count, hat count
+#   offset 8  seq     = seqlock counter: odd while the writer is updating the snapshot
+#   offset 16 snapshot = timestamp (perf_counter clock), update counter, button bitmask,
+#                        MAX_AXES float32 axes, MAX_HATS (x, y) int8 hats
+HEADER = struct.Struct("<IHBB")
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 8
+MAX_AXES = 8
+MAX_HATS = 4
+SNAPSHOT = struct.Struct(f"<dQI{MAX_AXES}f{MAX_HATS * 2}b")
+SNAPSHOT_OFFSET = 16
+SIZE = SNAPSHOT_OFFSET + SNAPSHOT.size
+
+MAGIC = 0x50445053  # "PDPS"
+VERSION = 1
+
+# A reader gives up after retrying for this long: the counter only stays odd this long
+# if the publisher died in the middle of an update
+READ_TIMEOUT = 0.1
+
+
+def default_name(slot=0):
+    return f"pdp_controller_{slot}"
+
+
+def _attach(name):
+    """
+    Open an existing segment without letting this process' resource tracker unlink it
+    at exit (only the publisher owns it).
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track=False
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+class SharedStatePublisher:
+    """
+    Publishes the latest state of one controller into a multiprocessing.shared_memory
+    segment, guarded by a seqlock.
+
+    The writer bumps the sequence counter to an odd value, writes the snapshot in place
+    with one struct.pack_into and bumps it back to even. Readers never block the writer
+    and never take a lock; they just retry if the counter changed under them. Any number
+    of other processes (motion controller, logger ...) can read the pad this way without
+    opening the device or doing any IPC serialization.
+    """
+
+    def __init__(self, name=None, axis_count=6, hat_count=1):
+        self.name = name or default_name()
+        self.seq = 0
+        try:
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=SIZE)
+        except FileExistsError:
+            # Left behind by a publisher that crashed; take it over. The counter carries on
+            # from where it was (rounded up to even), never back to 0, so a reader that is
+            # still attached can't mistake a new snapshot for one it has already seen.
+            self.shm = _attach(self.name)
+            current = SEQ.unpack_from(self.shm.buf, SEQ_OFFSET)[0]
+            self.seq = current + (current & 1)
+        self.buf = self.shm.buf
+        self.axis_count = min(axis_count, MAX_AXES)
+        self.hat_count = min(hat_count, MAX_HATS)
+        self.updates = 0
+        HEADER.pack_into(self.buf, 0, MAGIC, VERSION, self.axis_count, self.hat_count)
+        self.publish(0, (), (), time.perf_counter())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def publish(self, buttons, axes, hats, timestamp=None):
+        """
+        buttons: bitmask (bit i = button i); axes: floats; hats: (x, y) tuples.
+        """
+        axes = list(axes[:MAX_AXES]) + [0.0] * (MAX_AXES - min(len(axes), MAX_AXES))
+        flat_hats = [0] * (MAX_HATS * 2)
+        for i, (x, y) in enumerate(hats[:MAX_HATS]):
+            flat_hats[2 * i] = x
+            flat_hats[2 * i + 1] = y
+        self.updates += 1
+
+        self.seq += 1  # odd: update in progress
+        SEQ.pack_into(self.buf, SEQ_OFFSET, self.seq)
+        SNAPSHOT.pack_into(self.buf, SNAPSHOT_OFFSET, time.perf_counter() if timestamp is None else timestamp,
+                           self.updates, buttons & 0xFFFFFFFF, *axes, *flat_hats)
+        self.seq += 1  # even: snapshot is consistent again
+        SEQ.pack_into(self.buf, SEQ_OFFSET, self.seq)
+
+    def publish_state(self, state):
+        """
+        Publish a ControllerState.
+        """
+        buttons = state.button_mask & 0xFFFFFFFF
+        axes = [state.get_axis(i) for i in range(self.axis_count)]
+        hats = [state.get_hat(i) for i in range(self.hat_count)]
+        self.publish(buttons, axes, hats, state.last_event_time)
+
+    def close(self, unlink=True):
+        if self.shm is None:
+            return
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+        self.shm = None
+
+
+class SharedStateReader:
+    """
+    Lock-free reader for a SharedStatePublisher segment.
+
+    read() returns (timestamp, update_count, buttons_bitmask, axes, hats) from one
+    consistent snapshot. It decodes straight out of the shared buffer with
+    struct.unpack_from (no intermediate copy) and retries only if the publisher was
+    writing at that very moment.
+    """
+
+    def __init__(self, name=None):
+        self.name = name or default_name()
+        self.shm = _attach(self.name)
+        self.buf = self.shm.buf
+        magic, version, self.axis_count, self.hat_count = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Shared memory '{self.name}' is not a controller state segment")
+        self.retries = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read_raw(self, timeout=READ_TIMEOUT):
+        """
+        The decoded snapshot tuple: timestamp, updates, buttons, MAX_AXES axes, MAX_HATS*2 hat values.
+        Raises TimeoutError if no consistent snapshot could be read for `timeout` seconds
+        (a publisher that crashed mid-update leaves the counter odd).
+        """
+        buf = self.buf
+        deadline = None
+        while True:
+            before = SEQ.unpack_from(buf, SEQ_OFFSET)[0]
+            if not before & 1:
+                snapshot = SNAPSHOT.unpack_from(buf, SNAPSHOT_OFFSET)
+                if SEQ.unpack_from(buf, SEQ_OFFSET)[0] == before:
+                    return snapshot
+            self.retries += 1
+            # The clock is only read once a retry was needed, so the fast path stays fast
+            now = time.perf_counter()
+            if deadline is None:
+                deadline = now + timeout
+            elif now > deadline:
+                raise TimeoutError(f"Shared memory '{self.name}' stayed mid-update for {timeout}s "
+                                   f"(publisher crashed?)")
+
+    def read(self):
+        raw = self.read_raw()
+        axes = raw[3:3 + self.axis_count]
+        flat_hats = raw[3 + MAX_AXES:]
+        hats = tuple((flat_hats[2 * i], flat_hats[2 * i + 1]) for i in range(self.hat_count))
+        return raw[0], raw[1], raw[2], axes, hats
+
+    def sequence(self):
+        """
+        Cheap change check: compare with the previous value to see if there is anything new.
+        """
+        return SEQ.unpack_from(self.buf, SEQ_OFFSET)[0]
+
+    def close(self):
+        if self.shm is not None:
+            self.buf = None
+            self.shm.close()
+            self.shm = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read the controller state published in shared memory.")
+    parser.add_argument("name", nargs="?", default=default_name(), help="segment name (default: %(default)s)")
+    parser.add_argument("--bench", type=float, metavar="SECONDS",
+                        help="measure how many consistent snapshots per second can be read")
+    args = parser.parse_args()
+
+    try:
+        reader = SharedStateReader(args.name)
+    except FileNotFoundError:
+        print(f"No shared memory segment '{args.name}' (is joystick.py running with PUBLISH_SHARED_MEMORY?)")
+        sys.exit(1)
+
+    with reader:
+        try:
+            if args.bench:
+                n = 0
+                end = time.perf_counter() + args.bench
+                while time.perf_counter() < end:
+                    reader.read_raw()
+                    n += 1
+                print(f"{n / args.bench:,.0f} reads/s, {reader.retries} retries")
+                return
+
+            last = None
+            while True:
+                seq = reader.sequence()
+                if seq != last:
+                    last = seq
+                    t, updates, buttons, axes, hats = reader.read()
+                    age_ms = (time.perf_counter() - t) * 1000
+                    print(f"#{updates} buttons={buttons:011b} axes={['%.2f' % a for a in axes]} "
+                          f"hats={hats} age={age_ms:.1f}ms")
+                time.sleep(0.001)
+        except TimeoutError as e:
+            print(e)
+            sys.exit(1)
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
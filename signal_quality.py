@@ -0,0 +1,539 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+# Signal-quality check for one pad: real report rate, inter-report jitter, per-axis
+# noise floor at rest, and stuck or chattering buttons. Live (evdev node or SDL) or over
+# a recording.py session. The live test takes about a minute: leave the pad untouched for
+# REST_SECONDS, then move both sticks and press every button a few times.
+
+TEST_SECONDS = 60.0
+REST_SECONDS = 15.0
+
+# Reports kept for the statistics (a rolling window: 65536 reports is a full minute at
+# 1000 Hz)
+WINDOW_REPORTS = 65536
+
+# Sources without report boundaries (SDL events, recordings) count changes closer
+# together than this as one report
+REPORT_MERGE = 0.0002
+
+# A gap longer than this many median report intervals counts as a missed report
+GAP_FACTOR = 3.0
+
+# Without a rest phase (recordings) an axis sample is "at rest" within this distance of
+# the axis's median
+REST_RADIUS = 0.05
+
+# A press shorter than this, or a press this soon after the previous release of the same
+# button, is a bounce; a button held longer than STUCK_SECONDS (or pressed during the rest
+# phase) is stuck
+BOUNCE_SECONDS = 0.010
+STUCK_SECONDS = 5.0
+
+# Pass/fail limits of the screening test
+MIN_REPORT_RATE = 120.0       # Hz (median interval)
+MAX_JITTER_MS = 2.0           # standard deviation of the report interval
+MAX_NOISE = 0.01              # standard deviation at rest, in -1..1 units
+MAX_BOUNCES = 0
+
+# One recording.py record, for reading a whole session straight from the file
+RECORD_DTYPE = np.dtype([("t", "<f8"), ("kind", "u1"), ("index", "u1"), ("hat_x", "i1"), ("hat_y", "i1"),
+                         ("value", "<f4")])
+
+
+class RingBuffer:
+    """
+    Fixed-size NumPy ring buffer of rows. append() copies a whole block of rows in at
+    most two slice assignments; values() returns the rows oldest first.
+    """
+
+    def __init__(self, capacity, shape=(), dtype=np.float64):
+        self.data = np.zeros((capacity,) + tuple(shape), dtype=dtype)
+        self.capacity = capacity
+        self.end = 0      # next row to write
+        self.count = 0
+
+    def append(self, rows):
+        rows = np.asarray(rows, dtype=self.data.dtype)
+        if rows.ndim == self.data.ndim - 1:
+            rows = rows[None]
+        n = len(rows)
+        if n >= self.capacity:
+            self.data[:] = rows[-self.capacity:]
+            self.end = 0
+            self.count = self.capacity
+            return
+        first = min(n, self.capacity - self.end)
+        self.data[self.end:self.end + first] = rows[:first]
+        self.data[:n - first] = rows[first:]
+        self.end = (self.end + n) % self.capacity
+        self.count = min(self.capacity, self.count + n)
+
+    def values(self):
+        if self.count < self.capacity:
+            return self.data[:self.count]
+        return np.concatenate([self.data[self.end:], self.data[:self.end]])
+
+    def __len__(self):
+        return self.count
+
+
+class SignalAnalyzer:
+    """
+    Collects one pad's reports into rolling windows and computes its signal statistics
+    with NumPy.
+
+    Each report is a timestamp, the value of every axis after the report, and which axes
+    the report changed (axis noise is measured on the changed samples only, since
+    carried-forward values would hide it). Button transitions go to button_edge(), which
+    counts presses, bounces and long holds as they happen. Reports added while `resting`
+    is True make up the rest phase used for the noise floor.
+    """
+
+    def __init__(self, axis_count, button_count, window=WINDOW_REPORTS):
+        self.axis_count = axis_count
+        self.button_count = button_count
+        self.times = RingBuffer(window)
+        self.axes = RingBuffer(window, (axis_count,), np.float32)
+        self.changed = RingBuffer(window, (axis_count,), bool)
+        self.rest = RingBuffer(window, (), bool)
+        self.resting = False
+        self.reports = 0
+        self.first_time = None
+        self.last_time = None
+
+        self.presses = np.zeros(button_count, dtype=np.int64)
+        self.bounces = np.zeros(button_count, dtype=np.int64)
+        self.longest_hold = np.zeros(button_count)
+        self.rest_presses = np.zeros(button_count, dtype=np.int64)
+        self.pressed_at = {}
+        self.released_at = {}
+
+    def add_reports(self, times, axes, changed):
+        """
+        Append a block of reports: times (n,), axes (n, axis_count), changed (n, axis_count).
+        """
+        times = np.asarray(times, dtype=np.float64)
+        if not len(times):
+            return
+        self.times.append(times)
+        self.axes.append(axes)
+        self.changed.append(changed)
+        self.rest.append(np.full(len(times), self.resting))
+        self.reports += len(times)
+        if self.first_time is None:
+            self.first_time = float(times[0])
+        self.last_time = float(times[-1])
+
+    def add_report(self, t, axes, changed):
+        self.add_reports((t,), (axes,), (changed,))
+
+    def button_edge(self, t, index, pressed):
+        if index >= self.button_count:
+            return
+        if pressed:
+            self.presses[index] += 1
+            if self.resting:
+                self.rest_presses[index] += 1
+            released = self.released_at.get(index)
+            if released is not None and t - released < BOUNCE_SECONDS:
+                self.bounces[index] += 1
+            self.pressed_at[index] = t
+        else:
+            pressed_at = self.pressed_at.pop(index, None)
+            if pressed_at is not None:
+                held = t - pressed_at
+                if held < BOUNCE_SECONDS:
+                    self.bounces[index] += 1
+                self.longest_hold[index] = max(self.longest_hold[index], held)
+            self.released_at[index] = t
+
+    def stats(self, now=None):
+        """
+        Report rate / jitter over the window, noise floor per axis, and button counts.
+
+        A pad only reports while something changes, so the timing is taken outside the
+        rest phase, and intervals longer than GAP_FACTOR median intervals (the sticks
+        paused) are counted as gaps instead of jitter.
+        """
+        t = self.times.values()
+        result = {"reports": self.reports, "window_reports": len(t)}
+        rest = self.rest.values()
+        if rest.any():
+            t = t[~rest]
+
+        dt = np.diff(t) if len(t) >= 3 else np.zeros(0)
+        dt = dt[dt > 0]
+        if len(dt) >= 2:
+            median = float(np.median(dt))
+            regular = dt[dt <= GAP_FACTOR * median]
+            result.update({
+                "report_rate_hz": round(1.0 / median, 2),
+                "mean_rate_hz": round(len(regular) / float(regular.sum()), 2),
+                "interval_ms": {p: round(float(v) * 1000, 4)
+                                for p, v in zip(("p1", "p50", "p99"), np.percentile(regular, (1, 50, 99)))},
+                "jitter_ms": round(float(regular.std()) * 1000, 4),
+                "jitter_p99_ms": round(float(np.percentile(np.abs(regular - median), 99)) * 1000, 4),
+                "gaps": len(dt) - len(regular),
+            })
+        else:
+            result.update({"report_rate_hz": None, "mean_rate_hz": None, "interval_ms": None,
+                           "jitter_ms": None, "jitter_p99_ms": None, "gaps": 0})
+
+        result["noise"] = self.noise_floor()
+
+        # Buttons still held count with their current hold time
+        now = self.last_time if now is None else now
+        longest = self.longest_hold.copy()
+        for index, pressed_at in self.pressed_at.items():
+            if now is not None:
+                longest[index] = max(longest[index], now - pressed_at)
+        stuck = np.flatnonzero((longest > STUCK_SECONDS) | (self.rest_presses > 0))
+        result["buttons"] = {
+            "presses": self.presses.tolist(),
+            "bounces": self.bounces.tolist(),
+            "longest_hold_s": np.round(longest, 3).tolist(),
+            "rest_presses": self.rest_presses.tolist(),
+            "stuck": stuck.tolist(),
+        }
+        return result
+
+    def noise_floor(self):
+        """
+        Per axis: center, standard deviation and peak-to-peak of its own samples at rest.
+
+        With a rest phase these are plain statistics of the rest-phase samples. Without
+        one (recordings) the samples within REST_RADIUS of the axis's median are used,
+        and the deviation is estimated from their median absolute deviation, so a stick
+        swept through the center now and then doesn't read as noise.
+        """
+        x = self.axes.values().astype(np.float64)
+        changed = self.changed.values()
+        rest = self.rest.values()
+        if not len(x):
+            return None
+        phase = bool(rest.any())
+
+        samples, centers, stds, p2ps = [], [], [], []
+        for i in range(self.axis_count):
+            own = x[changed[:, i], i]
+            if phase:
+                values = x[changed[:, i] & rest, i]
+            else:
+                median = np.median(own) if len(own) else 0.0
+                values = own[np.abs(own - median) <= REST_RADIUS]
+            if not len(values):
+                samples.append(0)
+                centers.append(0.0)
+                stds.append(0.0)
+                p2ps.append(0.0)
+                continue
+            center = float(np.median(values))
+            if phase:
+                std = float(values.std())
+            else:
+                std = 1.4826 * float(np.median(np.abs(values - center)))
+            samples.append(len(values))
+            centers.append(round(center, 5))
+            stds.append(round(std, 5))
+            p2ps.append(round(float(values.max() - values.min()), 5))
+        return {"samples": samples, "center": centers, "std": stds, "peak_to_peak": p2ps,
+                "method": "rest phase" if phase else "median absolute deviation"}
+
+
+def verdict(stats):
+    """
+    Reasons the pad fails the screening limits (an empty list = pass).
+    """
+    failures = []
+    rate = stats["report_rate_hz"]
+    if rate is None:
+        failures.append("not enough reports to measure the report rate (move the sticks)")
+    elif rate < MIN_REPORT_RATE:
+        failures.append(f"report rate {rate:.0f} Hz < {MIN_REPORT_RATE:.0f} Hz")
+    if stats["jitter_ms"] is not None and stats["jitter_ms"] > MAX_JITTER_MS:
+        failures.append(f"report jitter {stats['jitter_ms']:.2f} ms > {MAX_JITTER_MS} ms")
+    noise = stats["noise"]
+    if noise is not None:
+        for i, std in enumerate(noise["std"]):
+            if std > MAX_NOISE:
+                failures.append(f"axis {i} noise {std:.4f} > {MAX_NOISE}")
+    buttons = stats["buttons"]
+    for i, bounces in enumerate(buttons["bounces"]):
+        if bounces > MAX_BOUNCES:
+            failures.append(f"button {i} bounced {bounces} times")
+    for i in buttons["stuck"]:
+        if buttons["rest_presses"][i]:
+            failures.append(f"button {i} pressed {buttons['rest_presses'][i]} times while the pad was untouched")
+        else:
+            failures.append(f"button {i} held for {buttons['longest_hold_s'][i]:.1f} s")
+    return failures
+
+
+def analyze_recording(path, device=0, axis_count=None, button_count=None, window=WINDOW_REPORTS):
+    """
+    Run a recording.py session through a SignalAnalyzer (axis and button counts default
+    to the controller profile's). The file is read with one np.frombuffer; reports,
+    forward-filled axis values and the changed masks are built with array operations
+    and fed in window-sized blocks.
+    """
+    from controller_profile import load_profile
+    from recording import DEVICE_SHIFT, HEADER, KIND_AXIS, KIND_BUTTON, KIND_MASK, Recording
+
+    if axis_count is None or button_count is None:
+        profile = load_profile()
+        axis_count = axis_count or len(profile.axes)
+        button_count = button_count or len(profile.buttons)
+
+    with Recording(path) as recording:
+        records = np.frombuffer(recording.map, dtype=RECORD_DTYPE, count=len(recording),
+                                offset=HEADER.size).copy()
+    records = records[(records["kind"] >> DEVICE_SHIFT) == device]
+    kind = records["kind"] & KIND_MASK
+    analyzer = SignalAnalyzer(axis_count, button_count, window)
+    if not len(records):
+        return analyzer
+
+    # Report number of every record: a new report starts after a REPORT_MERGE gap
+    t = records["t"]
+    starts = np.concatenate([[True], np.diff(t) > REPORT_MERGE])
+    report = np.cumsum(starts) - 1
+    report_times = t[starts]
+    n = len(report_times)
+
+    # Axis values after each report: mark the changes, then carry them forward
+    is_axis = (kind == KIND_AXIS) & (records["index"] < axis_count)
+    axis_report = report[is_axis]
+    axis_index = records["index"][is_axis].astype(np.intp)
+    changed = np.zeros((n, axis_count), dtype=bool)
+    changed[axis_report, axis_index] = True
+    last = np.full((n, axis_count), -1)
+    rows = np.flatnonzero(is_axis)
+    last[axis_report, axis_index] = rows
+    np.maximum.accumulate(last, axis=0, out=last)
+    values = records["value"].astype(np.float64)
+    x = np.where(last >= 0, values[np.maximum(last, 0)], 0.0)
+
+    # Button-only reports count for the report timing too (their axes are unchanged)
+    for start in range(0, n, window):
+        analyzer.add_reports(report_times[start:start + window], x[start:start + window],
+                             changed[start:start + window])
+    for record in records[kind == KIND_BUTTON]:
+        analyzer.button_edge(float(record["t"]), int(record["index"]), record["value"] != 0.0)
+    return analyzer
+
+
+class LiveTest:
+    """
+    Rest phase then active phase, with a status line once a second.
+    """
+
+    def __init__(self, analyzer, seconds, rest_seconds, quiet=False):
+        self.analyzer = analyzer
+        self.seconds = seconds
+        self.rest_seconds = rest_seconds
+        self.quiet = quiet
+        self.start = None
+        self.last_status = 0.0
+        self.phase = None
+
+    def tick(self):
+        """
+        Update the phase; returns False once the test is over.
+        """
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+        elapsed = now - self.start
+        phase = "rest" if elapsed < self.rest_seconds else "active"
+        if phase != self.phase:
+            self.phase = phase
+            self.analyzer.resting = phase == "rest"
+            if not self.quiet:
+                if phase == "rest":
+                    print(f"Put the pad down and don't touch it ({self.rest_seconds:.0f} s)...")
+                else:
+                    print("\nNow move both sticks around continuously and press every button a few times.")
+        if not self.quiet and now - self.last_status >= 1.0:
+            self.last_status = now
+            stats = self.analyzer.stats(now)
+            rate = stats["report_rate_hz"]
+            jitter = stats["jitter_ms"]
+            noise = stats["noise"]
+            noisiest = max(noise["std"]) if noise else 0.0
+            sys.stdout.write(f"\r{elapsed:5.1f}/{self.seconds:.0f} s  {phase:<6}  reports {stats['reports']:>7}  "
+                             f"rate {rate or 0:7.1f} Hz  jitter {jitter or 0:6.3f} ms  "
+                             f"noise {noisiest:.4f}  bounces {sum(stats['buttons']['bounces'])}   ")
+            sys.stdout.flush()
+        return elapsed < self.seconds
+
+
+def run_evdev(device_path, seconds, rest_seconds, quiet=False):
+    """
+    Live test on an evdev node (None = the first gamepad found): one sample per SYN_REPORT,
+    with the kernel's timestamps.
+    """
+    import asyncio
+    from evdev import ecodes
+    from evdev_input import EvdevController
+
+    controller = EvdevController(device_path)
+    axis_count = max(controller.axis_index.values(), default=-1) + 1
+    button_count = max(controller.button_index.values(), default=-1) + 1
+    analyzer = SignalAnalyzer(axis_count, button_count)
+    test = LiveTest(analyzer, seconds, rest_seconds, quiet)
+    axes = np.zeros(axis_count)
+    if not quiet:
+        print(f"Testing {controller.device.name} ({controller.device.path})")
+
+    def report(ctrl, events):
+        t = ctrl.state.last_event_time
+        changed = np.zeros(axis_count, dtype=bool)
+        for event in events:
+            if event.type == ecodes.EV_ABS and event.code in ctrl.axis_index:
+                changed[ctrl.axis_index[event.code]] = True
+            elif event.type == ecodes.EV_KEY and event.code in ctrl.button_index:
+                analyzer.button_edge(t, ctrl.button_index[event.code], bool(event.value))
+        for i in range(axis_count):
+            axes[i] = ctrl.state.get_axis(i)
+        analyzer.add_report(t, axes, changed)
+
+    async def run():
+        controller.on_report.append(report)
+        controller.start()
+        while test.tick():
+            await asyncio.sleep(0.1)
+        controller.close()
+
+    asyncio.run(run())
+    return analyzer
+
+
+def run_sdl(seconds, rest_seconds, quiet=False):
+    """
+    Live test through pygame/SDL (no evdev access needed). SDL hands over changes, not
+    reports, so changes within REPORT_MERGE of each other are merged, and the timing
+    includes SDL's own polling.
+    """
+    import os
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+
+    pygame.init()
+    pygame.joystick.init()
+    if pygame.joystick.get_count() == 0:
+        print("No joystick connected.")
+        pygame.quit()
+        sys.exit(1)
+    joystick = pygame.joystick.Joystick(0)
+    joystick.init()
+    axis_count = joystick.get_numaxes()
+    analyzer = SignalAnalyzer(axis_count, joystick.get_numbuttons())
+    test = LiveTest(analyzer, seconds, rest_seconds, quiet)
+    if not quiet:
+        print(f"Testing {joystick.get_name()} (SDL)")
+
+    axes = np.array([joystick.get_axis(i) for i in range(axis_count)])
+    changed = np.zeros(axis_count, dtype=bool)
+    report_time = None
+    while test.tick():
+        for event in pygame.event.get():
+            now = time.perf_counter()
+            if event.type == pygame.JOYAXISMOTION and event.axis < axis_count:
+                if report_time is not None and now - report_time > REPORT_MERGE:
+                    analyzer.add_report(report_time, axes, changed)
+                    changed[:] = False
+                report_time = now
+                axes[event.axis] = event.value
+                changed[event.axis] = True
+            elif event.type in (pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP):
+                analyzer.button_edge(now, event.button, event.type == pygame.JOYBUTTONDOWN)
+        pygame.time.wait(1)
+    if report_time is not None:
+        analyzer.add_report(report_time, axes, changed)
+    pygame.quit()
+    return analyzer
+
+
+def print_stats(stats, failures, axis_names=None, button_names=None):
+    axis_names = axis_names or {}
+    button_names = button_names or {}
+    print(f"\nReports: {stats['reports']} ({stats['window_reports']} in the window)")
+    if stats["report_rate_hz"] is not None:
+        interval = stats["interval_ms"]
+        print(f"Report rate: {stats['report_rate_hz']:.1f} Hz (median interval {interval['p50']:.3f} ms, "
+              f"p1 {interval['p1']:.3f}, p99 {interval['p99']:.3f}), mean {stats['mean_rate_hz']:.1f} Hz")
+        print(f"Jitter: {stats['jitter_ms']:.3f} ms std, {stats['jitter_p99_ms']:.3f} ms p99 deviation, "
+              f"{stats['gaps']} gaps")
+    noise = stats["noise"]
+    if noise is not None:
+        print("Noise at rest:")
+        for i, (count, center, std, p2p) in enumerate(zip(noise["samples"], noise["center"], noise["std"],
+                                                          noise["peak_to_peak"])):
+            print(f"  {axis_names.get(i, i)!s:<6} center {center:+.4f}  std {std:.5f}  "
+                  f"peak-to-peak {p2p:.4f}  ({count} samples)")
+    buttons = stats["buttons"]
+    pressed = [i for i, n in enumerate(buttons["presses"]) if n]
+    if pressed:
+        print("Buttons:")
+        for i in pressed:
+            print(f"  {button_names.get(i, i)!s:<12} {buttons['presses'][i]:>4} presses  "
+                  f"{buttons['bounces'][i]:>3} bounces  longest hold {buttons['longest_hold_s'][i]:.2f} s")
+    never = [button_names.get(i, str(i)) for i, n in enumerate(buttons["presses"]) if not n]
+    if never:
+        print(f"Never pressed: {', '.join(never)}")
+    print("\nPASS" if not failures else "\nFAIL:\n  " + "\n  ".join(failures))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure a pad's report rate, jitter, noise floor and "
+                                                 "button bounce, live or from a recording.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--device", help="evdev node to test (default: the first gamepad found)")
+    source.add_argument("--sdl", action="store_true", help="test the first pad through pygame/SDL instead")
+    source.add_argument("--recording", help="analyze a recording.py session instead of live input")
+    parser.add_argument("--pad", type=int, default=0, help="pad slot in the recording")
+    parser.add_argument("--seconds", type=float, default=TEST_SECONDS, help="live test length")
+    parser.add_argument("--rest", type=float, default=REST_SECONDS, help="untouched phase at the start")
+    parser.add_argument("--json", metavar="FILE", help="also write the results as JSON ('-' = stdout only)")
+    args = parser.parse_args()
+
+    quiet = args.json == "-"
+    try:
+        if args.recording:
+            analyzer = analyze_recording(args.recording, device=args.pad)
+        elif args.sdl:
+            analyzer = run_sdl(args.seconds, args.rest, quiet)
+        else:
+            analyzer = run_evdev(args.device, args.seconds, args.rest, quiet)
+    except (OSError, ValueError) as e:
+        print(f"Could not read the input: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\nInterrupted.")
+        sys.exit(1)
+
+    stats = analyzer.stats()
+    failures = verdict(stats)
+    stats["pass"] = not failures
+    stats["failures"] = failures
+    if quiet:
+        print(json.dumps(stats, indent=1))
+    else:
+        from controller_profile import load_profile
+        profile = load_profile()
+        print_stats(stats, failures, profile.axis_names, profile.button_names)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(stats, f, indent=1)
+            print(f"Results written to {args.json}")
+    sys.exit(0 if not failures else 2)
+
+
+if __name__ == "__main__":
+    main()
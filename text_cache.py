@@ -0,0 +1,63 @@
+from collections import OrderedDict
+
+
+def quantize(value, step):
+    """
+    Snap an axis value to a multiple of `step`, so resting-stick jitter
+    (e.g. 0.0039 / -0.0078) produces the same text and hits the cache.
+    """
+    q = round(value / step) * step
+    # Avoid "-0.000" flickering against "0.000"
+    return 0.0 if q == 0 else q
+
+
+class TextCache:
+    """
+    Bounded LRU cache of rendered text surfaces, keyed by (text, font, colour, antialias).
+
+    font.render() rasterizes every glyph on every call and was the top hotspot in the
+    inspector. Static labels ("Axis 3:") are rendered once and then always hit; the
+    changing numeric parts only miss when the (quantized) value actually changes.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        # The font object itself is part of the key (not id(font)), so a font that gets
+        # garbage-collected can't hand its cached surfaces to a new font at the same address.
+        key = (text, font, tuple(color), antialias)
+        surf = self.entries.get(key)
+        if surf is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surf
+
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        self.entries[key] = surf
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return surf
+
+    def render_parts(self, font, parts, color, antialias=True):
+        """
+        Render a line given as several pieces (e.g. a static label and a value), each
+        cached on its own. Returns the list of surfaces, to be blitted left to right.
+        """
+        return [self.render(font, part, color, antialias) for part in parts]
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,449 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+# Local web dashboard: open http://localhost:8765/ in any number of browsers, or connect
+# tools to ws://localhost:8765/ws and read one JSON state message per update.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Updates waiting to be sent to one client. When a client can't keep up, the oldest
+# waiting update is dropped (every message is a full snapshot, so the newest one is
+# all a viewer needs).
+CLIENT_QUEUE_SIZE = 4
+
+# Cap on how often the input loop publishes (the pad can report at 1 kHz; a dashboard
+# doesn't need more than this)
+MAX_PUBLISH_RATE = 120
+
+# Largest frame a client may send (clients only send pings and close frames). Bigger
+# ones get the connection closed with status 1009 instead of being buffered.
+MAX_CLIENT_PAYLOAD = 65536
+
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_TEXT, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x8, 0x9, 0xA
+CLOSE_TOO_BIG = 1009
+
+DASHBOARD_HTML = b"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>PDP Controller</title>
+<style>
+body { font-family: monospace; margin: 2em; }
+.pad { border: 1px solid #ccc; padding: 1em; margin-bottom: 1em; }
+.on { background: #f44; color: white; }
+span.b { display: inline-block; padding: 2px 6px; margin: 2px; border: 1px solid #999; }
+</style></head>
+<body><h2>PDP Controller</h2><div id="status">connecting...</div><div id="pads"></div>
+<script>
+const ws = new WebSocket("ws://" + location.host + "/ws");
+ws.onopen = () => document.getElementById("status").textContent = "connected";
+ws.onclose = () => document.getElementById("status").textContent = "disconnected";
+ws.onmessage = (msg) => {
+  const data = JSON.parse(msg.data);
+  document.getElementById("pads").innerHTML = data.pads.map(pad =>
+    `<div class="pad"><b>${pad.slot}: ${pad.name}</b><br>` +
+    pad.buttons.map((b, i) => `<span class="b ${b ? "on" : ""}">${i}</span>`).join("") + "<br>" +
+    "axes " + pad.axes.map(a => a.toFixed(2)).join(" ") + "<br>" +
+    "hats " + JSON.stringify(pad.hats) + "</div>").join("") || "no controller";
+};
+</script></body></html>
+"""
+
+
+def encode_frame(payload, opcode=OP_TEXT):
+    """
+    One unmasked server -> client WebSocket frame.
+    """
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return header + payload
+
+
+async def read_frame(reader, max_payload=MAX_CLIENT_PAYLOAD):
+    """
+    Read one client frame, returns (opcode, payload). Client frames are always masked.
+    Raises ValueError, before reading the payload, if it is longer than `max_payload`.
+    """
+    b0, b1 = await reader.readexactly(2)
+    n = b1 & 0x7F
+    if n == 126:
+        n = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif n == 127:
+        n = struct.unpack("!Q", await reader.readexactly(8))[0]
+    if max_payload is not None and n > max_payload:
+        raise ValueError(f"{n}-byte frame is over the {max_payload}-byte limit")
+    mask = await reader.readexactly(4) if b1 & 0x80 else None
+    payload = await reader.readexactly(n)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return b0 & 0x0F, payload
+
+
+class _Client:
+    def __init__(self, writer, queue_size):
+        self.writer = writer
+        self.queue = deque(maxlen=queue_size)
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+
+    def offer(self, frame):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1  # the deque drops the oldest update
+        self.queue.append(frame)
+        self.ready.set()
+
+
+class DashboardServer:
+    """
+    Serves the dashboard page and fans state updates out to every WebSocket client.
+
+    publish() encodes a message (JSON + WebSocket framing) exactly once, whatever the
+    number of clients, and hands the same bytes to each client's bounded queue. Each
+    client has its own sender task, so a slow client only ever delays itself: its queue
+    keeps the latest updates and drops older ones, and the input loop never waits on
+    any socket.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, queue_size=CLIENT_QUEUE_SIZE):
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.clients = set()
+        self.published = 0
+        self.last_frame = None
+        self.loop = None
+        self.server = None
+        self._thread = None
+
+    # ---- Publishing ----
+
+    def publish(self, message):
+        """
+        Send `message` (a JSON-able dict) to every client. Must be called on the server's
+        loop; use publish_threadsafe() from any other thread.
+        """
+        self.broadcast(encode_frame(json.dumps(message, separators=(",", ":")).encode()))
+
+    def publish_threadsafe(self, message):
+        # Encode here, in the caller's thread, so the server loop only queues bytes
+        frame = encode_frame(json.dumps(message, separators=(",", ":")).encode())
+        self.loop.call_soon_threadsafe(self.broadcast, frame)
+
+    def broadcast(self, frame):
+        self.published += 1
+        self.last_frame = frame
+        for client in self.clients:
+            client.offer(frame)
+
+    # ---- Server ----
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    def start_in_thread(self):
+        """
+        Run the server on its own asyncio loop in a daemon thread; returns once listening.
+        """
+        started = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            started.set()
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="ws-dashboard", daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def stop_thread(self):
+        if self._thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=1.0)
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "clients": len(self.clients),
+            "dropped": sum(client.dropped for client in self.clients),
+        }
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        lines = request.decode("latin-1").split("\r\n")
+        parts = lines[0].split()
+        path = parts[1] if len(parts) > 1 else "/"
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        if headers.get("upgrade", "").lower() == "websocket" and "sec-websocket-key" in headers:
+            if self._origin_allowed(headers.get("origin")):
+                await self._websocket(reader, writer, headers["sec-websocket-key"])
+                return
+            body, status, ctype = b"forbidden origin\n", "403 Forbidden", "text/plain"
+        elif path == "/":
+            body, status, ctype = DASHBOARD_HTML, "200 OK", "text/html; charset=utf-8"
+        else:
+            body, status, ctype = b"not found\n", "404 Not Found", "text/plain"
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    def _origin_allowed(self, origin):
+        """
+        Browsers let any page open a WebSocket to localhost, so only the dashboard's own
+        page may connect. Non-browser clients send no Origin and are always allowed.
+        """
+        if origin is None:
+            return True
+        return origin in (f"http://localhost:{self.port}", f"http://127.0.0.1:{self.port}",
+                          f"http://{self.host}:{self.port}")
+
+    async def _websocket(self, reader, writer, key):
+        accept = base64.b64encode(hashlib.sha1(key.encode() + WS_GUID).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+
+        client = _Client(writer, self.queue_size)
+        self.clients.add(client)
+        # New viewers start from the current state instead of waiting for a change
+        if self.last_frame is not None:
+            client.offer(self.last_frame)
+        sender = asyncio.ensure_future(self._send_loop(client))
+        try:
+            while True:
+                opcode, payload = await read_frame(reader)
+                if opcode == OP_CLOSE:
+                    writer.write(encode_frame(b"", OP_CLOSE))
+                    break
+                if opcode == OP_PING:
+                    writer.write(encode_frame(payload, OP_PONG))
+                # Anything else from clients is ignored
+        except ValueError:
+            writer.write(encode_frame(struct.pack("!H", CLOSE_TOO_BIG), OP_CLOSE))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.discard(client)
+            client.closed = True
+            sender.cancel()
+            writer.close()
+
+    async def _send_loop(self, client):
+        try:
+            while True:
+                await client.ready.wait()
+                if client.closed:
+                    return
+                while client.queue:
+                    client.writer.write(client.queue.popleft())
+                    client.sent += 1
+                    # Only this client's task waits on its socket buffer
+                    await client.writer.drain()
+                client.ready.clear()
+        except ConnectionError:
+            pass
+
+
+def state_message(hub):
+    """
+    JSON-able snapshot of every connected pad.
+    """
+    pads = []
+    for controller in hub.controllers():
+        joystick = controller.joystick
+        state = controller.state
+        pads.append({
+            "slot": controller.slot,
+            "name": joystick.get_name(),
+            # Latched: a tap that started and ended since the last publish still shows
+            "buttons": [int(state.button_active(i)) for i in range(joystick.get_numbuttons())],
+            "axes": [round(state.get_axis(i), 4) for i in range(joystick.get_numaxes())],
+            "hats": [state.get_hat(i) for i in range(joystick.get_numhats())],
+        })
+    return {"t": round(time.perf_counter(), 6), "pads": pads}
+
+
+def run(host, port):
+    """
+    Read the pads with pygame (no window) and publish their state to the dashboard.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+    from controller_state import ControllerHub
+
+    pygame.init()
+    pygame.joystick.init()
+    hub = ControllerHub()
+    hub.open_all()
+
+    server = DashboardServer(host, port)
+    server.start_in_thread()
+    print(f"Dashboard on http://{host}:{server.port}/ (Ctrl+C to stop)")
+
+    min_interval = 1.0 / MAX_PUBLISH_RATE
+    last_publish = 0.0
+    dirty = True
+    try:
+        running = True
+        while running:
+            first = pygame.event.wait(int(min_interval * 1000) + 1 if dirty else 1000)
+            events = [] if first.type == pygame.NOEVENT else [first] + pygame.event.get()
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
+                if hub.handle_event(event) or event.type in (pygame.JOYDEVICEADDED, pygame.JOYDEVICEREMOVED):
+                    dirty = True
+            now = time.perf_counter()
+            if dirty and now - last_publish >= min_interval:
+                server.publish_threadsafe(state_message(hub))
+                last_publish = now
+                # Latched taps were just shown; publish once more so they show released
+                dirty = any(c.state.latched_mask & ~c.state.button_mask for c in hub.controllers())
+                # The latch covers everything since the previous publish, not since the
+                # previous wake-up
+                hub.end_frame()
+    except KeyboardInterrupt:
+        pass
+    print(server.stats())
+    server.stop_thread()
+    pygame.quit()
+
+
+async def _selftest(clients, updates):
+    """
+    One server, `clients` fast clients and one client that never reads: checks that
+    publishing doesn't slow down, that fast clients end on the latest update, that the
+    stalled client's queue stays bounded, that a client announcing a huge frame is
+    closed with 1009 instead of being buffered, and that foreign origins get a 403.
+    """
+    server = DashboardServer(port=0)
+    await server.start()
+
+    async def connect(receive_buffer=None):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if receive_buffer:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, (server.host, server.port))
+        reader, writer = await asyncio.open_connection(sock=sock)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((f"GET /ws HTTP/1.1\r\nHost: {server.host}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        await reader.readuntil(b"\r\n\r\n")
+        return reader, writer
+
+    async def upgrade_status(origin):
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((f"GET /ws HTTP/1.1\r\nHost: {server.host}\r\nOrigin: {origin}\r\n"
+                      f"Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        response = await reader.readuntil(b"\r\n\r\n")
+        writer.close()
+        return response.split(b" ", 2)[1].decode()
+
+    async def read_until_last(reader, last):
+        count = 0
+        while True:
+            _, payload = await read_frame(reader)
+            count += 1
+            if json.loads(payload)["n"] == last:
+                return count
+
+    fast = [await connect() for _ in range(clients)]
+    # Never read from, with a tiny receive buffer so the server's sends back up quickly
+    slow_reader, slow_writer = await connect(receive_buffer=4096)
+    while len(server.clients) < clients + 1:
+        await asyncio.sleep(0.01)
+
+    padding = "x" * 2000
+    readers = [asyncio.ensure_future(read_until_last(reader, updates - 1)) for reader, _ in fast]
+    start = time.perf_counter()
+    worst = 0.0
+    for n in range(updates):
+        t = time.perf_counter()
+        server.publish({"n": n, "pad": padding})
+        worst = max(worst, time.perf_counter() - t)
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    received = await asyncio.wait_for(asyncio.gather(*readers), 10)
+
+    slow_client = next(client for client in server.clients if client.writer.get_extra_info("peername")
+                       == slow_writer.get_extra_info("sockname"))
+    print(f"{updates} updates to {clients + 1} clients in {elapsed * 1000:.1f} ms "
+          f"(worst publish {worst * 1e6:.0f} us)")
+    print(f"fast clients received {min(received)}-{max(received)} updates, ending on the latest")
+    print(f"stalled client: {slow_client.sent} sent, {slow_client.dropped} dropped, "
+          f"{len(slow_client.queue)} queued (max {server.queue_size})")
+
+    # A masked text frame claiming 2**40 bytes: only the header is ever sent
+    big_reader, big_writer = await connect()
+    big_writer.write(struct.pack("!BBQ", 0x80 | OP_TEXT, 0x80 | 127, 1 << 40) + os.urandom(4))
+    opcode, payload = await asyncio.wait_for(read_frame(big_reader), 5)
+    while opcode != OP_CLOSE:
+        opcode, payload = await asyncio.wait_for(read_frame(big_reader), 5)
+    too_big_ok = payload == struct.pack("!H", CLOSE_TOO_BIG)
+    print(f"oversized client frame: {'closed with 1009' if too_big_ok else 'NOT rejected'}")
+
+    # Any page the user visits could open the socket: only the dashboard's own origin may
+    foreign = await upgrade_status("http://evil.example")
+    own = await upgrade_status(f"http://localhost:{server.port}")
+    origin_ok = foreign == "403" and own == "101"
+    print(f"WebSocket origin check: foreign {foreign}, own {own}")
+
+    for _, writer in fast + [(slow_reader, slow_writer), (big_reader, big_writer)]:
+        writer.close()
+    server.server.close()
+    for _ in range(100):
+        if not server.clients:
+            break
+        await asyncio.sleep(0.01)
+    return len(slow_client.queue) <= server.queue_size and slow_client.dropped > 0 and too_big_ok and origin_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local WebSocket dashboard for the controller state.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--selftest", action="store_true",
+                        help="fan out to localhost clients (one of them stalled) and report")
+    parser.add_argument("--clients", type=int, default=8, help="fast clients for --selftest")
+    args = parser.parse_args()
+
+    if args.selftest:
+        sys.exit(0 if asyncio.run(_selftest(args.clients, 2000)) else 1)
+    run(args.host, args.port)
+
+if __name__ == "__main__":
+    main()